@@ -0,0 +1,93 @@
+#!/usr/bin/python
+# -*- coding: utf8 -*-
+"""This module contains the Agenda class used for forward chaining."""
+import collections
+
+
+class Agenda(object):
+    """
+    A first-in first-out queue of expressions waiting to be learnt.
+
+    An expression is only queued once while it is waiting, so the same
+    consequent derived by several rules is processed a single time.
+
+    Rules whose antecedent has to be checked against what is known, such
+    as a negation, are deferred in a separate queue. They are only taken
+    once no expression is waiting, so the check sees everything derived
+    before it.
+    """
+
+    def __init__(self, items=()):
+        """
+        Create a new agenda holding the given expressions.
+
+        >>> a = Agenda(['x', 'y', 'x'])
+        >>> len(a)
+        2
+        """
+        self.queue = collections.deque()
+        self.waiting = set()
+        self.deferred = collections.deque()
+        for item in items:
+            self.push(item)
+
+    def push(self, item):
+        """
+        Queue an expression. Returns whether it was not already waiting.
+
+        >>> a = Agenda()
+        >>> a.push('x'), a.push('x')
+        (True, False)
+        """
+        if item in self.waiting:
+            return False
+
+        self.waiting.add(item)
+        self.queue.append(item)
+        return True
+
+    def pop(self):
+        """
+        Take the oldest expression from the agenda.
+
+        >>> a = Agenda(['x', 'y'])
+        >>> a.pop(), a.pop()
+        ('x', 'y')
+        """
+        item = self.queue.popleft()
+        self.waiting.discard(item)
+        return item
+
+    def defer(self, antecedent, consequent):
+        """Queue a rule whose antecedent is checked once nothing waits."""
+        self.deferred.append((antecedent, consequent))
+
+    def ready(self):
+        """Check whether an expression is waiting, rather than a rule."""
+        return bool(self.queue)
+
+    def resume(self):
+        """
+        Take the oldest deferred (antecedent, consequent) rule.
+
+        >>> a = Agenda(['x'])
+        >>> a.defer('y', 'z')
+        >>> len(a), a.pop(), a.ready(), a.resume()
+        (2, 'x', False, ('y', 'z'))
+        """
+        return self.deferred.popleft()
+
+    def __len__(self):
+        """Get the number of waiting expressions and deferred rules."""
+        return len(self.queue) + len(self.deferred)
+
+
+def test():
+    """Test the module."""
+    print('Testing')
+    import doctest
+    doctest.testmod()
+    print('Done')
+
+if __name__ == '__main__':
+    test()
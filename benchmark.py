@@ -0,0 +1,727 @@
+#!/usr/bin/python
+# -*- coding: utf8 -*-
+"""
+This module contains benchmarks for the logic brain.
+
+Run all of them with `python benchmark.py`, or only some of them by
+passing their names, e.g. `python benchmark.py parser`.
+"""
+import glob
+import multiprocessing
+import os
+import pickle
+import random
+import shutil
+import sys
+import tempfile
+import timeit
+
+import numpy
+
+import brain
+import datalog
+import parallel
+import sat
+import expressions.atomic
+import expressions.bdd
+import expressions.codec
+import expressions.compiler
+import expressions.conjunction
+import expressions.constant
+import expressions.factory
+import expressions.implication
+import expressions.negation
+import expressions.parser
+import expressions.predicate
+import expressions.simplifier
+import expressions.vector
+
+
+def measure(function, repeat=3):
+    """Return the best wall time in seconds of calling function."""
+    return min(timeit.repeat(function, number=1, repeat=repeat))
+
+
+def conjunction_chain(size):
+    """Return a string with a conjunction of size atomic expressions."""
+    return ' & '.join('P(c%d)' % i for i in range(size))
+
+
+def bench_parser():
+    """Compare the recursive and the tokenizing parser on long chains."""
+    sys.setrecursionlimit(max(sys.getrecursionlimit(), 20000))
+    recursive = expressions.parser.RecursiveParser()
+    tokenizing = expressions.parser.Parser()
+
+    print('%8s %14s %14s' % ('terms', 'recursive (s)', 'tokenizing (s)'))
+    for size in (250, 500, 1000, 2000, 4000):
+        chain = conjunction_chain(size)
+        print('%8d %14.5f %14.5f' % (
+            size,
+            measure(lambda: recursive.parse(chain)),
+            measure(lambda: tokenizing.parse(chain))))
+
+    for size in (40000, 100000):
+        chain = conjunction_chain(size)
+        print('%8d %14s %14.5f' % (
+            size, '-', measure(lambda: tokenizing.parse(chain))))
+
+
+def implication_chain(depth):
+    """Return a right-nested implication P(c0) > (P(c1) > ...) of depth."""
+    p = expressions.predicate.Predicate('P')
+    atoms = [expressions.atomic.Atomic(p, expressions.constant.Constant(
+             'c%d' % i)) for i in range(depth + 1)]
+
+    expr = atoms[-1]
+    for atom in reversed(atoms[:-1]):
+        expr = expressions.implication.Implication(atom, expr)
+
+    return expr
+
+
+def structural_hash(expr):
+    """Hash an expression tree recursively, as done before hash caching."""
+    if isinstance(expr, expressions.atomic.Atomic):
+        return hash((expr.__class__, expr.predicate, expr.arguments))
+    elif isinstance(expr, expressions.negation.Negation):
+        return hash((expr.__class__, structural_hash(expr.expr)))
+
+    return hash((expr.__class__, structural_hash(expr.expr1),
+                 structural_hash(expr.expr2)))
+
+
+def bench_hash():
+    """Compare recursive hashing with cached hashes for rule lookups."""
+    lookups = 1000
+
+    print('%8s %16s %16s' % ('depth', 'recursive (us)', 'cached (us)'))
+    for depth in (1, 10, 100, 500):
+        expr = implication_chain(depth)
+        rules = {expr: set()}
+        print('%8d %16.3f %16.3f' % (
+            depth,
+            measure(lambda: [structural_hash(expr) for _ in
+                             range(lookups)]) * 1e6 / lookups,
+            measure(lambda: [expr in rules for _ in
+                             range(lookups)]) * 1e6 / lookups))
+
+
+def deep_size(root, exclude=()):
+    """
+    Get the bytes used by an object and everything reachable from it.
+
+    Shared objects, such as interned constants, are only counted once, and
+    the objects in exclude, and what is only reachable through them, are
+    not counted at all.
+    """
+    seen = set(id(obj) for obj in exclude)
+    size = 0
+    stack = [root]
+    while stack:
+        obj = stack.pop()
+        if id(obj) in seen:
+            continue
+
+        seen.add(id(obj))
+        size += sys.getsizeof(obj)
+
+        if isinstance(obj, dict):
+            stack.extend(obj.keys())
+            stack.extend(obj.values())
+        elif isinstance(obj, (list, tuple, set, frozenset)):
+            stack.extend(obj)
+        elif not isinstance(obj, (str, type(u''), int, float, type(None))):
+            if hasattr(obj, '__dict__'):
+                stack.append(obj.__dict__)
+            for cls in type(obj).__mro__:
+                for slot in getattr(cls, '__slots__', ()):
+                    if slot != '__weakref__' and hasattr(obj, slot):
+                        stack.append(getattr(obj, slot))
+
+    return size
+
+
+def bench_memory():
+    """
+    Report the bytes used per fact by a whole Brain.
+
+    Every brain gets a factory of its own, so the terms interned by other
+    benchmarks are not counted.
+    """
+    print('%10s %16s' % ('facts', 'bytes per fact'))
+    for size in (1000, 10000, 100000):
+        b = brain.Brain(factory=expressions.factory.Factory())
+        for i in range(size):
+            b.learn(b.parser.parse('Say(p%d, w%d)' % (i % 100, i // 100)))
+
+        print('%10d %16.1f' % (size, deep_size(b) / float(size)))
+
+
+def bench_chaining():
+    """Forward chain through deep and wide rule graphs."""
+    print('%8s %8s %10s %12s' % ('graph', 'rules', 'derived', 'seconds'))
+    for size in (5000, 50000):
+        b = brain.Brain()
+        for i in range(size):
+            b.learn(b.parser.parse('P(c%d) > P(c%d)' % (i, i + 1)))
+
+        start = timeit.default_timer()
+        derived = b.learn(b.parser.parse('P(c0)'))
+        print('%8s %8d %10d %12.5f' % (
+            'deep', size, derived, timeit.default_timer() - start))
+
+    for size in (5000, 50000):
+        b = brain.Brain()
+        for i in range(1, size):
+            b.learn(b.parser.parse('P(c%d) > P(c%d) & Q(c%d)' % (
+                (i - 1) // 10, i, i)))
+
+        start = timeit.default_timer()
+        derived = b.learn(b.parser.parse('P(c0)'))
+        print('%8s %8d %10d %12.5f' % (
+            'wide', size - 1, derived, timeit.default_timer() - start))
+
+
+def tree_edges(size, seed=0):
+    """Return the edges of a random tree with size + 1 nodes."""
+    rng = random.Random(seed)
+    return ['Edge(n%d, n%d)' % (rng.randrange(i), i)
+            for i in range(1, size + 1)]
+
+
+def bench_datalog():
+    """Compute the transitive closure of random trees."""
+    rules = ['Edge(X, Y) > Path(X, Y)', 'Path(X, Y) & Edge(Y, Z) > Path(X, Z)']
+
+    print('%8s %10s %14s %14s %14s' % ('edges', 'paths', 'rete (s)',
+                                        'semi-naive (s)', 'columnar (s)'))
+    for size in (1000, 10000, 50000, 200000):
+        b = brain.Brain()
+        for rule in rules:
+            b.learn(b.parser.parse(rule))
+        edges = [b.parser.parse(edge) for edge in tree_edges(size)]
+
+        rete_time = '-'
+        if size <= 10000:
+            start = timeit.default_timer()
+            for edge in edges:
+                b.learn(edge)
+            rete_time = '%.5f' % (timeit.default_timer() - start)
+            b = brain.Brain()
+            for rule in rules:
+                b.learn(b.parser.parse(rule))
+
+        for edge in edges:
+            b.knowledge.add(edge)
+
+        tuple_time = '-'
+        if size <= 50000:
+            start = timeit.default_timer()
+            engine = datalog.Engine(b.knowledge, b.factory)
+            for body, heads in b.datalog_rules():
+                engine.add_rule(body, heads)
+            engine.evaluate()
+            tuple_time = '%.5f' % (timeit.default_timer() - start)
+
+        start = timeit.default_timer()
+        paths = b.saturate() - size
+        print('%8d %10d %14s %14s %14.5f' % (
+            size, paths, rete_time, tuple_time,
+            timeit.default_timer() - start))
+
+
+def bench_magic():
+    """Query the ancestors of one node against computing all of them."""
+    rules = ['Edge(X, Y) > Path(X, Y)', 'Path(X, Y) & Edge(Y, Z) > Path(X, Z)']
+
+    print('%8s %10s %14s %14s' % ('edges', 'answers', 'saturate (s)',
+                                   'magic (s)'))
+    for size in (1000, 10000, 50000):
+        b = brain.Brain(chaining=False)
+        for rule in rules:
+            b.learn(b.parser.parse(rule))
+        for edge in tree_edges(size):
+            b.knowledge.add(b.parser.parse(edge))
+        goal = b.parser.parse('Path(n%d, X)' % (size // 100))
+
+        start = timeit.default_timer()
+        answers = len(b.query(goal))
+        magic_time = timeit.default_timer() - start
+
+        start = timeit.default_timer()
+        b.saturate()
+        print('%8d %10d %14.5f %14.5f' % (
+            size, answers, timeit.default_timer() - start, magic_time))
+
+
+def bench_forget():
+    """Forget edges of random trees against rebuilding their closure."""
+    rules = ['Edge(X, Y) > Path(X, Y)', 'Path(X, Y) & Edge(Y, Z) > Path(X, Z)']
+
+    print('%8s %10s %14s %14s' % ('edges', 'removed', 'rebuild (s)',
+                                   'forget (s)'))
+    for size in (1000, 10000):
+        b = brain.Brain()
+        for rule in rules:
+            b.learn(b.parser.parse(rule))
+        edges = [b.parser.parse(edge) for edge in tree_edges(size)]
+        for edge in edges:
+            b.knowledge.add(edge)
+        b.saturate()
+
+        start = timeit.default_timer()
+        removed = b.forget(edges[-1])
+        forget_time = timeit.default_timer() - start
+
+        start = timeit.default_timer()
+        b = brain.Brain()
+        for rule in rules:
+            b.learn(b.parser.parse(rule))
+        for edge in edges[:-1]:
+            b.knowledge.add(edge)
+        b.saturate()
+        print('%8d %10d %14.5f %14.5f' % (
+            size, removed, timeit.default_timer() - start, forget_time))
+
+
+def random_dimacs(path, variables, seed):
+    """Write a random 3-SAT instance at the satisfiability threshold."""
+    rng = random.Random(seed)
+    clauses = int(4.26 * variables)
+    with open(path, 'w') as f:
+        f.write('p cnf %d %d\n' % (variables, clauses))
+        for _ in range(clauses):
+            f.write('%s 0\n' % ' '.join(
+                str(rng.choice((-1, 1)) * v)
+                for v in rng.sample(range(1, variables + 1), 3)))
+
+
+def pigeonhole_dimacs(path, holes):
+    """Write the unsatisfiable problem of fitting n + 1 pigeons in n holes."""
+    def v(pigeon, hole):
+        return pigeon * holes + hole + 1
+
+    clauses = [[v(p, h) for h in range(holes)] for p in range(holes + 1)]
+    clauses.extend([-v(p, h), -v(q, h)] for h in range(holes)
+                   for p in range(holes + 1) for q in range(p))
+    with open(path, 'w') as f:
+        f.write('p cnf %d %d\n' % ((holes + 1) * holes, len(clauses)))
+        for clause in clauses:
+            f.write('%s 0\n' % ' '.join(map(str, clause)))
+
+
+def bench_sat():
+    """
+    Solve DIMACS instances with the CDCL solver.
+
+    The instances are the files matching the DIMACS environment variable,
+    like 'uf50/*.cnf' for SATLIB's, or generated ones if it is not set.
+    """
+    paths = sorted(glob.glob(os.environ.get('DIMACS', '')))
+    directory = None
+    if not paths:
+        directory = tempfile.mkdtemp()
+        for variables in (50, 100, 150):
+            for seed in range(5):
+                paths.append(os.path.join(directory, 'uf%d-%d.cnf' % (
+                    variables, seed)))
+                random_dimacs(paths[-1], variables, seed)
+        for holes in (6, 7):
+            paths.append(os.path.join(directory, 'hole%d.cnf' % holes))
+            pigeonhole_dimacs(paths[-1], holes)
+
+    print('%14s %8s %8s %8s %10s %12s' % ('instance', 'vars', 'clauses',
+                                          'result', 'conflicts', 'seconds'))
+    for path in paths:
+        variables, clauses = sat.read_dimacs(path)
+        start = timeit.default_timer()
+        solver = sat.Solver(clauses, variables)
+        model = solver.solve()
+        print('%14s %8d %8d %8s %10d %12.5f' % (
+            os.path.basename(path)[:14], variables, len(clauses),
+            'sat' if model is not None else 'unsat', solver.conflicts,
+            timeit.default_timer() - start))
+
+    if directory is not None:
+        shutil.rmtree(directory)
+
+
+def random_formula(factory, atoms, size, rng):
+    """Return a random formula of clauses over atoms, with size clauses."""
+    clauses = []
+    for _ in range(size):
+        literals = [rng.choice(atoms) for _ in range(3)]
+        literals = [factory.negation(x) if rng.random() < 0.5 else x
+                    for x in literals]
+        clauses.append(factory.disjunction(
+            factory.disjunction(literals[0], literals[1]), literals[2]))
+
+    while len(clauses) > 1:
+        clauses = [factory.conjunction(*clauses[i:i + 2])
+                   if i + 1 < len(clauses) else clauses[i]
+                   for i in range(0, len(clauses), 2)]
+
+    return clauses[0]
+
+
+def tree_size(e):
+    """Return the number of nodes of an expression, as a tree."""
+    size = 0
+    stack = [e]
+    while stack:
+        size += 1
+        stack.extend(stack.pop().children())
+
+    return size
+
+
+def bench_bdd():
+    """Evaluate one formula against many knowledge sets, walking or BDD."""
+    rng = random.Random(0)
+    p = expressions.parser.Parser()
+    samples = 5000
+
+    print('%8s %8s %10s %12s %12s %12s' % ('atoms', 'clauses', 'nodes',
+                                           'compile (s)', 'eval (s)',
+                                           'bdd (s)'))
+    for count, size in ((20, 40), (30, 60), (30, 100)):
+        atoms = [p.parse('A(c%d)' % i) for i in range(count)]
+        e = random_formula(p.factory, atoms, size, rng)
+        sets = [set(x for x in atoms if rng.random() < 0.5)
+                for _ in range(samples)]
+
+        start = timeit.default_timer()
+        bdd = expressions.bdd.BDD()
+        node = bdd.compile(e)
+        compile_time = timeit.default_timer() - start
+
+        eval_time = measure(lambda: [e.eval(k) for k in sets], 1)
+        bdd_time = measure(lambda: [bdd.evaluate(node, k) for k in sets], 1)
+        print('%8d %8d %10d %12.5f %12.5f %12.5f' % (
+            count, size, len(bdd.levels), compile_time, eval_time, bdd_time))
+
+
+def bench_vector():
+    """Evaluate one formula on a million worlds, one by one or in batch."""
+    rng = random.Random(0)
+    p = expressions.parser.Parser()
+    count = 10 ** 6
+    sample = 10 ** 4
+
+    print('%8s %8s %10s %16s %12s' % ('atoms', 'clauses', 'worlds',
+                                      'eval (s, est.)', 'vector (s)'))
+    for atoms, size in ((20, 40), (40, 400)):
+        atoms = [p.parse('A(c%d)' % i) for i in range(atoms)]
+        e = random_formula(p.factory, atoms, size, rng)
+        worlds = numpy.random.RandomState(0).rand(count, len(atoms)) < 0.5
+
+        sets = [set(x for x, value in zip(atoms, row) if value)
+                for row in worlds[:sample]]
+        eval_time = measure(lambda: [e.eval(k) for k in sets], 1)
+        vector_time = measure(
+            lambda: expressions.vector.evaluate(e, atoms, worlds), 1)
+        print('%8d %8d %10d %16.5f %12.5f' % (
+            len(atoms), size, count, eval_time * count / sample,
+            vector_time))
+
+
+def bench_compile():
+    """Evaluate formulas by walking their tree or as compiled functions."""
+    sys.setrecursionlimit(max(sys.getrecursionlimit(), 20000))
+    rng = random.Random(0)
+    p = expressions.parser.Parser()
+    samples = 10000
+
+    print('%8s %8s %12s %12s %12s' % ('formula', 'nodes', 'compile (s)',
+                                      'eval (s)', 'compiled (s)'))
+    for name, atoms, size in (('cnf', 20, 40), ('cnf', 30, 400),
+                              ('chain', 2000, None)):
+        if size is None:
+            e = p.factory.intern(implication_chain(atoms))
+            atoms = [p.parse('P(c%d)' % i) for i in range(atoms + 1)]
+            sets = [set(atoms)] * (samples // 10)
+        else:
+            atoms = [p.parse('A(c%d)' % i) for i in range(atoms)]
+            e = random_formula(p.factory, atoms, size, rng)
+            sets = [set(x for x in atoms if rng.random() < 0.9)
+                    for _ in range(samples)]
+
+        nodes = tree_size(e)
+        start = timeit.default_timer()
+        function = expressions.compiler.compile(e)
+        compile_time = timeit.default_timer() - start
+
+        eval_time = measure(lambda: [e.eval(k) for k in sets], 1)
+        compiled_time = measure(lambda: [function(k) for k in sets], 1)
+        print('%8s %8d %12.5f %12.5f %12.5f' % (
+            name, nodes, compile_time, eval_time, compiled_time))
+
+
+def bench_simplify():
+    """Simplify formulas and reorderings of them, then hit the cache."""
+    rng = random.Random(0)
+    p = expressions.parser.Parser()
+
+    print('%8s %12s %12s %12s %8s' % ('clauses', 'simplify (s)',
+                                      'shuffled (s)', 'cached (s)', 'same'))
+    for size in (100, 1000, 10000):
+        atoms = [p.parse('A(c%d)' % i) for i in range(size // 4 + 3)]
+        e = random_formula(p.factory, atoms, size, rng)
+        clauses = list(e.exprs)
+        rng.shuffle(clauses)
+        shuffled = p.factory.conjunction(*clauses)
+
+        s = expressions.simplifier.Simplifier(p.factory)
+        start = timeit.default_timer()
+        result = s.simplify(e)
+        simplify_time = timeit.default_timer() - start
+        start = timeit.default_timer()
+        same = s.simplify(shuffled) is result
+        shuffled_time = timeit.default_timer() - start
+        cached_time = measure(lambda: s.simplify(e), 1)
+        print('%8d %12.5f %12.5f %12.5f %8s' % (
+            size, simplify_time, shuffled_time, cached_time, same))
+
+
+def bench_nary():
+    """Build, evaluate, print and compare long flat conjunctions."""
+    p = expressions.parser.Parser()
+
+    print('%8s %10s %10s %10s %10s' % ('terms', 'parse (s)', 'eval (s)',
+                                       'str (s)', 'equal (s)'))
+    for size in (1000, 10000, 100000):
+        chain = conjunction_chain(size)
+        start = timeit.default_timer()
+        e = p.parse(chain)
+        parse_time = timeit.default_timer() - start
+        knowledge = set(e.exprs)
+        copy = expressions.conjunction.Conjunction(*e.exprs)
+        print('%8d %10.5f %10.5f %10.5f %10.5f' % (
+            size, parse_time, measure(lambda: e.eval(knowledge)),
+            measure(lambda: str(e)), measure(lambda: e == copy)))
+
+
+def bench_load():
+    """Load files of facts and rules, streamed or learnt line by line."""
+    rules = ['Edge(X, Y) > Path(X, Y)', 'Path(X, Y) & Edge(Y, Z) > Path(X, Z)']
+    directory = tempfile.mkdtemp()
+
+    print('%8s %10s %12s %14s %12s %14s' % (
+        'edges', 'facts', 'learn (s)', 'learn (st/s)', 'load (s)',
+        'load (st/s)'))
+    for size in (1000, 10000, 100000):
+        path = os.path.join(directory, 'tree%d.txt' % size)
+        with open(path, 'w') as f:
+            for line in rules + tree_edges(size):
+                f.write(line + '\n')
+
+        learn_time = '-'
+        learn_rate = '-'
+        if size <= 10000:
+            b = brain.Brain()
+            start = timeit.default_timer()
+            with open(path) as f:
+                for line in f:
+                    b.learn(b.parser.parse(line))
+            seconds = timeit.default_timer() - start
+            learn_time = '%.5f' % seconds
+            learn_rate = '%.1f' % ((size + len(rules)) / seconds)
+
+        b = brain.Brain()
+        stats = b.load(path)
+        print('%8d %10d %12s %14s %12.5f %14.1f' % (
+            size, len(b.knowledge), learn_time, learn_rate,
+            stats['seconds'], stats['rate']))
+
+    shutil.rmtree(directory)
+
+
+def bench_parallel():
+    """Parse a file in one process or in parallel, and encoded sizes."""
+    rng = random.Random(0)
+    directory = tempfile.mkdtemp()
+    path = os.path.join(directory, 'rules.txt')
+    size = 50000
+    with open(path, 'w') as f:
+        for i in range(size):
+            f.write('Edge(n%d, n%d) & Color(n%d, c%d) > Path(n%d, X)\n' % (
+                rng.randrange(size), i, i, rng.randrange(8), i))
+
+    b = brain.Brain()
+    sample = next(b.statements(path, 1000))
+    names, codes = expressions.codec.encode(sample)
+    print('%d statements: %d bytes pickled, %d bytes encoded' % (
+        len(sample), len(pickle.dumps(sample, pickle.HIGHEST_PROTOCOL)),
+        len(names) + len(codes)))
+
+    print('%10s %12s %14s' % ('processes', 'seconds', 'statements/s'))
+    start = timeit.default_timer()
+    count = sum(len(batch) for batch in b.statements(path))
+    seconds = timeit.default_timer() - start
+    print('%10s %12.5f %14.1f' % ('serial', seconds, count / seconds))
+
+    for processes in sorted(set([1, 2, 4, multiprocessing.cpu_count()])):
+        start = timeit.default_timer()
+        count = sum(len(batch) for batch in parallel.parse(
+            path, processes, b.factory, 1 << 20))
+        seconds = timeit.default_timer() - start
+        print('%10d %12.5f %14.1f' % (processes, seconds, count / seconds))
+
+    shutil.rmtree(directory)
+
+
+def bench_snapshot():
+    """Save a brain and load it back, against replaying its source."""
+    rules = ['Edge(X, Y) > Path(X, Y)', 'Path(X, Y) & Edge(Y, Z) > Path(X, Z)']
+    directory = tempfile.mkdtemp()
+
+    print('%8s %10s %10s %10s %10s %12s %10s' % (
+        'edges', 'facts', 'MB', 'save (s)', 'load (s)', 'first (s)',
+        'replay (s)'))
+    for size in (1000, 10000, 50000):
+        source = os.path.join(directory, 'tree%d.txt' % size)
+        with open(source, 'w') as f:
+            for line in rules + tree_edges(size):
+                f.write(line + '\n')
+        b = brain.Brain()
+        start = timeit.default_timer()
+        b.load(source)
+        replay_time = timeit.default_timer() - start
+
+        path = os.path.join(directory, 'tree%d.snapshot' % size)
+        start = timeit.default_timer()
+        b.save(path)
+        save_time = timeit.default_timer() - start
+
+        b = brain.Brain()
+        start = timeit.default_timer()
+        b.load_snapshot(path)
+        load_time = timeit.default_timer() - start
+        start = timeit.default_timer()
+        b.eval(b.parser.parse('Path(n0, n1)'))
+        first_time = timeit.default_timer() - start
+
+        print('%8d %10d %10.2f %10.5f %10.5f %12.5f %10.5f' % (
+            size, len(b.knowledge), os.path.getsize(path) / 1e6, save_time,
+            load_time, first_time, replay_time))
+
+    shutil.rmtree(directory)
+
+
+
+def bench_journal():
+    """Learn with a journal by group size, and recover from it."""
+    rules = ['Edge(X, Y) > Path(X, Y)', 'Path(X, Y) & Edge(Y, Z) > Path(X, Z)']
+    edges = tree_edges(2000)
+    directory = tempfile.mkdtemp()
+
+    print('%10s %12s %14s' % ('group', 'learn (s)', 'rate (st/s)'))
+    for group in (None, 1, 16, 256):
+        b = brain.Brain()
+        path = os.path.join(directory, 'brain%s.log' % group)
+        if group is not None:
+            b.recover(path, group=group)
+        start = timeit.default_timer()
+        for line in rules + edges:
+            b.learn(b.parser.parse(line))
+        if group is not None:
+            b.close()
+        seconds = timeit.default_timer() - start
+        print('%10s %12.5f %14.0f' % (group or '-', seconds,
+                                      len(rules + edges) / seconds))
+
+    print('')
+    print('%12s %10s %12s' % ('checkpoint', 'records', 'recover (s)'))
+    for checkpoint in (False, True):
+        path = os.path.join(directory, 'recover%s.log' % checkpoint)
+        image = os.path.join(directory, 'recover%s.snapshot' % checkpoint)
+        b = brain.Brain()
+        b.recover(path, image)
+        for i, line in enumerate(rules + edges):
+            if checkpoint and i == len(edges) * 9 // 10:
+                b.checkpoint(image)
+            b.learn(b.parser.parse(line))
+        b.close()
+
+        b = brain.Brain()
+        start = timeit.default_timer()
+        records = b.recover(path, image)
+        seconds = timeit.default_timer() - start
+        b.close()
+        print('%12s %10d %12.5f' % (checkpoint, records, seconds))
+
+    shutil.rmtree(directory)
+
+
+def bench_eval():
+    """Evaluate monitoring queries repeatedly while facts trickle in."""
+    rng = random.Random(0)
+    print('%8s %8s %14s %14s %14s' % ('queries', 'clauses', 'uncached (s)',
+                                      'cached (s)', 'updates (s)'))
+    for count, size in ((100, 10), (100, 100), (1000, 10)):
+        b = brain.Brain()
+        atoms = [b.parser.parse('Sensor(s%d, v%d)' % (i, i % 7))
+                 for i in range(2000)]
+        for atom in atoms[::2]:
+            b.learn(atom)
+        queries = [random_formula(b.factory, atoms, size, rng)
+                   for _ in range(count)]
+        rounds = 20
+
+        start = timeit.default_timer()
+        for _ in range(rounds):
+            for e in queries:
+                e.eval(b.knowledge)
+        uncached = timeit.default_timer() - start
+
+        for e in queries:
+            b.eval(e)
+        start = timeit.default_timer()
+        for _ in range(rounds):
+            for e in queries:
+                b.eval(e)
+        cached = timeit.default_timer() - start
+
+        start = timeit.default_timer()
+        for i in range(rounds):
+            b.learn(atoms[2 * i + 1])
+            for e in queries:
+                b.eval(e)
+        updates = timeit.default_timer() - start
+
+        print('%8d %8d %14.5f %14.5f %14.5f' % (count, size, uncached,
+                                                cached, updates))
+
+BENCHMARKS = [
+    ('parser', bench_parser),
+    ('hash', bench_hash),
+    ('memory', bench_memory),
+    ('chaining', bench_chaining),
+    ('datalog', bench_datalog),
+    ('magic', bench_magic),
+    ('forget', bench_forget),
+    ('sat', bench_sat),
+    ('bdd', bench_bdd),
+    ('vector', bench_vector),
+    ('compile', bench_compile),
+    ('simplify', bench_simplify),
+    ('nary', bench_nary),
+    ('load', bench_load),
+    ('parallel', bench_parallel),
+    ('snapshot', bench_snapshot),
+    ('journal', bench_journal),
+    ('eval', bench_eval),
+]
+
+
+def run(names=()):
+    """Run the benchmarks with the given names, or all of them."""
+    for name, benchmark in BENCHMARKS:
+        if not names or name in names:
+            print('== %s' % name)
+            benchmark()
+            print('')
+
+if __name__ == '__main__':
+    run(sys.argv[1:])
@@ -1,29 +1,61 @@
 #!/usr/bin/python
 # -*- coding: utf8 -*-
 """This module contains the Brain class for logical processing."""
+import itertools
+import os
+import timeit
+import weakref
+
+import agenda
+import columnar
+import factstore
+import journal
+import magic
+import parallel
+import prover
+import rete
+import sat
+import snapshot
 import expressions.predicate
 import expressions.constant
 import expressions.atomic
+import expressions.cnf
+import expressions.expression
 import expressions.negation
 import expressions.conjunction
+import expressions.factory
 import expressions.parser
+import expressions.simplifier
 
 
 class Brain:
     """Class modelling a logic brain."""
 
-    def __init__(self):
+    def __init__(self, chaining=True, factory=None):
         """
         Create a new brain with zero knowledge.
 
+        If chaining is False, learning a fact or a rule does not derive
+        anything else: consequences are found on demand by prove instead.
+        Expressions are built by factory, or the shared default one.
+
         >>> a = Brain()
         >>> len(a.knowledge)
         0
         """
-        self.parser = expressions.parser.Parser()
-        self.knowledge = set()
+        self.parser = expressions.parser.Parser(factory)
+        self.factory = self.parser.factory
+        self.simplifier = expressions.simplifier.Simplifier(self.factory)
+        self.knowledge = factstore.FactStore(factory=self.factory)
         self.rules = {}
+        self.rete = rete.Rete()
         self.memory = {}
+        self.chaining = chaining
+        self.prover = prover.Prover(self.knowledge, self.rete, self.factory)
+        self.journal = None
+        self.evaluations = weakref.WeakKeyDictionary()
+        self.dependents = {}
+        self.watched = weakref.WeakSet()
 
     def eval(self, e):
         """
@@ -41,67 +73,862 @@ class Brain:
         >>> q = expressions.atomic.Atomic(q, d)
         >>> b.eval(q)
         False
+
+        Values are cached until the brain adds or removes a fact that the
+        expression mentions, so evaluating it again is a lookup.
+
+        >>> b = Brain()
+        >>> e = b.parser.parse('Rain() & ¬Sun() > Wet(road)')
+        >>> b.eval(e), e in b.evaluations
+        (True, True)
+        >>> b.learn(b.parser.parse('Cold()'))
+        1
+        >>> e in b.evaluations
+        True
+        >>> b.learn(b.parser.parse('Rain()'))
+        1
+        >>> e in b.evaluations, b.eval(e)
+        (False, False)
+
+        The cache and its index only hold the expressions weakly, so they
+        are dropped with them.
+
+        >>> n = len(b.evaluations)
+        >>> del e
+        >>> len(b.evaluations) == n - 1
+        True
         """
-        result = e.eval(self.knowledge)
+        result = self.evaluations.get(e)
+        if result is None:
+            result = self.evaluations[e] = e.eval(self.knowledge)
+            if e not in self.watched:
+                self.watched.add(e)
+                for atom in self.mentions(e):
+                    atoms = self.dependents.get(atom.signature())
+                    if atoms is None:
+                        atoms = self.dependents[atom.signature()] = \
+                            weakref.WeakKeyDictionary()
+                    if atom not in atoms:
+                        atoms[atom] = weakref.WeakSet()
+                    atoms[atom].add(e)
+
         return result
 
-    def add_rule(self, antecedent, consequent):
-        """Add a give antecedent -> consequent rule to the brain."""
+    def mentions(self, e):
+        """Get the atomic expressions found anywhere in e."""
+        seen = set()
+        for node in expressions.expression.postorder(e, seen):
+            seen.add(node)
+
+        return set(node for node in seen if node.type() == 'Atomic')
+
+    def invalidate(self, fact):
+        """
+        Drop the cached values of the expressions mentioning a fact.
+
+        The reverse index of the atoms each expression mentions is kept,
+        since it doesn't change when its value does. It maps every
+        signature to the atoms mentioned, and those to the expressions
+        mentioning them, all held weakly.
+        """
+        atoms = self.dependents.get(fact.signature())
+        if atoms:
+            for e in atoms.get(fact, ()):
+                self.evaluations.pop(e, None)
+
+    def invalidate_signature(self, signature):
+        """Drop the cached values mentioning any fact of a signature."""
+        for cached in self.dependents.get(signature, {}).values():
+            for e in cached:
+                self.evaluations.pop(e, None)
+
+    def prove(self, e):
+        """
+        Evaluate an expression, proving its atoms by backward chaining.
+
+        Unlike eval, the atoms don't need to be in the knowledge already:
+        each one is proven on demand from the facts and the rules, and the
+        answers to every subgoal are tabled until the brain changes.
+        Use prover.answers to get the facts matching a non-ground atom.
+
+        >>> b = Brain(chaining=False)
+        >>> for i in range(1000):
+        ...     _ = b.learn(b.parser.parse('Edge(n%d, n%d)' % (i, i + 1)))
+        >>> b.learn(b.parser.parse('Edge(X, Y) > Path(X, Y)'))
+        0
+        >>> b.learn(b.parser.parse('Path(X, Y) & Edge(Y, Z) > Path(X, Z)'))
+        0
+        >>> b.eval(b.parser.parse('Path(n990, n1000)'))
+        False
+        >>> b.prove(b.parser.parse('Path(n990, n1000) & ¬Path(n1000, n990)'))
+        True
+        >>> len(b.knowledge)
+        1000
+        """
+        return self.simplifier.simplify(e).eval(self.prover)
+
+    def entails(self, e):
+        """
+        Check whether an expression follows from everything learnt.
+
+        Unlike eval, atoms missing from the knowledge are not taken to be
+        false. The facts and the rules are compiled to CNF, and e follows
+        if they can't be satisfied together with its negation. Variables
+        in rules stand for themselves, so rules with variables only take
+        part through the facts they derived.
+
+        >>> b = Brain()
+        >>> b.learn(b.parser.parse('Rain(today) > Wet(road)'))
+        0
+        >>> b.learn(b.parser.parse('Wet(road) > Slow(traffic)'))
+        0
+        >>> b.entails(b.parser.parse('Rain(today) > Slow(traffic)'))
+        True
+        >>> e = b.parser.parse('Slow(traffic) > Rain(today)')
+        >>> b.eval(e), b.entails(e)
+        (True, False)
+        """
+        formula = expressions.cnf.CNF()
+        for fact in self.knowledge:
+            formula.add(fact)
+        for antecedent, consequents in self.rules.items():
+            for consequent in consequents:
+                formula.add(self.factory.implication(antecedent, consequent))
+
+        goal = formula.literal(self.factory.intern(e))
+        solver = sat.Solver(formula.clauses, formula.count)
+        return solver.solve([-goal]) is None
+
+    def match(self, pattern):
+        """
+        Get the known facts matching an atomic pattern with variables.
+
+        Only the facts with the pattern's predicate and arity, and with its
+        constant arguments in place, are looked at.
+
+        >>> b = Brain()
+        >>> b.learn(b.parser.parse('Say(ariel, hello) & Say(bob, hi)'))
+        2
+        >>> b.learn(b.parser.parse('Say(ariel, bye) & Hear(ariel, hi)'))
+        2
+        >>> sorted(str(f) for f in b.match(b.parser.parse('Say(ariel, X)')))
+        ['Say(ariel, bye)', 'Say(ariel, hello)']
+        """
+        return [fact for fact, _ in self.knowledge.match(pattern)]
+
+    def add_rule(self, antecedent, consequent, work=None):
+        """
+        Add a give antecedent -> consequent rule to the brain.
+
+        Rules whose antecedent is an atomic expression or a conjunction of
+        them, with or without variables, are compiled into the Rete network
+        so that later facts fire them. Consequents that already follow are
+        queued on the work agenda, or learnt right away if none is given.
+        Other antecedents are only evaluated once the agenda holds nothing
+        else, since a fact still waiting on it could make them false.
+
+        >>> b = Brain()
+        >>> b.learn(b.parser.parse('P(a) & Q(a) > R(a)'))
+        0
+        >>> b.learn(b.parser.parse('P(a)'))
+        1
+        >>> b.learn(b.parser.parse('Q(a)'))
+        2
+        >>> b.eval(b.parser.parse('R(a)'))
+        True
+        """
         if antecedent not in self.rules:
             self.rules[antecedent] = set()
+        elif consequent in self.rules[antecedent]:
+            return
 
+        if work is None:
+            self.log(journal.RULE, antecedent, consequent)
         self.rules[antecedent].add(consequent)
+        self.prover.reset()
+
+        production, matches = self.rete.add_production(antecedent, consequent,
+                                                       self.knowledge)
+        if not self.chaining:
+            return
+
+        if production is not None:
+            for bindings, _ in matches:
+                self.infer(self.instantiate(consequent, bindings), work)
 
-        if self.eval(antecedent):
-            if consequent not in self.knowledge:
-                self.learn(consequent)
+        elif work is not None:
+            work.defer(antecedent, consequent)
+
+        elif self.eval(antecedent):
+            self.infer(consequent)
+
+    def rule_patterns(self, expr):
+        """
+        Get the non-ground rule patterns with the signature of expr.
 
-    def add_atomic(self, expr):
-        """Add a given expression to the knowledge base."""
-        self.knowledge.add(expr)
+        Patterns are indexed by predicate and arity in the Rete network,
+        so finding the rule schemas an atomic expression could match does
+        not depend on the number of rules.
 
+        >>> b = Brain()
+        >>> b.learn(b.parser.parse('Say(X, hello) > Say(self, hello)'))
+        0
+        >>> b.learn(b.parser.parse('Say(X) > Say(self, X)'))
+        0
+        >>> b.learn(b.parser.parse('Say(a, hello) > Say(self, hi)'))
+        0
+        >>> [str(p) for p in b.rule_patterns(b.parser.parse('Say(a, b)'))]
+        ['Say(X, hello)']
+        >>> len(b.rule_patterns(b.parser.parse('Hear(a, b)')))
+        0
+        """
+        return [pattern for pattern in self.rete.patterns(expr.signature())
+                if not pattern.is_ground()]
+
+    def instantiate(self, consequent, bindings):
+        """Get the canonical consequent with its variables bound."""
+        if not bindings:
+            return consequent
+
+        return self.factory.intern(consequent.substitute(bindings))
+
+    def add_atomic(self, expr, work=None):
+        """
+        Add a given expression to the knowledge base.
+
+        The consequents of the rules it triggers are queued on the work
+        agenda, or learnt right away if no agenda is given.
+        Returns whether the expression was new.
+        """
+        if not self.knowledge.add(expr):
+            return False
+
+        self.invalidate(expr)
+        if self.prover.tables:
+            self.prover.reset()
+
+        if self.chaining:
+            self.fire(expr, work)
+
+        return True
+
+    def fire(self, expr, work=None):
+        """
+        Infer the consequents of the rules triggered by a known fact.
+
+        They are queued on the work agenda, or learnt right away if no
+        agenda is given.
+        """
         if expr in self.memory:
             memory = self.memory[expr]
             if memory in self.knowledge:
                 if memory in self.rules:
                     for consequent in self.rules[memory]:
-                        self.learn(consequent)
+                        self.infer(consequent, work)
+
+        for production, bindings, _ in self.rete.activate(expr,
+                                                          self.knowledge):
+            self.infer(self.instantiate(production.consequent, bindings),
+                       work)
 
-        if expr in self.rules:
-            for consequent in self.rules[expr]:
-                self.learn(consequent)
+    def infer(self, consequent, work=None):
+        """Queue a consequent on the work agenda, or chain it if none."""
+        if work is None:
+            self.chain(agenda.Agenda([consequent]))
+        else:
+            work.push(consequent)
 
     def add_memory(self, memory, reminder):
         """Add a new memory to the brain."""
+        self.log(journal.MEMORY, memory, reminder)
         self.memory[reminder] = memory
 
     def learn(self, e):
         """Add a given expression to the knowledge base.
 
+        Everything that follows from it is derived by forward chaining over
+        an agenda, without recursion. Returns the number of new facts.
+        Expressions are simplified first, so rules written differently but
+        with the same simplified antecedent share their entry in rules.
+
         >>> p = expressions.predicate.Predicate('P')
         >>> x = expressions.constant.Constant('x')
         >>> a = expressions.atomic.Atomic(p, x)
         >>> b = Brain()
         >>> b.learn(a)
+        1
         >>> b.eval(a)
         True
+        >>> b.learn(expressions.atomic.Atomic(p, x))
+        0
+        >>> len(b.knowledge)
+        1
+        >>> [k for k in b.knowledge][0] is a
+        True
+
+        >>> b = Brain()
+        >>> for i in range(5000):
+        ...     _ = b.learn(b.parser.parse('P(c%d) > P(c%d)' % (i, i + 1)))
+        >>> b.learn(b.parser.parse('P(c0)'))
+        5001
+
+        >>> b = Brain()
+        >>> b.learn(b.parser.parse('P(a) & Q(a) > R(a)'))
+        0
+        >>> b.learn(b.parser.parse('¬¬Q(a) & P(a) & Q(a) > R(a)'))
+        0
+        >>> len(b.rules)
+        1
         """
-        if e.type() == 'Conjunction':
-            self.learn(e.expr1)
-            self.learn(e.expr2)
+        e = self.simplifier.simplify(e)
+        self.log(journal.LEARN, e)
+        derived = self.chain(agenda.Agenda([e]))
+        for atom in self.atoms(e):
+            self.knowledge.add(atom, asserted=True)
 
-        elif e.type() == 'Atomic':
-            self.add_atomic(e)
+        return derived
 
-        elif e.type() == 'Implication':
-            self.add_rule(e.expr1, e.expr2)
+    def load(self, source, chunk=1000, processes=1):
+        """
+        Learn the statements of a file, one expression per line.
 
-        elif e.type() == 'Disjunction':
-            self.add_rule(expressions.negation.Negation(e.expr1), e.expr2)
-            self.add_rule(expressions.negation.Negation(e.expr2), e.expr1)
+        source is a path or a file object. Empty lines and lines starting
+        with # are skipped. Lines are read and parsed lazily, chunk at a
+        time, so the file is never held in memory. Facts not known yet are
+        added as they are read, and after every chunk, the rules it holds
+        and the ones its new facts trigger are applied: by saturate if
+        every rule is a datalog rule, starting from the rows the chunk added
+        to the knowledge, or all of them if it holds rules, or else by
+        chaining over an agenda.
 
+        With more than one process, the file, which must then be given by
+        its path, is parsed in parallel by the parallel module instead.
+
+        Returns a dict with the number of statements, of new facts read, of
+        rules read and of facts derived, the seconds taken and the rate in
+        statements per second.
+
+        >>> import io
+        >>> b = Brain()
+        >>> stats = b.load(io.StringIO(u'''# family
+        ... Parent(ana, bob)
+        ... Parent(X, Y) & Parent(Y, Z) > Grandparent(X, Z)
+        ...
+        ... Parent(bob, cid) & Parent(ana, bob)'''))
+        >>> [stats[k] for k in ('statements', 'facts', 'rules', 'derived')]
+        [3, 2, 1, 1]
+        >>> b.eval(b.parser.parse('Grandparent(ana, cid)'))
+        True
+        >>> b.load(io.StringIO(u'Parent(ana'))
+        Traceback (most recent call last):
+        ...
+        Exception: Cannot parse line 1: Parent(ana
+        """
+        start = timeit.default_timer()
+        statements = facts = rules = derived = 0
+
+        if processes != 1:
+            if hasattr(source, 'read'):
+                raise Exception('Parsing in parallel needs a path')
+            batches = parallel.parse(source, processes, self.factory)
         else:
-            print('None')
+            batches = self.statements(source, chunk)
+
+        for batch in batches:
+            self.log(journal.LEARN, *batch)
+            statements += len(batch)
+            work = agenda.Agenda()
+            atoms = set()
+            for e in batch:
+                stack = [e]
+                while stack:
+                    e = stack.pop()
+                    if e.type() == 'Conjunction':
+                        stack.extend(e.exprs)
+                    elif e.type() == 'Atomic':
+                        atoms.add(e)
+                    else:
+                        work.push(e)
+
+            since = {}
+            for fact in atoms:
+                signature = fact.signature()
+                if signature not in since:
+                    table = self.knowledge.table(signature)
+                    since[signature] = 0 if table is None else len(table.live)
+
+            added = []
+            for fact in atoms:
+                if self.knowledge.add(fact, asserted=True):
+                    self.invalidate(fact)
+                    added.append(fact)
+
+            facts += len(added)
+            rules += len(work)
+            if added and self.prover.tables:
+                self.prover.reset()
+
+            derived += self.settle(work, added, since)
+
+        seconds = timeit.default_timer() - start
+        return {'statements': statements, 'facts': facts,
+                'rules': rules, 'derived': derived, 'seconds': seconds,
+                'rate': statements / seconds if seconds else float('inf')}
+
+    def settle(self, work, added, since):
+        """
+        Apply the rules on an agenda and the ones triggered by new facts.
+
+        Used by load for every chunk: added are the facts it added to the
+        knowledge, and since maps their signatures to the first row they
+        were added at. Returns the number of facts derived.
+        """
+        known = sum(len(consequents) for consequents in self.rules.values())
+        bulk = not self.memory and all(
+            self.datalog_rule(e) for e in work.queue) and \
+            known == len(list(self.datalog_rules()))
+
+        if self.chaining and not bulk:
+            for fact in added:
+                self.fire(fact, work)
+            return self.chain(work)
+
+        new = len(work)
+        chaining, self.chaining = self.chaining, False
+        try:
+            self.chain(work)
+        finally:
+            self.chaining = chaining
+
+        if not chaining or not self.rules:
+            return 0
+
+        return self.saturate() if new else self.saturate(since=since)
+
+    def save(self, path):
+        """
+        Write the knowledge, rules and memories to a binary snapshot.
+
+        See the snapshot module for the format.
+
+        >>> import os
+        >>> import tempfile
+        >>> b = Brain()
+        >>> b.learn(b.parser.parse('Parent(X, Y) > Ancestor(X, Y)'))
+        0
+        >>> b.learn(b.parser.parse('Parent(ana, bob) & Rain()'))
+        3
+        >>> handle, path = tempfile.mkstemp()
+        >>> os.close(handle)
+        >>> b.save(path)
+        >>> c = Brain()
+        >>> c.load_snapshot(path)
+        >>> len(c.knowledge), len(c.knowledge.pending), len(c.rules)
+        (3, 3, 1)
+        >>> c.eval(c.parser.parse('Ancestor(ana, bob)'))
+        True
+        >>> c.learn(c.parser.parse('Parent(bob, cid)'))
+        2
+        >>> c.forget(c.parser.parse('Parent(ana, bob)'))
+        2
+        >>> os.remove(path)
+        """
+        snapshot.save(self, path)
+
+    def load_snapshot(self, path):
+        """
+        Load a snapshot written by save into this brain.
+
+        The brain must be empty. Facts are only read from the file once
+        they are needed.
+        """
+        snapshot.load(self, path)
+        self.evaluations.clear()
+
+    def recover(self, path, snapshot_path=None, group=journal.GROUP,
+                delay=None):
+        """
+        Recover an empty brain from a journal, and log every change to it.
+
+        If snapshot_path names a snapshot saved by checkpoint, it is loaded
+        first, and the journal is only replayed if it was started after
+        the snapshot. From then on, every learn, add_rule, add_memory,
+        forget and load is appended to the journal before it is applied,
+        with group commit: see the journal module for group and delay.
+        Returns the number of records replayed.
+
+        >>> import os
+        >>> import tempfile
+        >>> directory = tempfile.mkdtemp()
+        >>> log = os.path.join(directory, 'brain.log')
+        >>> image = os.path.join(directory, 'brain.snapshot')
+        >>> b = Brain()
+        >>> b.recover(log, image, group=1)
+        0
+        >>> b.learn(b.parser.parse('Parent(X, Y) > Ancestor(X, Y)'))
+        0
+        >>> b.learn(b.parser.parse('Parent(ana, bob) & Parent(bob, cid)'))
+        4
+        >>> b.checkpoint(image)
+        >>> b.forget(b.parser.parse('Parent(ana, bob)'))
+        2
+        >>> b.add_memory(b.parser.parse('Rain()'),
+        ...              b.parser.parse('Parent(bob, cid)'))
+        >>> c = Brain()
+        >>> c.recover(log, image)
+        2
+        >>> sorted(str(fact) for fact in c.knowledge)
+        ['Ancestor(bob, cid)', 'Parent(bob, cid)']
+        >>> len(c.rules), len(c.memory)
+        (1, 1)
+        >>> c.close()
+        >>> b.close()
+        >>> for name in os.listdir(directory):
+        ...     os.remove(os.path.join(directory, name))
+        >>> os.rmdir(directory)
+        """
+        generation = 0
+        if snapshot_path is not None and os.path.exists(snapshot_path):
+            generation = snapshot.load(self, snapshot_path)
+            self.evaluations.clear()
+
+        log = journal.Journal(path, group, delay)
+        replayed = 0
+        if log.generation >= generation:
+            replayed = log.replay(self)
+        else:
+            log.reset(generation)
+
+        self.journal = log
+        return replayed
+
+    def checkpoint(self, path):
+        """
+        Save a snapshot to path, and start the journal afresh.
+
+        Recovering from the snapshot and the journal then only replays the
+        changes made after the checkpoint.
+        """
+        if self.journal is None:
+            raise Exception('Checkpoints need a journal, see recover')
+
+        self.journal.commit()
+        generation = self.journal.generation + 1
+        snapshot.save(self, path, generation)
+        self.journal.reset(generation)
+
+    def log(self, operation, *exprs):
+        """Append an operation to the journal, if there is one."""
+        if self.journal is not None:
+            self.journal.append(operation, *exprs)
+
+    def commit(self):
+        """Write the changes logged so far to disk, if there is a journal."""
+        if self.journal is not None:
+            self.journal.commit()
+
+    def close(self):
+        """Commit and close the journal, if there is one, to stop logging."""
+        if self.journal is not None:
+            self.journal.close()
+            self.journal = None
+
+    def datalog_rule(self, e):
+        """Check whether an expression is a rule saturate can evaluate."""
+        return e.type() == 'Implication' and \
+            self.rete.conjuncts(e.expr1) is not None and \
+            self.rete.conjuncts(e.expr2) is not None
+
+    def statements(self, source, chunk=1000):
+        """
+        Get the simplified expressions of a file, in lists of up to chunk.
+
+        Raises an Exception naming the first line that can't be parsed.
+        """
+        if not hasattr(source, 'read'):
+            with open(source) as f:
+                for batch in self.statements(f, chunk):
+                    yield batch
+            return
+
+        lines = ((number, line.strip())
+                 for number, line in enumerate(source, 1))
+        lines = ((number, line) for number, line in lines
+                 if line and line[0] != '#')
+
+        while True:
+            parsed = []
+            for number, line in itertools.islice(lines, chunk):
+                e = self.parser.parse(line)
+                if e is None:
+                    raise Exception('Cannot parse line %d: %s' % (number,
+                                                                  line))
+                parsed.append(self.simplifier.simplify(e))
+
+            if not parsed:
+                return
+            yield parsed
+
+    def atoms(self, e):
+        """Get the atomic expressions conjoined in e, leaving out rules."""
+        atoms = []
+        stack = [e]
+        while stack:
+            e = stack.pop()
+            if e.type() == 'Conjunction':
+                stack.extend(reversed(e.exprs))
+            elif e.type() == 'Atomic':
+                atoms.append(e)
+
+        return atoms
+
+    def forget(self, e):
+        """
+        Retract the facts conjoined in e, and what no longer follows.
+
+        Facts are deleted and rederived (DRed): every fact derived through
+        a forgotten one by the compiled rules is deleted, unless it was
+        learnt itself, and then the deleted facts that still follow from
+        the remaining ones are added back. Only the facts reachable from
+        the forgotten ones are looked at. The consequents of rules which
+        can't be compiled, and derived rules, are kept.
+        Returns the number of facts removed.
+
+        >>> b = Brain()
+        >>> b.learn(b.parser.parse('Parent(X, Y) > Ancestor(X, Y)'))
+        0
+        >>> b.learn(b.parser.parse(
+        ...     'Parent(X, Y) & Ancestor(Y, Z) > Ancestor(X, Z)'))
+        0
+        >>> b.learn(b.parser.parse(
+        ...     'Parent(ana, bob) & Parent(bob, cid) & Parent(ana, cid)'))
+        6
+        >>> b.forget(b.parser.parse('Parent(bob, cid)'))
+        2
+        >>> b.eval(b.parser.parse('Ancestor(bob, cid)'))
+        False
+        >>> b.eval(b.parser.parse('Ancestor(ana, cid)'))
+        True
+        >>> b.forget(b.parser.parse('Ancestor(ana, bob)'))
+        0
+
+        >>> b = Brain()
+        >>> for i in range(5000):
+        ...     _ = b.learn(b.parser.parse('P(c%d) > P(c%d)' % (i, i + 1)))
+        >>> b.learn(b.parser.parse('P(c0) & P(c4000)'))
+        5001
+        >>> b.forget(b.parser.parse('P(c0)'))
+        4000
+        >>> len(b.knowledge)
+        1001
+        """
+        e = self.simplifier.simplify(e)
+        self.log(journal.FORGET, e)
+        facts = [fact for fact in self.atoms(e) if fact in self.knowledge]
+
+        deleted = set()
+        while facts:
+            fact = facts.pop()
+            if fact in deleted:
+                continue
+
+            deleted.add(fact)
+            for atom in self.consequences(fact):
+                if atom in self.knowledge and \
+                        not self.knowledge.is_asserted(atom):
+                    facts.append(atom)
+
+        for fact in deleted:
+            self.knowledge.discard(fact)
+            self.invalidate(fact)
+        self.prover.reset()
+
+        rederived = [fact for fact in deleted if self.supported(fact)]
+        while rederived:
+            fact = rederived.pop()
+            if not self.knowledge.add(fact):
+                continue
+
+            deleted.discard(fact)
+            for atom in self.consequences(fact):
+                if atom in deleted and atom not in self.knowledge:
+                    rederived.append(atom)
+
+        return len(deleted)
+
+    def consequences(self, fact):
+        """Get the facts derived by the rules that a fact in them fires."""
+        for production, bindings, _ in self.rete.activate(fact,
+                                                          self.knowledge):
+            heads = self.rete.conjuncts(self.instantiate(
+                production.consequent, bindings))
+            for atom in heads or ():
+                yield atom
+
+    def supported(self, fact):
+        """Check whether a compiled rule derives a fact from the knowledge."""
+        for head, body in self.prover.rules_for(fact.signature()):
+            bindings = head.match(fact)
+            if bindings is None:
+                continue
+
+            partial = [bindings]
+            pending = list(body)
+            while partial and pending:
+                pattern = min(pending, key=lambda p: len(
+                    self.knowledge.candidates(p.substitute(bindings))))
+                pending.remove(pattern)
+                partial = [result for bindings in partial
+                           for _, result in self.knowledge.match(pattern,
+                                                                 bindings)]
+                bindings = partial[0] if partial else None
+
+            if partial:
+                return True
+
+        return False
+
+    def chain(self, work):
+        """
+        Learn every expression on the work agenda, until it is empty.
+
+        Returns the number of new facts.
+
+        A disjunction is learnt as one rule per disjunct, whose antecedent
+        is the negation of the others, so only one disjunct is derived.
+
+        >>> b = Brain()
+        >>> b.learn(b.parser.parse('P(a) | Q(a)'))
+        1
+        >>> b.eval(b.parser.parse('P(a) & Q(a)'))
+        False
+        >>> b.learn(b.parser.parse('R(a) | S(a) | T(a)'))
+        1
+        """
+        derived = 0
+
+        while work:
+            if not work.ready():
+                antecedent, consequent = work.resume()
+                if self.eval(antecedent):
+                    work.push(consequent)
+                continue
+
+            e = work.pop()
+
+            if e.type() == 'Conjunction':
+                for conjunct in e.exprs:
+                    work.push(conjunct)
+
+            elif e.type() == 'Atomic':
+                if self.add_atomic(e, work):
+                    derived += 1
+
+            elif e.type() == 'Implication':
+                self.add_rule(e.expr1, e.expr2, work)
+
+            elif e.type() == 'Disjunction':
+                simplify = self.simplifier.simplify
+                for i, disjunct in enumerate(e.exprs):
+                    others = self.factory.disjunction(*(e.exprs[:i] +
+                                                        e.exprs[i + 1:]))
+                    self.add_rule(simplify(self.factory.negation(others)),
+                                  disjunct, work)
+
+            else:
+                print('None')
+
+        return derived
+
+    def saturate(self, facts=None, since=None):
+        """
+        Add every fact that follows from the compiled rules, in bulk.
+
+        Instead of chaining one fact at a time, the rules of the Rete
+        network whose consequents are atomic expressions or conjunctions
+        of them are evaluated semi-naively by a columnar.Engine, which
+        joins each round's delta in one batch, starting from the given
+        facts already in the knowledge, or all of them. since may instead
+        map signatures to the first row of their tables to start from, as
+        load does: see columnar.Engine.derive. The facts derived are added
+        to the knowledge by their codes, without being built, and the
+        prover's tables are dropped if there are any. Returns the number of
+        new facts.
+
+        >>> b = Brain()
+        >>> b.knowledge.add(b.parser.parse('Parent(ana, bob)'))
+        True
+        >>> b.knowledge.add(b.parser.parse('Parent(bob, cid)'))
+        True
+        >>> b.learn(b.parser.parse(
+        ...     'Parent(X, Y) & Parent(Y, Z) > Grandparent(X, Z)'))
+        1
+        >>> b.knowledge.add(b.parser.parse('Parent(cid, dan)'))
+        True
+        >>> b.saturate()
+        1
+        >>> b.eval(b.parser.parse('Grandparent(bob, dan)'))
+        True
+        >>> fact = b.parser.parse('Parent(dan, eve)')
+        >>> b.prove(b.parser.parse('Grandparent(cid, eve)'))
+        False
+        >>> table = b.knowledge.table(fact.signature())
+        >>> since = {fact.signature(): len(table.live)}
+        >>> b.knowledge.add(fact)
+        True
+        >>> b.saturate(since=since)
+        1
+        >>> b.prove(b.parser.parse('Grandparent(cid, eve)'))
+        True
+        """
+        engine = columnar.Engine(self.knowledge)
+        for body, heads in self.datalog_rules():
+            engine.add_rule(body, heads)
+
+        derived = 0
+        for signature, rows in engine.derive(facts, since):
+            derived += self.knowledge.extend(signature, rows)
+            self.invalidate_signature(signature)
+
+        if derived:
+            self.prover.reset()
+
+        return derived
+
+    def query(self, goal):
+        """
+        Get the facts matching an atomic goal that follow from the rules.
+
+        The compiled rules relevant to the goal are rewritten with magic
+        sets, so only the facts reachable from its constants are derived
+        instead of the whole closure. Nothing is added to the knowledge.
+
+        >>> b = Brain(chaining=False)
+        >>> for i in range(1000):
+        ...     _ = b.learn(b.parser.parse('Parent(p%d, p%d)' % (i, i + 1)))
+        >>> b.learn(b.parser.parse('Parent(X, Y) > Ancestor(X, Y)'))
+        0
+        >>> b.learn(b.parser.parse(
+        ...     'Parent(X, Y) & Ancestor(Y, Z) > Ancestor(X, Z)'))
+        0
+        >>> goal = b.parser.parse('Ancestor(p998, Y)')
+        >>> sorted(str(f) for f in b.query(goal))
+        ['Ancestor(p998, p1000)', 'Ancestor(p998, p999)']
+        """
+        planner = magic.Planner(self.datalog_rules(), self.factory)
+        return planner.query(goal, self.knowledge)
+
+    def datalog_rules(self):
+        """
+        Get the compiled rules as (body, heads) pairs of atomic patterns.
+
+        Only the rules whose consequent is an atomic expression or a
+        conjunction of them are included.
+        """
+        for production in self.rete.productions:
+            heads = self.rete.conjuncts(production.consequent)
+            if heads is not None:
+                yield production.patterns, heads
 
     def __str__(self):
         """String representation of a brain's knowledge."""
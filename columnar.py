@@ -0,0 +1,399 @@
+#!/usr/bin/python
+# -*- coding: utf8 -*-
+"""
+This module contains a Datalog engine joining whole deltas with NumPy.
+
+It evaluates the rules compiled by datalog.Rule semi-naively, like
+datalog.Engine, but every join step extends all the partial matches of a
+round at once. Relations are arrays of the argument codes given by the
+FactStore's symbols, and a step finds the rows matching a batch of keys
+by binary search over the relation's keys sorted beforehand, a sort-merge
+join, instead of looking up one hash bucket per partial match.
+
+Keys made of at most two codes are packed into one 64 bit integer, while
+wider ones are numbered through a dictionary, a row at a time. Sorted
+keys are kept in runs whose sizes at least double from the newest to the
+oldest, so adding a delta only sorts runs about its size, and a lookup
+searches a number of runs logarithmic in the size of the relation.
+"""
+import numpy
+
+import datalog
+import expressions.parser
+
+WIDTH = 31
+
+
+class Keys(object):
+    """Packs rows of codes into one integer key per row."""
+
+    def __init__(self, width):
+        """
+        Create a packer for rows of width codes.
+
+        >>> keys = Keys(2)
+        >>> keys.pack(numpy.array([[0, 1], [1, 0]])).tolist()
+        [1, 2147483648]
+        >>> keys = Keys(3)
+        >>> keys.pack(numpy.array([[5, 1, 2], [3, 3, 3], [5, 1, 2]])).tolist()
+        [0, 1, 0]
+        """
+        self.width = width
+        self.numbers = {} if width > 2 else None
+
+    def pack(self, rows, new=True):
+        """
+        Get the keys of an n x width array of codes.
+
+        If new is False, wide rows which were never numbered get key -1
+        instead of a new number.
+        """
+        if self.width == 0:
+            return numpy.zeros(len(rows), dtype=numpy.int64)
+        elif self.width == 1:
+            return rows[:, 0].astype(numpy.int64)
+        elif self.width == 2:
+            return rows[:, 0].astype(numpy.int64) << WIDTH | rows[:, 1]
+
+        numbers = self.numbers
+        rows = map(tuple, rows.tolist())
+        if new:
+            keys = [numbers.setdefault(row, len(numbers)) for row in rows]
+        else:
+            keys = [numbers.get(row, -1) for row in rows]
+
+        return numpy.array(keys, dtype=numpy.int64)
+
+
+class Index(object):
+    """The rows of a relation sorted by their keys, in runs."""
+
+    def __init__(self, positions):
+        """
+        Create an empty index on the codes at positions.
+
+        >>> index = Index((1,))
+        >>> index.add(numpy.array([[0, 7], [1, 8]]), 0)
+        >>> index.add(numpy.array([[2, 7]]), 2)
+        >>> left, right = index.lookup(numpy.array([[7], [9], [8]]))
+        >>> sorted(zip(left.tolist(), right.tolist()))
+        [(0, 0), (0, 2), (2, 1)]
+        >>> index.contains(numpy.array([[7], [9]])).tolist()
+        [True, False]
+        """
+        self.positions = list(positions)
+        self.keys = Keys(len(positions))
+        self.runs = []
+
+    def add(self, rows, start):
+        """Index rows of codes, numbered from start in the relation."""
+        keys = self.keys.pack(rows[:, self.positions])
+        order = numpy.argsort(keys, kind='mergesort')
+        self.runs.append((keys[order], order + start))
+
+        runs = self.runs
+        while len(runs) > 1 and len(runs[-2][0]) <= 2 * len(runs[-1][0]):
+            newer = runs.pop()
+            older = runs.pop()
+            keys = numpy.concatenate((older[0], newer[0]))
+            order = numpy.argsort(keys, kind='mergesort')
+            runs.append((keys[order],
+                         numpy.concatenate((older[1], newer[1]))[order]))
+
+    def lookup(self, probes):
+        """
+        Find the rows whose keys are the keys of an array of probes.
+
+        Returns the arrays left and right, where probe left[i] matches the
+        relation row right[i].
+        """
+        probes = self.keys.pack(probes, False)
+        lefts = []
+        rights = []
+        for keys, rows in self.runs:
+            low = numpy.searchsorted(keys, probes, 'left')
+            counts = numpy.searchsorted(keys, probes, 'right') - low
+            total = counts.sum()
+            if not total:
+                continue
+
+            starts = numpy.cumsum(counts) - counts
+            lefts.append(numpy.repeat(numpy.arange(len(probes)), counts))
+            rights.append(rows[numpy.repeat(low - starts, counts) +
+                               numpy.arange(total)])
+
+        if not lefts:
+            return numpy.zeros(0, dtype=numpy.int64), numpy.zeros(
+                0, dtype=numpy.int64)
+
+        return numpy.concatenate(lefts), numpy.concatenate(rights)
+
+    def contains(self, probes):
+        """Check which probes have a key in the index."""
+        probes = self.keys.pack(probes, False)
+        found = numpy.zeros(len(probes), dtype=bool)
+        for keys, _ in self.runs:
+            low = numpy.searchsorted(keys, probes, 'left')
+            found |= keys[numpy.minimum(low, len(keys) - 1)] == probes
+
+        return found
+
+
+class Relation(object):
+    """The rows of codes of one signature, with indexes on demand."""
+
+    def __init__(self, arity, rows=None):
+        """
+        Create a relation with the given n x arity array of rows.
+
+        >>> r = Relation(2, numpy.array([[0, 1], [0, 2]]))
+        >>> r.add(numpy.array([[0, 2], [3, 1], [3, 1]])).tolist()
+        [[3, 1]]
+        >>> left, right = r.join((1,), numpy.array([[1]]))
+        >>> r.rows()[right].tolist()
+        [[0, 1], [3, 1]]
+        """
+        self.arity = arity
+        self.data = numpy.zeros((16, arity), dtype=numpy.int64)
+        self.size = 0
+        self.unique = Index(range(arity))
+        self.indexes = {}
+        if rows is not None:
+            self.add(rows)
+
+    def rows(self):
+        """Get the array of every row."""
+        return self.data[:self.size]
+
+    def add(self, rows):
+        """Add an array of rows. Returns the rows which were new."""
+        if not len(rows):
+            return rows
+
+        _, first = numpy.unique(self.unique.keys.pack(rows),
+                                return_index=True)
+        rows = rows[numpy.sort(first)]
+        rows = rows[~self.unique.contains(rows)]
+        if not len(rows):
+            return rows
+
+        start = self.size
+        self.size += len(rows)
+        if self.size > len(self.data):
+            data = numpy.zeros((max(2 * len(self.data), self.size),
+                                self.arity), dtype=numpy.int64)
+            data[:start] = self.data[:start]
+            self.data = data
+        self.data[start:self.size] = rows
+
+        self.unique.add(rows, start)
+        for index in self.indexes.values():
+            index.add(rows, start)
+
+        return rows
+
+    def join(self, positions, probes):
+        """
+        Find the rows whose codes at positions are the rows of probes.
+
+        Returns the arrays left and right, where probe left[i] matches the
+        relation row right[i]. With no positions, every probe matches
+        every row.
+        """
+        if not positions:
+            return (numpy.repeat(numpy.arange(len(probes)), self.size),
+                    numpy.tile(numpy.arange(self.size), len(probes)))
+
+        index = self.indexes.get(positions)
+        if index is None:
+            index = self.indexes[positions] = Index(positions)
+            if self.size:
+                index.add(self.rows(), 0)
+
+        return index.lookup(probes)
+
+
+class Engine(object):
+    """Semi-naive bottom-up evaluation of rules over a FactStore, in bulk."""
+
+    def __init__(self, knowledge):
+        """
+        Create a new engine over the facts in a FactStore, without rules.
+
+        Relations are loaded from the store's columns the first time a rule
+        needs them, and derived facts are not added to it: that is up to
+        the caller, with the rows returned by derive, or the facts
+        returned by evaluate.
+        """
+        self.knowledge = knowledge
+        self.relations = {}
+        self.rules = []
+
+    def add_rule(self, body, heads):
+        """Add a rule with atomic body patterns and atomic heads."""
+        self.rules.append(datalog.Rule(body, heads,
+                                       self.knowledge.symbols.encode))
+
+    def relation(self, signature):
+        """Get the relation for a signature, loading it if needed."""
+        relation = self.relations.get(signature)
+        if relation is None:
+            table = self.knowledge.table(signature)
+            rows = None if table is None else table.codes()
+            relation = self.relations[signature] = Relation(signature[1],
+                                                            rows)
+
+        return relation
+
+    def fire(self, rule, rows, position):
+        """
+        Join rows for a rule's body pattern with the other relations.
+
+        rows is an array of rows for the pattern at position in the body.
+
+        Yields the (signature, rows) of the heads derived.
+        """
+        plan = rule.plans[position]
+        first = plan[0]
+        keep = numpy.ones(len(rows), dtype=bool)
+        for i, (_, value) in zip(first.positions, first.key):
+            keep &= rows[:, i] == value
+        for i, j in first.checks:
+            keep &= rows[:, i] == rows[:, j]
+
+        rows = rows[keep]
+        bindings = numpy.zeros((len(rows), rule.sizes[position]),
+                               dtype=numpy.int64)
+        for i, slot in first.outputs:
+            bindings[:, slot] = rows[:, i]
+
+        for step in plan[1:]:
+            if not len(bindings):
+                return
+
+            probes = numpy.zeros((len(bindings), len(step.key)),
+                                 dtype=numpy.int64)
+            for column, (is_slot, value) in enumerate(step.key):
+                probes[:, column] = bindings[:, value] if is_slot else value
+
+            relation = self.relation(step.signature)
+            left, right = relation.join(step.positions, probes)
+            rows = relation.rows()[right]
+            keep = numpy.ones(len(rows), dtype=bool)
+            for i, j in step.checks:
+                keep &= rows[:, i] == rows[:, j]
+
+            rows = rows[keep]
+            bindings = bindings[left[keep]]
+            for i, slot in step.outputs:
+                bindings[:, slot] = rows[:, i]
+
+        if not len(bindings):
+            return
+
+        for signature, arguments in rule.outputs[position]:
+            heads = numpy.zeros((len(bindings), len(arguments)),
+                                dtype=numpy.int64)
+            for column, (is_slot, value) in enumerate(arguments):
+                heads[:, column] = bindings[:, value] if is_slot else value
+            yield signature, heads
+
+    def derive(self, facts=None, since=None):
+        """
+        Compute every fact that follows from the rules, as rows of codes.
+
+        facts are the facts to start from, or all the facts in knowledge
+        if not given. Those not in knowledge are only added to the engine's
+        relations. Instead of facts, since may map signatures to the first
+        row of their tables to start from, so the facts added to knowledge
+        since then are never built nor encoded again. Returns a list of
+        (signature, rows) with the arrays of codes of the new facts.
+        """
+        delta = {}
+        if since is not None:
+            for signature, start in since.items():
+                table = self.knowledge.table(signature)
+                if table is not None:
+                    delta[signature] = table.codes(start)
+        elif facts is None:
+            signatures = set(pattern.signature() for rule in self.rules
+                             for pattern in rule.body)
+            for signature in signatures:
+                delta[signature] = self.relation(signature).rows()
+        else:
+            seeds = {}
+            encode = self.knowledge.symbols.encode
+            for fact in facts:
+                seeds.setdefault(fact.signature(), []).append(
+                    [encode(x) for x in fact.arguments])
+            for signature, rows in seeds.items():
+                rows = numpy.array(rows, dtype=numpy.int64).reshape(
+                    len(rows), signature[1])
+                self.relation(signature).add(rows)
+                delta[signature] = rows
+
+        derived = []
+        while delta:
+            new = {}
+            for rule in self.rules:
+                for position, pattern in enumerate(rule.body):
+                    rows = delta.get(pattern.signature())
+                    if rows is None or not len(rows):
+                        continue
+
+                    for signature, heads in self.fire(rule, rows, position):
+                        new.setdefault(signature, []).append(heads)
+
+            delta = {}
+            for signature, batches in new.items():
+                rows = self.relation(signature).add(
+                    numpy.concatenate(batches))
+                if len(rows):
+                    delta[signature] = rows
+                    derived.append((signature, rows))
+
+        return derived
+
+    def evaluate(self, facts=None):
+        """
+        Compute every fact that follows from the rules.
+
+        Like derive, but returns the list of new facts, built as canonical
+        atomic expressions by the store.
+
+        >>> import factstore
+        >>> p = expressions.parser.Parser()
+        >>> k = factstore.FactStore()
+        >>> for i in range(4):
+        ...     _ = k.add(p.parse('Edge(n%d, n%d)' % (i, i + 1)))
+        >>> e = Engine(k)
+        >>> e.add_rule([p.parse('Edge(X, Y)')], [p.parse('Path(X, Y)')])
+        >>> e.add_rule([p.parse('Path(X, Y)'), p.parse('Edge(Y, Z)')],
+        ...            [p.parse('Path(X, Z)')])
+        >>> paths = e.evaluate()
+        >>> len(paths)
+        10
+        >>> p.parse('Path(n0, n4)') in paths
+        True
+        >>> _ = k.add(p.parse('Edge(n4, n5)'))
+        >>> len(e.evaluate([p.parse('Edge(n4, n5)')]))
+        5
+        >>> e.add_rule([p.parse('Edge(X, X)'), p.parse('Edge(n1, Y)')],
+        ...            [p.parse('Loop(X, Y, c)')])
+        >>> sorted(str(f) for f in e.evaluate([p.parse('Edge(n9, n9)')]))
+        ['Loop(n9, n2, c)', 'Path(n9, n9)']
+        """
+        return [self.knowledge.build(signature[0], row)
+                for signature, rows in self.derive(facts)
+                for row in rows.tolist()]
+
+
+def test():
+    """Test the module."""
+    print('Testing')
+    import doctest
+    doctest.testmod()
+    print('Done')
+
+if __name__ == '__main__':
+    test()
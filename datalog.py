@@ -0,0 +1,312 @@
+#!/usr/bin/python
+# -*- coding: utf8 -*-
+"""
+This module contains a bottom-up Datalog engine for the brain's rules.
+
+Rules are conjunctions of atomic patterns implying atomic heads, and facts
+are ground atomic expressions. The engine computes the fixpoint of the
+rules by semi-naive evaluation: every round only joins the facts derived
+in the previous round (the delta) with the rest, so each derivation is
+found a bounded number of times. Joins are hash joins over relations of
+argument tuples, indexed on the positions each join step looks up.
+"""
+import expressions.factory
+import expressions.parser
+import expressions.variable
+import rete
+
+
+class Relation(object):
+    """The argument tuples of one signature, with hash indexes on demand."""
+
+    def __init__(self, rows=()):
+        """
+        Create a new relation with the given rows.
+
+        >>> r = Relation([('a', 'b'), ('a', 'c')])
+        >>> sorted(r.lookup((0,), ('a',)))
+        [('a', 'b'), ('a', 'c')]
+        >>> r.add(('d', 'b'))
+        True
+        >>> sorted(r.lookup((1,), ('b',)))
+        [('a', 'b'), ('d', 'b')]
+        """
+        self.rows = set(rows)
+        self.indexes = {}
+
+    def add(self, row):
+        """Add a row, updating the indexes. Returns whether it was new."""
+        if row in self.rows:
+            return False
+
+        self.rows.add(row)
+        for positions, index in self.indexes.items():
+            key = tuple(row[i] for i in positions)
+            bucket = index.get(key)
+            if bucket is None:
+                index[key] = [row]
+            else:
+                bucket.append(row)
+
+        return True
+
+    def lookup(self, positions, key):
+        """Get the rows whose values at positions are equal to key."""
+        if not positions:
+            return self.rows
+
+        index = self.indexes.get(positions)
+        if index is None:
+            index = self.indexes[positions] = {}
+            for row in self.rows:
+                k = tuple(row[i] for i in positions)
+                bucket = index.get(k)
+                if bucket is None:
+                    index[k] = [row]
+                else:
+                    bucket.append(row)
+
+        return index.get(key, ())
+
+
+class Step(object):
+    """One atomic pattern of a rule body, compiled for a join."""
+
+    def __init__(self, pattern, slots, encode):
+        """
+        Compile a pattern given the slots of the variables bound before it.
+
+        New variables are given a slot in slots, which is updated, and
+        constants are encoded with the encode function.
+        """
+        self.signature = pattern.signature()
+        self.positions = []
+        self.key = []
+        self.outputs = []
+        self.checks = []
+
+        own = {}
+        for position, x in enumerate(pattern.arguments):
+            if not isinstance(x, expressions.variable.Variable):
+                self.positions.append(position)
+                self.key.append((False, encode(x)))
+            elif x in own:
+                self.checks.append((own[x], position))
+            elif x in slots:
+                self.positions.append(position)
+                self.key.append((True, slots[x]))
+            else:
+                own[x] = position
+                slots[x] = len(slots)
+                self.outputs.append((position, slots[x]))
+
+        self.positions = tuple(self.positions)
+
+    def key_for(self, bindings):
+        """Get the lookup key of this step for the given bindings."""
+        return tuple(bindings[value] if is_slot else value
+                     for is_slot, value in self.key)
+
+    def extend(self, row, bindings):
+        """Bind the new variables of this step to a row, or return None."""
+        for i, j in self.checks:
+            if row[i] != row[j]:
+                return None
+
+        bindings = list(bindings)
+        for position, slot in self.outputs:
+            bindings[slot] = row[position]
+
+        return bindings
+
+
+class Rule(object):
+    """A rule compiled into one join plan per body pattern."""
+
+    def __init__(self, body, heads, encode=lambda x: x):
+        """
+        Compile body patterns -> heads.
+
+        For each body pattern, the plan starts with that pattern, which is
+        fed from the delta, and follows the join order of rete.Production.
+        Constants are encoded with the encode function, like the rows.
+
+        >>> p = expressions.parser.Parser()
+        >>> rule = Rule([p.parse('E(X, Y)'), p.parse('P(Y, Z)')],
+        ...             [p.parse('P(X, Z)')])
+        >>> [step.positions for step in rule.plans[0]]
+        [(), (0,)]
+        """
+        self.body = tuple(body)
+        self.heads = tuple(heads)
+        production = rete.Production(body, None)
+
+        self.plans = []
+        self.sizes = []
+        self.outputs = []
+        for position in range(len(self.body)):
+            slots = {}
+            plan = [Step(self.body[i], slots, encode)
+                    for i in (position,) + production.orders[position]]
+            self.plans.append(plan)
+            self.sizes.append(len(slots))
+            self.outputs.append([
+                (head.signature(), [(True, slots[x]) if x in slots
+                                    else (False, encode(x))
+                                    for x in head.arguments])
+                for head in self.heads])
+
+    def fire(self, relation_for, rows, position):
+        """
+        Join rows for the body pattern at position with the other relations.
+
+        relation_for is a function returning the relation for a signature.
+
+        Yields the (signature, row) of every head derived.
+        """
+        plan = self.plans[position]
+        first = plan[0]
+        empty = [None] * self.sizes[position]
+
+        partial = []
+        for row in rows:
+            if all(row[i] == value for i, (_, value) in
+                   zip(first.positions, first.key)):
+                bindings = first.extend(row, empty)
+                if bindings is not None:
+                    partial.append(bindings)
+
+        for step in plan[1:]:
+            relation = relation_for(step.signature)
+            extended = []
+            for bindings in partial:
+                for row in relation.lookup(step.positions,
+                                           step.key_for(bindings)):
+                    result = step.extend(row, bindings)
+                    if result is not None:
+                        extended.append(result)
+
+            partial = extended
+            if not partial:
+                return
+
+        for signature, arguments in self.outputs[position]:
+            for bindings in partial:
+                yield signature, tuple(bindings[value] if is_slot else value
+                                       for is_slot, value in arguments)
+
+
+class Engine(object):
+    """Semi-naive bottom-up evaluation of rules over a FactStore."""
+
+    def __init__(self, knowledge, factory=None):
+        """
+        Create a new engine over the facts in knowledge, without rules.
+
+        Relations are loaded from knowledge the first time a rule needs
+        them, and derived facts are not added to it: that is up to the
+        caller, with the facts returned by evaluate.
+
+        Rows are tuples of the integer codes the store's symbol table gives
+        to constants, so that hashing and comparing them doesn't call back
+        into Python, and the store's rows are read without building facts.
+        """
+        self.knowledge = knowledge
+        if factory is None:
+            factory = expressions.factory.default_factory
+        self.factory = factory
+        self.relations = {}
+        self.rules = []
+
+    def add_rule(self, body, heads):
+        """Add a rule with atomic body patterns and atomic heads."""
+        self.rules.append(Rule(body, heads, self.knowledge.symbols.encode))
+
+    def relation(self, signature):
+        """Get the relation for a signature, loading it if needed."""
+        relation = self.relations.get(signature)
+        if relation is None:
+            table = self.knowledge.table(signature)
+            rows = () if table is None else table.codes().tolist()
+            relation = self.relations[signature] = Relation(
+                tuple(row) for row in rows)
+
+        return relation
+
+    def evaluate(self, facts=None):
+        """
+        Compute every fact that follows from the rules.
+
+        facts are the facts to start from, or all the facts in knowledge
+        if not given. Those not in knowledge are only added to the engine's
+        relations, so they can seed the evaluation without being stored.
+        Returns the list of new facts, as canonical atomic expressions.
+
+        >>> import factstore
+        >>> p = expressions.parser.Parser()
+        >>> k = factstore.FactStore()
+        >>> for i in range(4):
+        ...     _ = k.add(p.parse('Edge(n%d, n%d)' % (i, i + 1)))
+        >>> e = Engine(k)
+        >>> e.add_rule([p.parse('Edge(X, Y)')], [p.parse('Path(X, Y)')])
+        >>> e.add_rule([p.parse('Path(X, Y)'), p.parse('Edge(Y, Z)')],
+        ...            [p.parse('Path(X, Z)')])
+        >>> paths = e.evaluate()
+        >>> len(paths)
+        10
+        >>> p.parse('Path(n0, n4)') in paths
+        True
+        >>> _ = k.add(p.parse('Edge(n4, n5)'))
+        >>> len(e.evaluate([p.parse('Edge(n4, n5)')]))
+        5
+        """
+        delta = {}
+        if facts is None:
+            signatures = set(pattern.signature() for rule in self.rules
+                             for pattern in rule.body)
+            for signature in signatures:
+                delta[signature] = set(self.relation(signature).rows)
+        else:
+            encode = self.knowledge.symbols.encode
+            for fact in facts:
+                row = tuple(map(encode, fact.arguments))
+                self.relation(fact.signature()).add(row)
+                delta.setdefault(fact.signature(), set()).add(row)
+
+        derived = []
+        terms = self.knowledge.symbols.terms
+        while delta:
+            new = {}
+            for rule in self.rules:
+                for position, pattern in enumerate(rule.body):
+                    rows = delta.get(pattern.signature())
+                    if not rows:
+                        continue
+
+                    for signature, row in rule.fire(self.relation, rows,
+                                                    position):
+                        if row not in self.relation(signature).rows:
+                            new.setdefault(signature, set()).add(row)
+
+            for signature, rows in new.items():
+                relation = self.relation(signature)
+                predicate = signature[0]
+                for row in rows:
+                    relation.add(row)
+                    derived.append(self.factory.atomic(
+                        predicate, *[terms[code] for code in row]))
+
+            delta = new
+
+        return derived
+
+
+def test():
+    """Test the module."""
+    print('Testing')
+    import doctest
+    doctest.testmod()
+    print('Done')
+
+if __name__ == '__main__':
+    test()
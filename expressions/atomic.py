@@ -3,11 +3,14 @@
 """This module contains the Atomic expression class."""
 from __future__ import unicode_literals
 import expression
+import variable
 
 
 class Atomic(expression.Expression):
     """Atomic expression class. Represents a simple statement."""
 
+    __slots__ = ('predicate', 'arguments')
+
     def __init__(self, p, *x):
         """
         Create a new atomic expression with given predicate and arguments.
@@ -26,6 +29,7 @@ class Atomic(expression.Expression):
         """
         self.predicate = p
         self.arguments = x
+        self._hash = hash((self.__class__, p, x))
 
     def eval(self, knowledge={}):
         """
@@ -47,6 +51,91 @@ class Atomic(expression.Expression):
         """
         return self in knowledge
 
+    def is_ground(self):
+        """
+        Check whether this atomic expression has no variable arguments.
+
+        >>> import constant
+        >>> import predicate
+        >>> p = predicate.Predicate('P')
+        >>> Atomic(p, constant.Constant('c')).is_ground()
+        True
+        >>> x = variable.Variable('X')
+        >>> Atomic(p, constant.Constant('c'), x).is_ground()
+        False
+        """
+        return not any(isinstance(x, variable.Variable)
+                       for x in self.arguments)
+
+    def signature(self):
+        """
+        Get the (predicate, arity) pair identifying this kind of statement.
+
+        >>> import constant
+        >>> import predicate
+        >>> p = predicate.Predicate('P')
+        >>> a = Atomic(p, constant.Constant('c'), variable.Variable('X'))
+        >>> a.signature() == (p, 2)
+        True
+        """
+        return (self.predicate, len(self.arguments))
+
+    def match(self, other, bindings=None):
+        """
+        Match this expression, as a pattern, against another atomic one.
+
+        Variables in this expression are bound to the arguments in the same
+        position of the other one. Returns the resulting bindings, extending
+        the given ones, or None if the expressions don't match.
+
+        >>> import constant
+        >>> import predicate
+        >>> p = predicate.Predicate('P')
+        >>> a, b = constant.Constant('a'), constant.Constant('b')
+        >>> x = variable.Variable('X')
+        >>> bindings = Atomic(p, x, b).match(Atomic(p, a, b))
+        >>> print(bindings[x])
+        a
+        >>> Atomic(p, x, x).match(Atomic(p, a, b))
+        >>> Atomic(p, x, b).match(Atomic(p, a, b), {x: b})
+
+        Terms are compared by equality, so they need not be the same objects.
+
+        >>> q = Atomic(predicate.Predicate('P'), x, constant.Constant('b'))
+        >>> print(q.match(Atomic(p, a, b))[x])
+        a
+        >>> print(q.match(Atomic(p, a, b), {variable.Variable('X'): a})[x])
+        a
+        """
+        if self.predicate != other.predicate or\
+                len(self.arguments) != len(other.arguments):
+            return None
+
+        bindings = dict(bindings) if bindings else {}
+        for x, y in zip(self.arguments, other.arguments):
+            if isinstance(x, variable.Variable):
+                bound = bindings.setdefault(x, y)
+                if bound is not y and bound != y:
+                    return None
+            elif x is not y and x != y:
+                return None
+
+        return bindings
+
+    def substitute(self, bindings):
+        """
+        Replace the variables in this expression by their bound values.
+
+        >>> import constant
+        >>> import predicate
+        >>> p = predicate.Predicate('P')
+        >>> x, y = variable.Variable('X'), variable.Variable('Y')
+        >>> print(Atomic(p, x, y).substitute({x: constant.Constant('a')}))
+        P(a, Y)
+        """
+        return Atomic(self.predicate, *[bindings.get(x, x)
+                                        for x in self.arguments])
+
     def __str__(self):
         """
         String representation to print.
@@ -81,14 +170,18 @@ class Atomic(expression.Expression):
         >>> a == b
         True
         """
+        if self is other:
+            return True
+
         if other.type() == self.type():
-            return self.predicate == other.predicate and\
+            return self._hash == other._hash and\
+                self.predicate == other.predicate and\
                 self.arguments == other.arguments
         return False
 
     def __hash__(self):
-        """Get the hash of this atomic expression."""
-        return hash((type(self), self.predicate, self.arguments))
+        """Get the hash of this atomic expression, computed on creation."""
+        return self._hash
 
 
 def test():
@@ -0,0 +1,210 @@
+#!/usr/bin/python
+# -*- coding: utf8 -*-
+"""
+This module contains the BDD class, which compiles expressions to ROBDDs.
+
+A reduced ordered binary decision diagram represents a boolean function of
+the atoms as a graph: each node tests one atom and has a low and a high
+child, for when it is false and true, down to the 0 and 1 leaves. Atoms are
+tested in a fixed order, the order in which they were first compiled, and
+nodes are shared through a unique table, so every function has a single
+node: two expressions are equivalent exactly when they compile to the same
+node. Evaluating a compiled expression follows one path from its node to a
+leaf, testing each atom at most once.
+
+Nodes are integers: 0 and 1 are the leaves, and the others index the
+levels, lows and highs lists of the BDD.
+"""
+from __future__ import unicode_literals
+import expression
+
+
+class BDD(object):
+    """A manager of shared ROBDD nodes, with a unique table and ITE cache."""
+
+    LEAF = float('inf')
+
+    def __init__(self):
+        """
+        Create a manager with only the two leaves.
+
+        >>> b = BDD()
+        >>> len(b.levels)
+        2
+        """
+        self.levels = [self.LEAF, self.LEAF]
+        self.lows = [None, None]
+        self.highs = [None, None]
+        self.unique = {}
+        self.computed = {}
+        self.atoms = []
+        self.variables = {}
+        self.compiled = {}
+
+    def node(self, level, low, high):
+        """Get the node testing the atom at level, creating it if needed."""
+        if low == high:
+            return low
+
+        key = (level, low, high)
+        node = self.unique.get(key)
+        if node is None:
+            node = self.unique[key] = len(self.levels)
+            self.levels.append(level)
+            self.lows.append(low)
+            self.highs.append(high)
+
+        return node
+
+    def variable(self, atom):
+        """Get the node of an atom, giving it the next level if new."""
+        level = self.variables.get(atom)
+        if level is None:
+            level = self.variables[atom] = len(self.atoms)
+            self.atoms.append(atom)
+
+        return self.node(level, 0, 1)
+
+    def ite(self, f, g, h):
+        """
+        Get the node of if f then g else h.
+
+        The cofactors are computed with an explicit stack rather than by
+        recursion, and every result is kept in the computed cache.
+
+        >>> b = BDD()
+        >>> x, y = b.variable('x'), b.variable('y')
+        >>> b.ite(x, y, 0) == b.ite(y, x, 0)
+        True
+        >>> b.ite(x, 1, b.ite(x, 0, 1))
+        1
+        """
+        levels, lows, highs = self.levels, self.lows, self.highs
+        computed = self.computed
+        results = []
+        stack = [(f, g, h)]
+
+        while stack:
+            frame = stack.pop()
+            if len(frame) == 2:
+                key, level = frame
+                high = results.pop()
+                low = results.pop()
+                result = computed[key] = self.node(level, low, high)
+                results.append(result)
+                continue
+
+            f, g, h = frame
+            if f == 1 or g == h:
+                results.append(g)
+            elif f == 0:
+                results.append(h)
+            elif g == 1 and h == 0:
+                results.append(f)
+            elif frame in computed:
+                results.append(computed[frame])
+            else:
+                level = min(levels[f], levels[g], levels[h])
+                cofactors = [(lows[x], highs[x]) if levels[x] == level
+                             else (x, x) for x in frame]
+                stack.append((frame, level))
+                stack.append(tuple(high for _, high in cofactors))
+                stack.append(tuple(low for low, _ in cofactors))
+
+        return results[0]
+
+    def compile(self, e):
+        """
+        Get the node of an expression.
+
+        >>> import atomic
+        >>> import conjunction
+        >>> import disjunction
+        >>> import negation
+        >>> import predicate
+        >>> import constant
+        >>> a = atomic.Atomic(predicate.Predicate('P'), constant.Constant('a'))
+        >>> b = atomic.Atomic(predicate.Predicate('P'), constant.Constant('b'))
+        >>> m = BDD()
+        >>> m.compile(disjunction.Disjunction(a, negation.Negation(a)))
+        1
+        >>> e = negation.Negation(conjunction.Conjunction(a, b))
+        >>> m.compile(e) == m.compile(disjunction.Disjunction(
+        ...     negation.Negation(b), negation.Negation(a)))
+        True
+        """
+        compiled = self.compiled
+        root = e
+        for e in expression.postorder(e, compiled):
+            if e in compiled:
+                continue
+
+            kind = e.type()
+            if kind == 'Atomic':
+                compiled[e] = self.variable(e)
+                continue
+            elif kind == 'Tautology':
+                compiled[e] = 1
+                continue
+            elif kind == 'Contradiction':
+                compiled[e] = 0
+                continue
+
+            if kind == 'Negation':
+                compiled[e] = self.ite(compiled[e.expr], 0, 1)
+                continue
+
+            if kind == 'Implication':
+                compiled[e] = self.ite(compiled[e.expr1], compiled[e.expr2], 1)
+                continue
+
+            children = e.children()
+            x = compiled[children[0]]
+            for child in children[1:]:
+                if kind == 'Conjunction':
+                    x = self.ite(x, compiled[child], 0)
+                else:
+                    x = self.ite(x, 1, compiled[child])
+            compiled[e] = x
+
+        return compiled[root]
+
+    def evaluate(self, node, knowledge):
+        """
+        Evaluate a node given the set of atoms which are true.
+
+        >>> import atomic
+        >>> import implication
+        >>> import predicate
+        >>> import constant
+        >>> a = atomic.Atomic(predicate.Predicate('P'), constant.Constant('a'))
+        >>> b = atomic.Atomic(predicate.Predicate('P'), constant.Constant('b'))
+        >>> m = BDD()
+        >>> node = m.compile(implication.Implication(a, b))
+        >>> m.evaluate(node, {a}), m.evaluate(node, {a, b})
+        (False, True)
+        """
+        atoms, lows, highs = self.atoms, self.lows, self.highs
+        levels = self.levels
+        while node > 1:
+            if atoms[levels[node]] in knowledge:
+                node = highs[node]
+            else:
+                node = lows[node]
+
+        return node == 1
+
+    def equivalent(self, e1, e2):
+        """Check whether two expressions are true for the same atoms."""
+        return self.compile(e1) == self.compile(e2)
+
+
+def test():
+    """Test the module."""
+    print('Testing')
+    import doctest
+    doctest.testmod()
+    print('Done')
+
+if __name__ == '__main__':
+    test()
@@ -0,0 +1,148 @@
+#!/usr/bin/python
+# -*- coding: utf8 -*-
+"""
+This module contains the CNF class, which compiles expressions to clauses.
+
+Expressions are translated with the Tseitin encoding: every compound
+sub-expression is named by a fresh variable, defined by a few clauses, so
+the result grows linearly with the expression instead of exponentially as
+when distributing disjunctions over conjunctions. Equal sub-expressions are
+named once. Clauses are lists of non-zero integers, as in the DIMACS
+format, where -v stands for the negation of variable v.
+"""
+from __future__ import unicode_literals
+import expression
+
+
+class CNF(object):
+    """A set of clauses, together with the variables naming atoms."""
+
+    def __init__(self):
+        """
+        Create an empty formula.
+
+        >>> f = CNF()
+        >>> f.count, f.clauses
+        (0, [])
+        """
+        self.clauses = []
+        self.count = 0
+        self.atoms = {}
+        self.literals = {}
+        self.true = None
+
+    def variable(self):
+        """Get a new variable."""
+        self.count += 1
+        return self.count
+
+    def add(self, e):
+        """
+        Add the clauses asserting that an expression is true.
+
+        Conjunctions are split, and every other expression is asserted
+        through the literal naming it.
+
+        >>> import atomic
+        >>> import conjunction
+        >>> import disjunction
+        >>> import predicate
+        >>> import constant
+        >>> a = atomic.Atomic(predicate.Predicate('P'), constant.Constant('a'))
+        >>> b = atomic.Atomic(predicate.Predicate('Q'), constant.Constant('b'))
+        >>> f = CNF()
+        >>> f.add(conjunction.Conjunction(a, disjunction.Disjunction(a, b)))
+        >>> f.clauses
+        [[1], [-3, 1, 2], [3, -1], [3, -2], [3]]
+        """
+        stack = [e]
+        while stack:
+            e = stack.pop()
+            if e.type() == 'Conjunction':
+                stack.extend(reversed(e.exprs))
+            else:
+                self.clauses.append([self.literal(e)])
+
+    def literal(self, e):
+        """
+        Get the literal naming an expression, adding its definition.
+
+        Sub-expressions are visited by expression.postorder, so deep
+        expressions don't hit the recursion limit.
+
+        >>> import atomic
+        >>> import implication
+        >>> import negation
+        >>> import predicate
+        >>> import constant
+        >>> a = atomic.Atomic(predicate.Predicate('P'), constant.Constant('a'))
+        >>> f = CNF()
+        >>> f.literal(negation.Negation(a))
+        -1
+        >>> f.literal(implication.Implication(a, negation.Negation(a)))
+        2
+        >>> f.clauses
+        [[-2, -1, -1], [2, 1], [2, 1]]
+        >>> f.literal(a), f.count
+        (1, 2)
+        """
+        literals = self.literals
+        root = e
+        for e in expression.postorder(e, literals):
+            if e in literals:
+                continue
+
+            kind = e.type()
+            if kind == 'Atomic':
+                literals[e] = self.atoms[e] = self.variable()
+                continue
+            elif kind in ('Tautology', 'Contradiction'):
+                if self.true is None:
+                    self.true = self.variable()
+                    self.clauses.append([self.true])
+                literals[e] = self.true if kind == 'Tautology' else -self.true
+                continue
+
+            if kind == 'Negation':
+                literals[e] = -literals[e.expr]
+                continue
+
+            members = [literals[child] for child in e.children()]
+            if kind == 'Implication':
+                members[0] = -members[0]
+            v = literals[e] = self.variable()
+            if kind == 'Conjunction':
+                self.clauses.extend([-v, x] for x in members)
+                self.clauses.append([v] + [-x for x in members])
+            else:
+                self.clauses.append([-v] + members)
+                self.clauses.extend([v, -x] for x in members)
+
+        return literals[root]
+
+    def model(self, assignment):
+        """
+        Get the atoms true in an assignment, given as a list of literals.
+
+        >>> import atomic
+        >>> import predicate
+        >>> import constant
+        >>> a = atomic.Atomic(predicate.Predicate('P'), constant.Constant('a'))
+        >>> f = CNF()
+        >>> f.add(a)
+        >>> [str(x) for x in f.model([1])]
+        ['P(a)']
+        """
+        true = set(x for x in assignment if x > 0)
+        return [atom for atom, v in self.atoms.items() if v in true]
+
+
+def test():
+    """Test the module."""
+    print('Testing')
+    import doctest
+    doctest.testmod()
+    print('Done')
+
+if __name__ == '__main__':
+    test()
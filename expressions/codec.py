@@ -0,0 +1,218 @@
+#!/usr/bin/python
+# -*- coding: utf8 -*-
+"""
+This module serializes batches of expressions compactly.
+
+It contains the Encoder class and the decode function.
+
+A batch is encoded as its names, the text of every predicate, constant
+and variable joined by newlines, and a flat array of integer codes. Each
+expression is written in postfix order: operators follow their operands,
+so decoding only needs a stack. Atoms refer to names by their index, and
+any node seen before in the batch is written as a reference to it, so
+shared sub-expressions are only sent once. The codes are packed as native
+integers, which takes less space and time to pickle than the objects.
+
+Decoding builds every node through a factory, so the expressions it
+returns are canonical in the process decoding them.
+"""
+from __future__ import unicode_literals
+import array
+
+import conjunction
+import disjunction
+import expression
+import factory
+import implication
+import negation
+import variable
+
+(TAUTOLOGY, CONTRADICTION, ATOMIC, NEGATION, CONJUNCTION, DISJUNCTION,
+ IMPLICATION, REFERENCE, ROOT) = range(9)
+
+OPERATORS = {
+    'Tautology': TAUTOLOGY,
+    'Contradiction': CONTRADICTION,
+    'Negation': NEGATION,
+    'Conjunction': CONJUNCTION,
+    'Disjunction': DISJUNCTION,
+    'Implication': IMPLICATION,
+}
+
+
+def pack(codes):
+    """Get the bytes of an array of codes."""
+    if hasattr(codes, 'tobytes'):
+        return codes.tobytes()
+
+    return codes.tostring()
+
+
+def unpack(data):
+    """Get the array of codes packed in some bytes."""
+    codes = array.array(str('i'))
+    if hasattr(codes, 'frombytes'):
+        codes.frombytes(data)
+    else:
+        codes.fromstring(data)
+
+    return codes
+
+
+class Encoder(object):
+    """Encodes a batch of expressions sharing their names and nodes."""
+
+    def __init__(self):
+        """
+        Create an encoder for an empty batch.
+
+        >>> len(Encoder().codes)
+        0
+        """
+        self.names = []
+        self.symbols = {}
+        self.nodes = {}
+        self.codes = array.array(str('i'))
+
+    def symbol(self, name):
+        """Get the index of a name, adding it to the batch if new."""
+        index = self.symbols.get(name)
+        if index is None:
+            index = self.symbols[name] = len(self.names)
+            self.names.append(name)
+
+        return index
+
+    def encode(self, e):
+        """
+        Add an expression to the batch.
+
+        >>> import parser
+        >>> p = parser.Parser()
+        >>> encoder = Encoder()
+        >>> encoder.encode(p.parse('P(a) & ¬P(a)'))
+        >>> print(' '.join(encoder.names))
+        P a
+        >>> encoder.codes.tolist()
+        [2, 0, 1, 2, 7, 0, 3, 4, 2, 8]
+        """
+        codes = self.codes
+        nodes = self.nodes
+        for e in expression.postorder(e, nodes):
+            if e in nodes:
+                codes.extend((REFERENCE, nodes[e]))
+                continue
+
+            kind = e.type()
+            if kind == 'Atomic':
+                codes.extend((ATOMIC, self.symbol(e.predicate.name),
+                              len(e.arguments)))
+                codes.extend([2 * self.symbol(x.name) +
+                              isinstance(x, variable.Variable)
+                              for x in e.arguments])
+            elif kind in ('Conjunction', 'Disjunction'):
+                codes.extend((OPERATORS[kind], len(e.exprs)))
+            else:
+                codes.append(OPERATORS[kind])
+
+            nodes[e] = len(nodes)
+
+        codes.append(ROOT)
+
+    def dump(self):
+        """Get the batch as a (names, codes) pair of bytes."""
+        return '\n'.join(self.names).encode('utf8'), pack(self.codes)
+
+
+def encode(expressions):
+    """Get the (names, codes) pair of bytes encoding some expressions."""
+    encoder = Encoder()
+    for e in expressions:
+        encoder.encode(e)
+
+    return encoder.dump()
+
+
+def decode(data, terms=None):
+    """
+    Get the expressions of an encoded batch, built by a factory.
+
+    terms is the factory to use, the default one if not given.
+
+    >>> import parser
+    >>> p = parser.Parser()
+    >>> batch = [p.parse('P(a) & Q(a, X) > ¬(P(a) | R())'), p.parse('P(b)')]
+    >>> [x is y for x, y in zip(decode(encode(batch)), batch)]
+    [True, True]
+    """
+    f = factory.default_factory if terms is None else terms
+    names, codes = data
+    names = names.decode('utf8').split('\n')
+    codes = unpack(codes)
+
+    predicates = {}
+    arguments = {}
+    nodes = []
+    stack = []
+    roots = []
+    compound = f.compound
+    i = 0
+    while i < len(codes):
+        code = codes[i]
+        i += 1
+        if code == ROOT:
+            roots.append(stack.pop())
+            continue
+        elif code == REFERENCE:
+            stack.append(nodes[codes[i]])
+            i += 1
+            continue
+
+        if code == ATOMIC:
+            p = predicates.get(codes[i])
+            if p is None:
+                p = predicates[codes[i]] = f.predicate(names[codes[i]])
+            args = []
+            for x in codes[i + 2:i + 2 + codes[i + 1]]:
+                arg = arguments.get(x)
+                if arg is None:
+                    name = names[x >> 1]
+                    arg = arguments[x] = (f.variable(name) if x & 1
+                                          else f.constant(name))
+                args.append(arg)
+            i += 2 + codes[i + 1]
+            node = f.atomic(p, *args)
+        elif code in (CONJUNCTION, DISJUNCTION):
+            count = codes[i]
+            i += 1
+            children = stack[len(stack) - count:]
+            del stack[len(stack) - count:]
+            node = compound(conjunction.Conjunction if code == CONJUNCTION
+                            else disjunction.Disjunction, *children)
+        elif code == IMPLICATION:
+            y = stack.pop()
+            node = compound(implication.Implication, stack.pop(), y)
+        elif code == NEGATION:
+            node = compound(negation.Negation, stack.pop())
+        elif code == TAUTOLOGY:
+            node = compound(expression.Tautology)
+        elif code == CONTRADICTION:
+            node = compound(expression.Contradiction)
+        else:
+            raise Exception('Unknown code %d' % code)
+
+        nodes.append(node)
+        stack.append(node)
+
+    return roots
+
+
+def test():
+    """Test the module."""
+    print('Testing')
+    import doctest
+    doctest.testmod()
+    print('Done')
+
+if __name__ == '__main__':
+    test()
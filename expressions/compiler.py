@@ -0,0 +1,166 @@
+#!/usr/bin/python
+# -*- coding: utf8 -*-
+"""
+This module contains the compile function for expressions.
+
+compile turns an expression into a Python function of the knowledge.
+
+The expression tree is translated to the source of a single Python boolean
+expression, so evaluating it takes no method call per node and keeps the
+short-circuiting of and, or and not. Atoms are bound to global names of
+the generated module, so calls don't pay for copying one closure cell per
+atom.
+Chains of conjunctions, or of disjunctions and implications, become flat
+and/or sequences. Sub-expressions used more than once, and those nested
+deeper than DEPTH, are moved to local functions called where needed, which
+bounds the nesting of the generated source however deep the expression is.
+Compiled functions are cached per expression.
+"""
+from __future__ import unicode_literals
+import weakref
+
+import expression
+
+DEPTH = 16
+
+cache = weakref.WeakKeyDictionary()
+
+
+def source(e):
+    """
+    Get the source of the function evaluating an expression, and its atoms.
+
+    The source defines evaluate(knowledge), with the i-th atom named ai.
+
+    >>> import atomic
+    >>> import conjunction
+    >>> import disjunction
+    >>> import implication
+    >>> import negation
+    >>> import predicate
+    >>> import constant
+    >>> a = atomic.Atomic(predicate.Predicate('P'), constant.Constant('a'))
+    >>> b = atomic.Atomic(predicate.Predicate('P'), constant.Constant('b'))
+    >>> c = conjunction.Conjunction(a, negation.Negation(b))
+    >>> text, atoms = source(disjunction.Disjunction(
+    ...     c, implication.Implication(b, c)))
+    >>> print(text)
+    def f0(knowledge):
+        return a0 in knowledge and not a1 in knowledge
+    def evaluate(knowledge):
+        return f0(knowledge) or not a1 in knowledge or f0(knowledge)
+    >>> [str(atom) for atom in atoms]
+    ['P(a)', 'P(b)']
+    """
+    references = {e: 1}
+    stack = [e]
+    while stack:
+        node = stack.pop()
+        for child in node.children():
+            if child in references:
+                references[child] += 1
+            else:
+                references[child] = 1
+                stack.append(child)
+
+    atoms = []
+    functions = []
+    texts = {}
+    for node in expression.postorder(e, texts):
+        if node in texts:
+            continue
+
+        kind = node.type()
+        if kind == 'Atomic':
+            text = ('a%d in knowledge' % len(atoms), None, 0)
+            atoms.append(node)
+        elif kind == 'Tautology':
+            text = ('True', None, 0)
+        elif kind == 'Contradiction':
+            text = ('False', None, 0)
+        elif kind == 'Negation':
+            text = negate(texts[node.expr])
+        elif kind == 'Conjunction':
+            text = join('and', *[texts[x] for x in node.exprs])
+        elif kind == 'Disjunction':
+            text = join('or', *[texts[x] for x in node.exprs])
+        else:
+            text = join('or', negate(texts[node.expr1]), texts[node.expr2])
+
+        if node is not e and (text[2] > DEPTH or
+                              references[node] > 1 and text[1]):
+            name = 'f%d' % len(functions)
+            functions.append('def %s(knowledge):\n    return %s' % (
+                name, text[0]))
+            text = ('%s(knowledge)' % name, None, 0)
+
+        texts[node] = text
+
+    lines = functions + ['def evaluate(knowledge):',
+                         '    return %s' % texts[e][0]]
+    return '\n'.join(lines), atoms
+
+
+def negate(text):
+    """Get the (source, operator, depth) of the negation of a source."""
+    source, operator, depth = text
+    if operator in ('and', 'or'):
+        return ('not (%s)' % source, 'not', depth + 2)
+
+    return ('not %s' % source, 'not', depth + 1)
+
+
+def join(operator, *texts):
+    """Get the (source, operator, depth) of and/or over some sources."""
+    sources = []
+    depth = 0
+    for source, inner, inner_depth in texts:
+        if inner in ('and', 'or') and inner != operator:
+            source = '(%s)' % source
+            inner_depth += 1
+        sources.append(source)
+        depth = max(depth, inner_depth)
+
+    return (' %s ' % operator).join(sources), operator, depth
+
+
+def compile(e):
+    """
+    Get a function evaluating an expression against a knowledge set.
+
+    The function gives the same result as e.eval(knowledge), and is
+    built once per expression.
+
+    >>> import atomic
+    >>> import disjunction
+    >>> import negation
+    >>> import predicate
+    >>> import constant
+    >>> a = atomic.Atomic(predicate.Predicate('P'), constant.Constant('a'))
+    >>> b = atomic.Atomic(predicate.Predicate('P'), constant.Constant('b'))
+    >>> e = disjunction.Disjunction(negation.Negation(a), b)
+    >>> f = compile(e)
+    >>> f({a}), f({a, b}), f(set())
+    (False, True, True)
+    >>> compile(e) is f
+    True
+    """
+    function = cache.get(e)
+    if function is None:
+        text, atoms = source(e)
+        namespace = dict(('a%d' % i, atom) for i, atom in enumerate(atoms))
+        exec(text, namespace)
+        function = cache[e] = namespace['evaluate']
+
+    return function
+
+
+def test():
+    """Test the module."""
+    print('Testing')
+    import doctest
+    doctest.testmod()
+    print('Done')
+
+if __name__ == '__main__':
+    test()
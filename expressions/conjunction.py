@@ -9,27 +9,53 @@ class Conjunction(expression.Expression):
     """
     A conjunction expression.
 
-    Represents the logical AND between two sub-expressions.
+    Represents the logical AND between any number of sub-expressions.
+    They are kept flat in the exprs tuple: nested conjunctions given to the
+    constructor are spliced into it, so long chains don't build deep trees
+    and are evaluated, printed, hashed and compared without recursion over
+    their length.
     """
 
-    def __init__(self, expr1, expr2):
+    __slots__ = ('exprs',)
+
+    def __init__(self, *exprs):
         """
-        Create a new Conjunction off expressions 1 and 2.
+        Create a new Conjunction off some expressions.
 
         >>> e = Conjunction(1, 2)
         >>> e.expr1
         1
         >>> e.expr2 == 2
         True
+        >>> Conjunction(Conjunction(1, 2), 3, Conjunction(4, 5)).exprs
+        (1, 2, 3, 4, 5)
         """
-        self.expr1 = expr1
-        self.expr2 = expr2
+        if any(isinstance(expr, Conjunction) for expr in exprs):
+            exprs = [x for expr in exprs for x in (
+                expr.exprs if isinstance(expr, Conjunction) else (expr,))]
+
+        self.exprs = tuple(exprs)
+        self._hash = hash((self.__class__, self.exprs))
+
+    @property
+    def expr1(self):
+        """The conjunction of every sub-expression but the last one."""
+        if len(self.exprs) == 2:
+            return self.exprs[0]
+
+        return Conjunction(*self.exprs[:-1])
+
+    @property
+    def expr2(self):
+        """The last sub-expression."""
+        return self.exprs[-1]
 
     def eval(self, knowledge={}):
         """
         Evaluate the Conjunction expression.
 
-        Returns true if both expressions are true
+        Returns true if all the expressions are true, stopping at the first
+        false one.
 
         >>> t = expression.Tautology()
         >>> f = expression.Contradiction()
@@ -42,8 +68,34 @@ class Conjunction(expression.Expression):
         >>> a = Conjunction(f, f)
         >>> a.eval()
         False
+        >>> a = Conjunction(f, t, f)
+        >>> a.eval()
+        False
+        >>> Conjunction(*[t] * 100000 + [f]).eval()
+        False
         """
-        return (self.expr1.eval(knowledge) and self.expr2.eval(knowledge))
+        for expr in self.exprs:
+            if not expr.eval(knowledge):
+                return False
+
+        return True
+
+    def substitute(self, bindings):
+        """
+        Replace the variables in the sub-expressions by their bound values.
+
+        >>> import atomic
+        >>> import predicate
+        >>> import variable
+        >>> import constant
+        >>> p = predicate.Predicate('P')
+        >>> x = variable.Variable('X')
+        >>> e = Conjunction(atomic.Atomic(p, x), atomic.Atomic(p, x))
+        >>> print(e.substitute({x: constant.Constant('a')}))
+        (P(a) & P(a))
+        """
+        return Conjunction(*[expr.substitute(bindings)
+                            for expr in self.exprs])
 
     def __str__(self):
         """
@@ -54,13 +106,19 @@ class Conjunction(expression.Expression):
         >>> a = Conjunction(t, f)
         >>> print(a)
         (T & F)
+        >>> print(Conjunction(t, Conjunction(f, t)))
+        (T & F & T)
         """
-        return '(%s & %s)' % (self.expr1, self.expr2)
+        return '(%s)' % ' & '.join(str(expr) for expr in self.exprs)
 
     def type(self):
         """Return the type of this expression."""
         return 'Conjunction'
 
+    def children(self):
+        """Get the sub-expressions of this expression."""
+        return self.exprs
+
     def __eq__(self, other):
         """Compare two expressions to check if they're equal.
 
@@ -82,13 +140,16 @@ class Conjunction(expression.Expression):
         >>> conj1 == conj3
         False
         """
+        if self is other:
+            return True
+
         return type(self) == type(other) and\
-            self.expr1 == other.expr1 and\
-            self.expr2 == other.expr2
+            self._hash == other._hash and\
+            self.exprs == other.exprs
 
     def __hash__(self):
-        """Get the hash of this conjunction."""
-        return hash((type(self), self.expr1, self.expr2))
+        """Get the hash of this conjunction, computed on creation."""
+        return self._hash
 
 
 def test():
@@ -4,7 +4,7 @@
 from __future__ import unicode_literals
 
 
-class Constant:
+class Constant(object):
     """
     A logic constant is an abstraction of an object.
 
@@ -12,6 +12,8 @@ class Constant:
     which constitute a predicate.
     """
 
+    __slots__ = ('name', '__weakref__')
+
     def __init__(self, name):
         """
         Create a new constant with a given name.
@@ -50,7 +52,11 @@ class Constant:
         >>> c2 == c3
         True
         """
-        return type(self) == type(self) and self.name == other.name
+        return type(self) == type(other) and self.name == other.name
+
+    def __ne__(self, other):
+        """Compare two constants to check if they're different."""
+        return not self == other
 
     def __hash__(self):
         """Get the hash of this constant."""
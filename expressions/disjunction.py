@@ -9,27 +9,53 @@ class Disjunction(expression.Expression):
     """
     A disjunction expression.
 
-    Represents the logical OR between two sub-expressions.
+    Represents the logical OR between any number of sub-expressions.
+    They are kept flat in the exprs tuple: nested disjunctions given to the
+    constructor are spliced into it, so long chains don't build deep trees
+    and are evaluated, printed, hashed and compared without recursion over
+    their length.
     """
 
-    def __init__(self, expr1, expr2):
+    __slots__ = ('exprs',)
+
+    def __init__(self, *exprs):
         """
-        Create a new Disjunction off expressions 1 and 2.
+        Create a new Disjunction off some expressions.
 
         >>> e = Disjunction(1, 2)
         >>> e.expr1
         1
         >>> e.expr2 == 2
         True
+        >>> Disjunction(Disjunction(1, 2), 3, Disjunction(4, 5)).exprs
+        (1, 2, 3, 4, 5)
         """
-        self.expr1 = expr1
-        self.expr2 = expr2
+        if any(isinstance(expr, Disjunction) for expr in exprs):
+            exprs = [x for expr in exprs for x in (
+                expr.exprs if isinstance(expr, Disjunction) else (expr,))]
+
+        self.exprs = tuple(exprs)
+        self._hash = hash((self.__class__, self.exprs))
+
+    @property
+    def expr1(self):
+        """The disjunction of every sub-expression but the last one."""
+        if len(self.exprs) == 2:
+            return self.exprs[0]
+
+        return Disjunction(*self.exprs[:-1])
+
+    @property
+    def expr2(self):
+        """The last sub-expression."""
+        return self.exprs[-1]
 
     def eval(self, knowledge={}):
         """
         Evaluate the Disjunction expression.
 
-        Returns true if either expressions p or q are true.
+        Returns true if any of the expressions is true, stopping at the
+        first true one.
 
         >>> t = expression.Tautology()
         >>> f = expression.Contradiction()
@@ -42,8 +68,34 @@ class Disjunction(expression.Expression):
         >>> a = Disjunction(f, f)
         >>> a.eval()
         False
+        >>> a = Disjunction(f, t, f)
+        >>> a.eval()
+        True
+        >>> Disjunction(*[f] * 100000 + [t]).eval()
+        True
         """
-        return (self.expr1.eval(knowledge) or self.expr2.eval(knowledge))
+        for expr in self.exprs:
+            if expr.eval(knowledge):
+                return True
+
+        return False
+
+    def substitute(self, bindings):
+        """
+        Replace the variables in the sub-expressions by their bound values.
+
+        >>> import atomic
+        >>> import predicate
+        >>> import variable
+        >>> import constant
+        >>> p = predicate.Predicate('P')
+        >>> x = variable.Variable('X')
+        >>> e = Disjunction(atomic.Atomic(p, x), atomic.Atomic(p, x))
+        >>> print(e.substitute({x: constant.Constant('a')}))
+        (P(a) | P(a))
+        """
+        return Disjunction(*[expr.substitute(bindings)
+                            for expr in self.exprs])
 
     def __str__(self):
         """
@@ -54,13 +106,19 @@ class Disjunction(expression.Expression):
         >>> a = Disjunction(t, f)
         >>> print(a)
         (T | F)
+        >>> print(Disjunction(t, Disjunction(f, t)))
+        (T | F | T)
         """
-        return '(%s | %s)' % (self.expr1, self.expr2)
+        return '(%s)' % ' | '.join(str(expr) for expr in self.exprs)
 
     def type(self):
         """Return the type of this expression."""
         return 'Disjunction'
 
+    def children(self):
+        """Get the sub-expressions of this expression."""
+        return self.exprs
+
     def __eq__(self, other):
         """
         Compare two expressions to check if they're equal.
@@ -83,13 +141,16 @@ class Disjunction(expression.Expression):
         >>> disj1 == disj3
         False
         """
+        if self is other:
+            return True
+
         return type(self) == type(other) and\
-            self.expr1 == other.expr1 and\
-            self.expr2 == other.expr2
+            self._hash == other._hash and\
+            self.exprs == other.exprs
 
     def __hash__(self):
-        """Get the hash of this disjunction."""
-        return hash((type(self), self.expr1, self.expr2))
+        """Get the hash of this disjunction, computed on creation."""
+        return self._hash
 
 
 def test():
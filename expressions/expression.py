@@ -9,14 +9,20 @@ Contradiction and Tautology are just constant examples.
 from __future__ import unicode_literals
 
 
-class Expression:
+class Expression(object):
     """
     This class is the parent for all logic expressions.
 
     Provides the method signature for all methods expected from an expression:
-    eval, str, type, eq, hash
+    eval, str, type, children, eq, hash
+
+    Expressions are immutable once created, which lets compound expressions
+    compute their hash a single time in their constructor. They declare
+    __slots__ instead of carrying a per-instance __dict__.
     """
 
+    __slots__ = ('_hash', '__weakref__')
+
     def __init__(self):
         """Initialize the expression."""
         raise Exception('Non-subclass expressions cannot be initialized')
@@ -25,6 +31,10 @@ class Expression:
         """Evaluate the expression."""
         raise Exception('Non-subclass expressions cannot be evaluated')
 
+    def substitute(self, bindings):
+        """Replace the variables in the expression by their bound values."""
+        return self
+
     def __str__(self):
         """String representation to print."""
         raise Exception('Non-subclass expressions cannot be parsed')
@@ -33,18 +43,28 @@ class Expression:
         """Return the type of this expression."""
         raise Exception('Non-subclass expressions do not have a type')
 
+    def children(self):
+        """Get the sub-expressions of this expression, none by default."""
+        return ()
+
     def __eq__(self, other):
         """Compare two expressions to check if they're equal."""
         raise Exception('Non-subclass expressions cannot be compared')
 
+    def __ne__(self, other):
+        """Compare two expressions to check if they're different."""
+        return not self == other
+
     def __hash__(self):
-        """Get the hash of this expression."""
-        return 0
+        """Get the hash of this expression from its string representation."""
+        return hash(str(self))
 
 
 class Contradiction(Expression):
     """A constant expression. Contradiction is always False."""
 
+    __slots__ = ()
+
     def __init__(self):
         """
         Create a new Contradiction instance.
@@ -88,6 +108,8 @@ class Contradiction(Expression):
 class Tautology(Expression):
     """A constant expression. Tautology is always True."""
 
+    __slots__ = ()
+
     def __init__(self):
         """
         Create a new Tautology expression.
@@ -129,6 +151,41 @@ class Tautology(Expression):
         return hash(str(self))
 
 
+def postorder(e, done=()):
+    """
+    Get the sub-expressions of e, each one after its children.
+
+    Every occurrence of a shared sub-expression is yielded, with its
+    children from left to right, except that the ones in done are yielded
+    without their children. Callers memoizing their results can pass their
+    memo as done and fill it while walking. An explicit stack is used, so
+    deep expressions don't hit the recursion limit.
+
+    >>> import conjunction
+    >>> import negation
+    >>> t, f = Tautology(), Contradiction()
+    >>> e = conjunction.Conjunction(negation.Negation(t), f, t)
+    >>> [str(x) for x in postorder(e)]
+    ['T', '(^T)', 'F', 'T', '((^T) & F & T)']
+    >>> [str(x) for x in postorder(e, set([e.exprs[0]]))]
+    ['(^T)', 'F', 'T', '((^T) & F & T)']
+    """
+    stack = [(e, False)]
+    while stack:
+        node, ready = stack.pop()
+        if ready or node in done:
+            yield node
+            continue
+
+        children = node.children()
+        if not children:
+            yield node
+            continue
+
+        stack.append((node, True))
+        stack.extend((child, False) for child in reversed(children))
+
+
 def test():
     """Test the module."""
     print('Testing')
@@ -0,0 +1,249 @@
+#!/usr/bin/python
+# -*- coding: utf8 -*-
+"""
+This module contains the Factory class, which interns expressions.
+
+A factory returns one canonical object per structurally distinct term, so
+that repeated facts share their memory and equal terms are identical.
+"""
+from __future__ import unicode_literals
+import weakref
+
+import atomic
+import conjunction
+import disjunction
+import expression
+import implication
+import negation
+
+import constant
+import predicate
+import variable
+
+
+class Factory:
+    """
+    Hash-consing factory for expressions, predicates, constants and variables.
+
+    Canonical objects are kept in a weak table, so they are evicted as soon
+    as nothing else refers to them. Compound expressions are keyed on the
+    identity of their (canonical) children, so interning a node costs the
+    same no matter how deep it is. Conjunctions and disjunctions are keyed
+    on their flattened children, like the nodes hold them.
+    """
+
+    NARY = (conjunction.Conjunction, disjunction.Disjunction)
+    CONSTANT = (expression.Tautology, expression.Contradiction)
+
+    def __init__(self):
+        """
+        Create a new factory with an empty table.
+
+        >>> f = Factory()
+        >>> len(f)
+        0
+        """
+        self.table = weakref.WeakValueDictionary()
+
+    def __len__(self):
+        """Get the number of live canonical objects."""
+        return len(self.table)
+
+    def lookup(self, key, obj):
+        """Return the canonical object for key, registering obj if none."""
+        canonical = self.table.get(key)
+        if canonical is None:
+            self.table[key] = canonical = obj
+
+        return canonical
+
+    def term(self, t):
+        """
+        Return the canonical version of a predicate, constant or variable.
+
+        >>> f = Factory()
+        >>> f.term(constant.Constant('a')) is f.constant('A')
+        True
+        """
+        return self.lookup((t.__class__, t.name), t)
+
+    def predicate(self, name):
+        """Return the canonical predicate with a given name."""
+        return self.term(predicate.Predicate(name))
+
+    def constant(self, name):
+        """Return the canonical constant with a given name."""
+        return self.term(constant.Constant(name))
+
+    def variable(self, name):
+        """Return the canonical variable with a given name."""
+        return self.term(variable.Variable(name))
+
+    def atomic(self, p, *x):
+        """
+        Return the canonical atomic expression with given predicate and args.
+
+        >>> f = Factory()
+        >>> a = f.atomic(f.predicate('P'), f.constant('a'), f.variable('X'))
+        >>> b = f.atomic(predicate.Predicate('P'), constant.Constant('a'),
+        ...              variable.Variable('X'))
+        >>> a is b
+        True
+        >>> a is f.atomic(f.predicate('P'), f.constant('b'), f.variable('X'))
+        False
+        """
+        p = self.term(p)
+        x = tuple(self.term(arg) for arg in x)
+        key = (atomic.Atomic, id(p)) + tuple(id(arg) for arg in x)
+
+        canonical = self.table.get(key)
+        if canonical is None:
+            self.table[key] = canonical = atomic.Atomic(p, *x)
+
+        return canonical
+
+    def negation(self, expr):
+        """Return the canonical negation of an expression."""
+        return self.compound(negation.Negation, self.intern(expr))
+
+    def conjunction(self, *exprs):
+        """
+        Return the canonical conjunction of some expressions.
+
+        The conjunction of a single expression is the expression itself.
+
+        >>> f = Factory()
+        >>> a, b, c = [f.atomic(f.predicate(x)) for x in 'ABC']
+        >>> f.conjunction(f.conjunction(a, b), c) is f.conjunction(a, b, c)
+        True
+        >>> f.conjunction(a) is a
+        True
+        """
+        if len(exprs) == 1:
+            return self.intern(exprs[0])
+
+        return self.compound(conjunction.Conjunction,
+                             *[self.intern(expr) for expr in exprs])
+
+    def disjunction(self, *exprs):
+        """Return the canonical disjunction of some expressions."""
+        if len(exprs) == 1:
+            return self.intern(exprs[0])
+
+        return self.compound(disjunction.Disjunction,
+                             *[self.intern(expr) for expr in exprs])
+
+    def implication(self, expr1, expr2):
+        """Return the canonical implication of two expressions."""
+        return self.compound(implication.Implication,
+                             self.intern(expr1), self.intern(expr2))
+
+    def compound(self, cls, *children):
+        """
+        Return the canonical cls node over already canonical children.
+
+        Children of a conjunction or disjunction that are of the same kind
+        are flattened into it.
+
+        >>> f = Factory()
+        >>> t = f.compound(expression.Tautology)
+        >>> t is f.intern(expression.Tautology())
+        True
+        """
+        if cls in self.NARY and any(isinstance(child, cls)
+                                    for child in children):
+            children = [x for child in children for x in (
+                child.exprs if isinstance(child, cls) else (child,))]
+
+        key = (cls,) + tuple(id(child) for child in children)
+
+        canonical = self.table.get(key)
+        if canonical is None:
+            self.table[key] = canonical = cls(*children)
+
+        return canonical
+
+    def key(self, expr):
+        """Get the table key of an expression, assuming canonical children."""
+        if isinstance(expr, atomic.Atomic):
+            return (atomic.Atomic, id(expr.predicate)) +\
+                tuple(id(arg) for arg in expr.arguments)
+
+        return (expr.__class__,) +\
+            tuple(id(child) for child in expr.children())
+
+    def intern(self, expr):
+        """
+        Return the canonical version of any expression tree.
+
+        Canonical expressions are returned as they are. Otherwise the tree
+        is rebuilt bottom-up without recursion, so deep trees are fine.
+
+        >>> f = Factory()
+        >>> p = predicate.Predicate('P')
+        >>> a = atomic.Atomic(p, constant.Constant('a'))
+        >>> b = atomic.Atomic(p, constant.Constant('b'))
+        >>> e1 = f.intern(conjunction.Conjunction(a, negation.Negation(b)))
+        >>> e2 = f.intern(conjunction.Conjunction(a, negation.Negation(b)))
+        >>> e1 is e2
+        True
+        >>> f.intern(e1) is e1
+        True
+        >>> e1.expr1 is f.intern(a) is a
+        True
+        >>> e3 = f.intern(conjunction.Conjunction(
+        ...     conjunction.Conjunction(a, b), negation.Negation(b)))
+        >>> e3 is f.conjunction(a, b, negation.Negation(b))
+        True
+        """
+        if self.table.get(self.key(expr)) is expr:
+            return expr
+
+        canonical = {}
+        stack = [expr]
+        while stack:
+            node = stack[-1]
+            children = node.children()
+            pending = [child for child in children
+                       if id(child) not in canonical]
+            if pending:
+                stack.extend(pending)
+                continue
+
+            stack.pop()
+            if isinstance(node, atomic.Atomic):
+                parts = (node.predicate,) + tuple(node.arguments)
+                parts_canonical = [self.term(part) for part in parts]
+            elif isinstance(node, self.CONSTANT) or children:
+                parts = children
+                parts_canonical = [canonical[id(child)] for child in children]
+            else:
+                raise Exception('Cannot intern %s' % node)
+
+            key = (node.__class__,) +\
+                tuple(id(part) for part in parts_canonical)
+            result = self.table.get(key)
+            if result is None:
+                if all(x is y for x, y in zip(parts, parts_canonical)):
+                    result = node
+                else:
+                    result = node.__class__(*parts_canonical)
+                self.table[key] = result
+
+            canonical[id(node)] = result
+
+        return canonical[id(expr)]
+
+
+default_factory = Factory()
+
+
+def test():
+    """Test the module."""
+    print('Testing')
+    import doctest
+    doctest.testmod()
+    print('Done')
+
+if __name__ == '__main__':
+    test()
@@ -14,6 +14,8 @@ class Implication(expression.Expression):
     expression evaluates to true and the second doesn't.
     """
 
+    __slots__ = ('expr1', 'expr2')
+
     def __init__(self, expr1, expr2):
         """
         Create a new Implication off expressions 1 and 2.
@@ -26,6 +28,7 @@ class Implication(expression.Expression):
         """
         self.expr1 = expr1
         self.expr2 = expr2
+        self._hash = hash((self.__class__, expr1, expr2))
 
     def eval(self, knowledge={}):
         """
@@ -48,6 +51,23 @@ class Implication(expression.Expression):
         """
         return (not self.expr1.eval(knowledge) or self.expr2.eval(knowledge))
 
+    def substitute(self, bindings):
+        """
+        Replace the variables in both sub-expressions by their bound values.
+
+        >>> import atomic
+        >>> import predicate
+        >>> import variable
+        >>> import constant
+        >>> p = predicate.Predicate('P')
+        >>> x = variable.Variable('X')
+        >>> e = Implication(atomic.Atomic(p, x), atomic.Atomic(p, x))
+        >>> print(e.substitute({x: constant.Constant('a')}))
+        (P(a) > P(a))
+        """
+        return Implication(self.expr1.substitute(bindings),
+                           self.expr2.substitute(bindings))
+
     def __str__(self):
         """
         String representation to print.
@@ -64,6 +84,10 @@ class Implication(expression.Expression):
         """Return the type of this expression."""
         return 'Implication'
 
+    def children(self):
+        """Get the sub-expressions of this expression."""
+        return (self.expr1, self.expr2)
+
     def __eq__(self, other):
         """Compare two expressions to check if they're equal.
 
@@ -85,13 +109,17 @@ class Implication(expression.Expression):
         >>> imp1 == imp3
         False
         """
+        if self is other:
+            return True
+
         return type(self) == type(other) and\
+            self._hash == other._hash and\
             self.expr1 == other.expr1 and\
             self.expr2 == other.expr2
 
     def __hash__(self):
-        """Get the hash of this implication."""
-        return hash((type(self), self.expr1, self.expr2))
+        """Get the hash of this implication, computed on creation."""
+        return self._hash
 
 
 def test():
@@ -0,0 +1,79 @@
+#!/usr/bin/python
+# -*- coding: utf8 -*-
+"""This module contains the Lexer class and the ParseError exception."""
+from __future__ import unicode_literals
+import re
+
+
+class ParseError(Exception):
+    """Raised when a string is not a well formed expression."""
+
+    pass
+
+
+class Lexer:
+    """
+    Lexer class. Splits a string into tokens in a single pass.
+
+    Every token is a (kind, text, position) tuple. Names have kind 'NAME',
+    operators and punctuation use their own symbol as kind, and the
+    token list is always terminated by an 'END' token.
+    """
+
+    TOKEN_PATTERN = re.compile(r'\s*(?:(\w+)|([()&|>,¬^])|(\S))', re.UNICODE)
+    ALIASES = {'^': '¬'}
+
+    def __init__(self):
+        """Initialize an instance of Lexer."""
+        pass
+
+    def tokenize(self, str_expression):
+        """
+        Split a string into a list of tokens.
+
+        Both '¬' and '^' are accepted for negation, so that the string
+        representation of a negation can be parsed back.
+
+        >>> l = Lexer()
+        >>> tokens = l.tokenize('P(x, Y) & Q()')
+        >>> ' '.join(kind for kind, _, _ in tokens)
+        u'NAME ( NAME , NAME ) & NAME ( ) END'
+        >>> l.tokenize('(^a)')[1][0] == l.tokenize('(¬a)')[1][0] == '¬'
+        True
+        >>> l.tokenize('P(x) # Q(y)')
+        Traceback (most recent call last):
+        ...
+        ParseError: Unexpected character '#' at position 5
+        """
+        if isinstance(str_expression, bytes):
+            str_expression = str_expression.decode('utf8')
+
+        tokens = []
+        append = tokens.append
+        aliases = self.ALIASES
+
+        for m in self.TOKEN_PATTERN.finditer(str_expression):
+            group = m.lastindex
+            if group == 1:
+                append(('NAME', m.group(1), m.start(1)))
+            elif group == 2:
+                symbol = m.group(2)
+                symbol = aliases.get(symbol, symbol)
+                append((symbol, symbol, m.start(2)))
+            else:
+                raise ParseError('Unexpected character \'%s\' at position %d'
+                                 % (m.group(3), m.start(3)))
+
+        tokens.append(('END', '', len(str_expression)))
+        return tokens
+
+
+def test():
+    """Test the module."""
+    print('Testing')
+    import doctest
+    doctest.testmod()
+    print('Done')
+
+if __name__ == '__main__':
+    test()
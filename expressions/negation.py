@@ -12,6 +12,8 @@ class Negation(expression.Expression):
     Represents the logical NOT of a sub-expression.
     """
 
+    __slots__ = ('expr',)
+
     def __init__(self, expr):
         """
         Create a new Negation off expression expr.
@@ -21,6 +23,7 @@ class Negation(expression.Expression):
         1
         """
         self.expr = expr
+        self._hash = hash((self.__class__, expr))
 
     def eval(self, knowledge={}):
         """
@@ -37,6 +40,21 @@ class Negation(expression.Expression):
         """
         return not self.expr.eval(knowledge)
 
+    def substitute(self, bindings):
+        """
+        Replace the variables in the inner expression by their bound values.
+
+        >>> import atomic
+        >>> import predicate
+        >>> import variable
+        >>> import constant
+        >>> x = variable.Variable('X')
+        >>> e = Negation(atomic.Atomic(predicate.Predicate('P'), x))
+        >>> print(e.substitute({x: constant.Constant('a')}))
+        (^P(a))
+        """
+        return Negation(self.expr.substitute(bindings))
+
     def __str__(self):
         """
         String representation to print.
@@ -51,6 +69,10 @@ class Negation(expression.Expression):
         """Return the type of this expression."""
         return 'Negation'
 
+    def children(self):
+        """Get the sub-expressions of this expression."""
+        return (self.expr,)
+
     def __eq__(self, other):
         """
         Compare two expressions to check if they're equal.
@@ -70,11 +92,15 @@ class Negation(expression.Expression):
         >>> na == Negation(a)
         True
         """
-        return self.type() == other.type() and self.expr == other.expr
+        if self is other:
+            return True
+
+        return self.type() == other.type() and self._hash == other._hash and\
+            self.expr == other.expr
 
     def __hash__(self):
-        """Get the hash of this implication."""
-        return hash((type(self), self.expr))
+        """Get the hash of this negation, computed on creation."""
+        return self._hash
 
 
 def test():
@@ -9,6 +9,8 @@ import disjunction
 import implication
 import negation
 import atomic
+import factory
+import lexer
 
 import predicate
 import variable
@@ -16,16 +18,259 @@ import constant
 
 
 class Parser:
-    """Parser class. Parses expressions from strings."""
+    """
+    Parser class. Parses expressions from strings.
+
+    The input is tokenized once by a Lexer and then parsed in a single
+    loop, so the cost is linear in the length of the string.
+    From tightest to loosest binding the operators are '¬', '&', '|' and
+    '>'. A chain of conjunctions or of disjunctions builds one flat node,
+    and implications associate to the right.
+    """
+
+    BINARY_OPERATORS = {
+        '>': (1, True, implication.Implication),
+        '|': (2, False, disjunction.Disjunction),
+        '&': (3, False, conjunction.Conjunction),
+    }
+
+    def __init__(self, terms=None):
+        """
+        Initialize an instance of Parser.
+
+        Expressions are built through the factory terms, or the shared
+        expression factory if not given, so parsing the same term twice
+        returns the same object.
+
+        >>> p = Parser()
+        >>> p.parse('P(a) & ¬Q(X)') is p.parse('(P(a) & (¬Q(X)))')
+        True
+        >>> Parser(factory.Factory()).parse('P(a)') is p.parse('P(a)')
+        False
+        """
+        self.lexer = lexer.Lexer()
+        if terms is None:
+            terms = factory.default_factory
+        self.factory = terms
+
+    def parse(self, str_expression):
+        """
+        Parse a given expression.
+
+        If the string is not a well formed expression, returns None.
+
+        >>> p = Parser()
+        >>> print(p.parse('P(x) & Q(Y)'))
+        (P(x) & Q(Y))
+        >>> print(p.parse('P(a) & P(b) & P(c)'))
+        (P(a) & P(b) & P(c))
+        >>> print(p.parse('P(a) | Q(a) & ¬R(a) > S(a)'))
+        ((P(a) | (Q(a) & (^R(a)))) > S(a))
+        >>> print(p.parse('P(a) > Q(a) > R(a)'))
+        (P(a) > (Q(a) > R(a)))
+        >>> print(p.parse('¬(P(a) & Q(a))'))
+        (^(P(a) & Q(a)))
+        >>> print(p.parse(str(p.parse('¬P(a) | Q()'))))
+        ((^P(a)) | Q())
+        >>> p.parse('P(a) & ')
+        >>> p.parse('P(a))')
+        """
+        try:
+            return self.parse_tokens(self.lexer.tokenize(str_expression))
+        except lexer.ParseError:
+            return None
+
+    def parse_tokens(self, tokens):
+        """
+        Parse a whole list of tokens into an expression.
+
+        Raises a ParseError if the tokens are not a well formed expression.
+
+        Operands and the operators between them are collected in a loop,
+        with a frame on an explicit stack for every open parenthesis, so
+        neither long chains nor deep nesting are limited by the Python
+        stack.
+
+        >>> p = Parser()
+        >>> p.parse_tokens(p.lexer.tokenize('P(a) Q(b)'))
+        Traceback (most recent call last):
+        ...
+        ParseError: Unexpected 'NAME' at position 5
+        >>> e = p.parse(' > '.join('P(a%d)' % i for i in range(2000)))
+        >>> print(e.expr1)
+        P(a0)
+        >>> print(e.expr2.expr1)
+        P(a1)
+        >>> e = p.parse('(' * 500 + '¬P(a) & Q(a)' + ')' * 500)
+        >>> print(e)
+        ((^P(a)) & Q(a))
+        >>> print(p.parse('(¬' * 500 + 'P(a)' + ')' * 500).type())
+        Negation
+        >>> p.parse('(' * 500 + 'P(a)' + ')' * 499)
+        """
+        # Every frame holds the negations before its parenthesis, and the
+        # operands and operators read inside it so far.
+        frames = [(0, [], [])]
+        position = 0
+        while True:
+            negations = 0
+            while tokens[position][0] == '¬':
+                negations += 1
+                position += 1
+
+            kind = tokens[position][0]
+            if kind == '(':
+                frames.append((negations, [], []))
+                position += 1
+                continue
+            elif kind != 'NAME':
+                self.unexpected(tokens[position])
+
+            expr, position = self.parse_atomic(tokens, position)
+            expr = self.negate(expr, negations)
+            while True:
+                negations, operands, operators = frames[-1]
+                operands.append(expr)
+                kind = tokens[position][0]
+                position += 1
+                if kind in self.BINARY_OPERATORS:
+                    operators.append(kind)
+                    break
+                elif kind == ')' and len(frames) > 1:
+                    frames.pop()
+                    expr = self.negate(self.fold(operands, operators),
+                                       negations)
+                elif kind == 'END' and len(frames) == 1:
+                    return self.fold(operands, operators)
+                else:
+                    self.unexpected(tokens[position - 1])
+
+    def fold(self, operands, operators):
+        """
+        Combine a list of operands joined by binary operators.
+
+        Operators are applied from the tightest to the loosest binding,
+        every run of the same one combining its operands at once.
+
+        >>> p = Parser()
+        >>> a, b, c = [p.parse('P(%s)' % x) for x in 'abc']
+        >>> print(p.fold([a, b, c, a], ['>', '&', '>']))
+        (P(a) > ((P(b) & P(c)) > P(a)))
+        """
+        levels = sorted(self.BINARY_OPERATORS.items(),
+                        key=lambda item: -item[1][0])
+        for operator, (_, right_associative, cls) in levels:
+            run = [operands[0]]
+            folded, remaining = [], []
+            for other, operand in zip(operators, operands[1:]):
+                if other == operator:
+                    run.append(operand)
+                else:
+                    folded.append(self.combine(cls, right_associative, run))
+                    remaining.append(other)
+                    run = [operand]
+            folded.append(self.combine(cls, right_associative, run))
+            operands, operators = folded, remaining
+
+        return operands[0]
+
+    def combine(self, cls, right_associative, operands):
+        """
+        Join a run of operands of the same operator into an expression.
+
+        Right associative operators nest from the right, and any other one
+        builds a single flat node.
+        """
+        if len(operands) == 1:
+            return operands[0]
+
+        if not right_associative:
+            return self.factory.compound(cls, *operands)
+
+        expr = operands[-1]
+        for left in reversed(operands[:-1]):
+            expr = self.factory.compound(cls, left, expr)
+
+        return expr
+
+    def negate(self, expr, negations):
+        """Wrap an expression in a number of negations."""
+        for _ in range(negations):
+            expr = self.factory.compound(negation.Negation, expr)
+
+        return expr
+
+    def parse_atomic(self, tokens, position):
+        """
+        Parse an atomic expression such as P(x, Y).
+
+        Returns the expression and the position of the next token.
+        """
+        predicate_name = tokens[position][1]
+        position = self.expect(tokens, position + 1, '(')
+
+        names = []
+        if tokens[position][0] == 'NAME':
+            names.append(tokens[position][1])
+            position += 1
+            while tokens[position][0] == ',':
+                position = self.expect(tokens, position + 1, 'NAME')
+                names.append(tokens[position - 1][1])
+
+        position = self.expect(tokens, position, ')')
+        return self.atomic(predicate_name, names), position
+
+    def atomic(self, predicate_name, names):
+        """
+        Build an atomic expression from a predicate name and argument names.
+
+        Names starting with an upper case letter are variables and any
+        other name is a constant.
+
+        >>> p = Parser()
+        >>> a = p.atomic('P', ['x', 'Y'])
+        >>> [x.__class__.__name__ for x in a.arguments]
+        ['Constant', 'Variable']
+        """
+        f = self.factory
+        args = [f.variable(x) if x[0].isupper() else f.constant(x)
+                for x in names]
+
+        return f.atomic(f.predicate(predicate_name), *args)
+
+    def expect(self, tokens, position, kind):
+        """Check the kind of a token and return the position after it."""
+        if tokens[position][0] != kind:
+            self.unexpected(tokens[position])
+
+        return position + 1
+
+    def unexpected(self, token):
+        """Raise a ParseError for an unexpected token."""
+        kind, _, position = token
+        if kind == 'END':
+            raise lexer.ParseError('Unexpected end of expression')
+
+        raise lexer.ParseError('Unexpected \'%s\' at position %d' %
+                               (kind, position))
+
+
+class RecursiveParser:
+    """
+    Recursive string-slicing parser.
+
+    This is the original parser, which re-slices the input string at every
+    level. It is kept as a reference for benchmark.py.
+    """
 
     def __init__(self):
-        """Initialize an instance of Parser."""
+        """Initialize an instance of RecursiveParser."""
         pass
 
     def unbox(self, str_expression):
         """Remove unnecessary parenthesis.
 
-        >>> p = Parser()
+        >>> p = RecursiveParser()
         >>> p.unbox('((hey,))') == 'hey,'
         True
         """
@@ -57,7 +302,7 @@ class Parser:
 
         If the expression does not match, returns None.
 
-        >>> p = Parser()
+        >>> p = RecursiveParser()
         >>> expr = 'P(x, y)'
         >>> atomic = p.try_parse_atomic(expr)
         >>> tuple(arg.name for arg in atomic.arguments) == ('x', 'y')
@@ -93,7 +338,7 @@ class Parser:
 
         If the expression does not match, returns None.
 
-        >>> p = Parser()
+        >>> p = RecursiveParser()
         >>> expr = '¬P(a, Y)'
         >>> negation = p.try_parse_negation(expr)
         >>> atomic = negation.expr
@@ -117,7 +362,7 @@ class Parser:
         """
         Parse either a conjunction or disjunction.
 
-        >>> p = Parser()
+        >>> p = RecursiveParser()
         >>> expr = 'P(X) & P(Y)'
         >>> res = p.try_parse_binary(expr)
         >>> print(res.type())
@@ -173,7 +418,7 @@ class Parser:
         """
         Grab the last section that could be an expression from a string.
 
-        >>> p = Parser()
+        >>> p = RecursiveParser()
         >>> print(p.grab_last_expression('P(x) & P(y)'))
         P(y)
 
@@ -195,7 +440,7 @@ class Parser:
         """
         Get the index at which parenthesis are balanced.
 
-        >>> p = Parser()
+        >>> p = RecursiveParser()
         >>> p.backwards_closure('(((,))()),()')
         -2
         """
@@ -217,7 +462,7 @@ class Parser:
         """
         Get the index at which parenthesis are balanced.
 
-        >>> p = Parser()
+        >>> p = RecursiveParser()
         >>> p.closure('(((,))()),()')
         8
 
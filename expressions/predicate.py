@@ -4,9 +4,11 @@
 from __future__ import unicode_literals
 
 
-class Predicate:
+class Predicate(object):
     """An assertion over a variable or constant."""
 
+    __slots__ = ('name', '__weakref__')
+
     def __init__(self, name):
         """
         Create a new predicate with a given name.
@@ -35,6 +37,10 @@ class Predicate:
         """
         return type(self) == type(other) and self.name == other.name
 
+    def __ne__(self, other):
+        """Compare two predicates to check if they're different."""
+        return not self == other
+
     def __hash__(self):
         """Get the hash of this predicate."""
         return hash(self.name)
@@ -0,0 +1,191 @@
+#!/usr/bin/python
+# -*- coding: utf8 -*-
+"""
+This module contains the Simplifier class, which normalizes expressions.
+
+Simplified expressions have no double negations and no Tautology or
+Contradiction inside a compound expression: those are folded away. Nested
+conjunctions or disjunctions are merged, their duplicated members dropped,
+and their members sorted by a canonical key, so that the same chain is the
+same expression whatever its order or association was. Conjunctions with
+complementary members fold to Contradiction, and disjunctions with them to
+Tautology.
+
+Results are canonical expressions of the simplifier's factory, and are
+memoized per compound expression for as long as it is alive.
+"""
+from __future__ import unicode_literals
+import weakref
+
+import conjunction
+import disjunction
+import expression
+import factory
+import implication
+import negation
+
+COMPOUND = frozenset(['Negation', 'Conjunction', 'Disjunction',
+                      'Implication'])
+
+
+class Simplifier(object):
+    """Rewrites expressions into a simplified canonical form."""
+
+    def __init__(self, terms=None):
+        """
+        Create a simplifier building expressions with a factory.
+
+        terms is the factory to use, the default one if not given.
+        """
+        if terms is None:
+            terms = factory.default_factory
+        self.factory = terms
+        self.cache = weakref.WeakKeyDictionary()
+        self.keys = weakref.WeakKeyDictionary()
+        self.true = self.factory.intern(expression.Tautology())
+        self.false = self.factory.intern(expression.Contradiction())
+        self.keys[self.true] = (0, 'T')
+        self.keys[self.false] = (0, 'F')
+
+    def simplify(self, e):
+        """
+        Get the simplified form of an expression.
+
+        Sub-expressions are visited by expression.postorder, so deep
+        expressions don't hit the recursion limit.
+
+        Only compound expressions are memoized, weakly, and those that are
+        already simple are memoized as None, so the memo never keeps an
+        expression alive. Atomic expressions are just interned.
+
+        >>> import conjunction
+        >>> import parser
+        >>> p = parser.Parser()
+        >>> s = Simplifier(p.factory)
+        >>> print(s.simplify(conjunction.Conjunction(
+        ...     p.parse('¬¬P(a)'), expression.Tautology())))
+        P(a)
+        >>> s.simplify(p.parse('(A(x) & B(x)) & C(x)')) is s.simplify(
+        ...     p.parse('C(x) & (B(x) & A(x)) & A(x)'))
+        True
+        >>> print(s.simplify(p.parse('P(a) | Q(a) | ¬P(a)')))
+        T
+        >>> print(s.simplify(p.parse('¬(P(a) > P(a)) | ¬¬Q(a)')))
+        Q(a)
+        >>> e = p.parse('¬¬P(b) & P(c)')
+        >>> n = len(s.cache)
+        >>> print(s.simplify(e))
+        (P(b) & P(c))
+        >>> len(s.cache) > n
+        True
+        >>> del e
+        >>> len(s.cache) == n
+        True
+        """
+        cache = self.cache
+        results = {}
+        for node in expression.postorder(e, cache):
+            if node in results:
+                continue
+
+            kind = node.type()
+            if kind not in COMPOUND:
+                results[node] = self.factory.intern(node)
+                continue
+            elif node in cache:
+                result = cache[node]
+                results[node] = node if result is None else result
+                continue
+
+            operands = [results[x] for x in node.children()]
+            if kind == 'Negation':
+                result = self.negate(operands[0])
+            elif kind in ('Conjunction', 'Disjunction'):
+                result = self.chain(kind, operands)
+            else:
+                result = self.imply(*operands)
+            results[node] = result
+            cache[node] = result if result is not node else None
+
+        return results[e]
+
+    def key(self, e):
+        """Get the canonical sort key of a simplified expression."""
+        if e.type() == 'Atomic':
+            return (1, str(e), 0)
+
+        return self.keys[e]
+
+    def negate(self, e):
+        """Get the simplified negation of a simplified expression."""
+        if e is self.true:
+            return self.false
+        elif e is self.false:
+            return self.true
+        elif e.type() == 'Negation':
+            return e.expr
+
+        result = self.factory.compound(negation.Negation, e)
+        key = self.key(e)
+        if key[0] == 1:
+            self.keys[result] = (1, key[1], 1)
+        else:
+            self.keys[result] = (2, key)
+
+        return result
+
+    def chain(self, kind, operands):
+        """Get the simplified kind expression of simplified operands."""
+        if kind == 'Conjunction':
+            identity, absorbing = self.true, self.false
+            cls, rank = conjunction.Conjunction, 3
+        else:
+            identity, absorbing = self.false, self.true
+            cls, rank = disjunction.Disjunction, 4
+
+        members = set()
+        for x in operands:
+            if x.type() == kind:
+                members.update(x.exprs)
+            else:
+                members.add(x)
+
+        if absorbing in members:
+            return absorbing
+        members.discard(identity)
+        if any(x.type() == 'Negation' and x.expr in members for x in members):
+            return absorbing
+        elif not members:
+            return identity
+        elif len(members) == 1:
+            return members.pop()
+
+        keys = dict((x, self.key(x)) for x in members)
+        members = sorted(members, key=keys.get)
+        result = self.factory.compound(cls, *members)
+        self.keys[result] = (rank, tuple(keys[x] for x in members))
+        return result
+
+    def imply(self, e1, e2):
+        """Get the simplified implication between simplified expressions."""
+        if e1 is self.false or e2 is self.true or e1 is e2:
+            return self.true
+        elif e1 is self.true:
+            return e2
+        elif e2 is self.false:
+            return self.negate(e1)
+
+        result = self.factory.compound(implication.Implication, e1, e2)
+        self.keys[result] = (5, self.key(e1), self.key(e2))
+        return result
+
+
+def test():
+    """Test the module."""
+    print('Testing')
+    import doctest
+    doctest.testmod()
+    print('Done')
+
+if __name__ == '__main__':
+    test()
@@ -4,9 +4,11 @@
 from __future__ import unicode_literals
 
 
-class Variable:
+class Variable(object):
     """A variable represents some indeterminate abstract object."""
 
+    __slots__ = ('name', '__weakref__')
+
     def __init__(self, name):
         """
         Create a new variable with a given name.
@@ -35,15 +37,22 @@ class Variable:
 
         Two variables are equal when they have the same name.
         """
-        return self.name == other.name
+        return type(self) == type(other) and self.name == other.name
+
+    def __ne__(self, other):
+        """Compare two variables to check if they're different."""
+        return not self == other
 
     def __hash__(self):
         """
         Get the hash of this variable.
 
-        All variables have the same hash.
+        >>> hash(Variable('X')) == hash(Variable('x'))
+        True
+        >>> hash(Variable('X')) == hash(Variable('Y'))
+        False
         """
-        return 0
+        return hash(self.name)
 
 
 def test():
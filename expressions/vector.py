@@ -0,0 +1,157 @@
+#!/usr/bin/python
+# -*- coding: utf8 -*-
+"""
+This module contains the Program class, which evaluates in batches.
+
+An expression is compiled once into a straight-line program of bitwise
+operations. Given a boolean matrix with one row per world and one column
+per atom, the columns are packed into bit arrays, eight worlds per byte,
+and the program runs NumPy bitwise operations on whole columns at a time,
+so the cost per world doesn't go through the Python interpreter.
+"""
+from __future__ import unicode_literals
+import numpy
+
+import expression
+
+
+class Program(object):
+    """An expression compiled to bitwise operations over packed worlds."""
+
+    def __init__(self, e, atoms):
+        """
+        Compile an expression given the atoms of the matrix columns.
+
+        Atoms missing from the list are false in every world, as they
+        would be when missing from the knowledge for eval.
+
+        >>> import atomic
+        >>> import conjunction
+        >>> import negation
+        >>> import predicate
+        >>> import constant
+        >>> a = atomic.Atomic(predicate.Predicate('P'), constant.Constant('a'))
+        >>> b = atomic.Atomic(predicate.Predicate('P'), constant.Constant('b'))
+        >>> e = conjunction.Conjunction(a, negation.Negation(a))
+        >>> print(' '.join(step[0] for step in Program(e, [a, b]).steps))
+        atom not and
+        """
+        columns = dict((atom, i) for i, atom in enumerate(atoms))
+        self.width = len(atoms)
+        self.steps = []
+        slots = {}
+        root = e
+        for e in expression.postorder(e, slots):
+            if e in slots:
+                continue
+
+            kind = e.type()
+            if kind == 'Atomic':
+                if e in columns:
+                    self.steps.append(('atom', columns[e]))
+                else:
+                    self.steps.append(('false',))
+            elif kind == 'Tautology':
+                self.steps.append(('true',))
+            elif kind == 'Contradiction':
+                self.steps.append(('false',))
+            else:
+                operation = {'Negation': 'not', 'Conjunction': 'and',
+                             'Disjunction': 'or',
+                             'Implication': 'implies'}[kind]
+                self.steps.append((operation,) + tuple(
+                    slots[child] for child in e.children()))
+
+            slots[e] = len(self.steps) - 1
+
+        self.result = slots[root]
+        self.last = {}
+        for i, step in enumerate(self.steps):
+            for slot in step[1:] if step[0] != 'atom' else ():
+                self.last[slot] = i
+
+    def __call__(self, worlds):
+        """
+        Evaluate the program on an N x A boolean matrix of worlds.
+
+        Returns a boolean vector with the value in each world. Every
+        intermediate bit array is dropped once the last step using it ran.
+
+        >>> import atomic
+        >>> import implication
+        >>> import predicate
+        >>> import constant
+        >>> a = atomic.Atomic(predicate.Predicate('P'), constant.Constant('a'))
+        >>> b = atomic.Atomic(predicate.Predicate('P'), constant.Constant('b'))
+        >>> program = Program(implication.Implication(a, b), [a, b])
+        >>> program(numpy.array([[1, 0], [1, 1], [0, 0], [0, 1]], bool))
+        array([False,  True,  True,  True])
+        """
+        worlds = numpy.asarray(worlds, dtype=bool)
+        if worlds.ndim != 2 or worlds.shape[1] != self.width:
+            raise Exception('Expected a matrix with %d columns' % self.width)
+
+        count = worlds.shape[0]
+        packed = numpy.ascontiguousarray(numpy.packbits(worlds, axis=0).T)
+        size = packed.shape[1]
+
+        values = [None] * len(self.steps)
+        for i, step in enumerate(self.steps):
+            operation = step[0]
+            if operation == 'atom':
+                value = packed[step[1]]
+            elif operation == 'true':
+                value = numpy.full(size, 0xff, numpy.uint8)
+            elif operation == 'false':
+                value = numpy.zeros(size, numpy.uint8)
+            elif operation == 'not':
+                value = numpy.invert(values[step[1]])
+            elif operation == 'and':
+                value = numpy.bitwise_and(values[step[1]], values[step[2]])
+                for slot in step[3:]:
+                    numpy.bitwise_and(value, values[slot], out=value)
+            elif operation == 'or':
+                value = numpy.bitwise_or(values[step[1]], values[step[2]])
+                for slot in step[3:]:
+                    numpy.bitwise_or(value, values[slot], out=value)
+            else:
+                value = numpy.invert(values[step[1]])
+                numpy.bitwise_or(value, values[step[2]], out=value)
+
+            values[i] = value
+            for slot in step[1:] if operation != 'atom' else ():
+                if self.last[slot] == i and slot != self.result:
+                    values[slot] = None
+
+        return numpy.unpackbits(values[self.result])[:count].astype(bool)
+
+
+def evaluate(e, atoms, worlds):
+    """
+    Evaluate an expression on each row of an N x A matrix of worlds.
+
+    Column j of the matrix tells whether atoms[j] is true in each world.
+
+    >>> import atomic
+    >>> import disjunction
+    >>> import predicate
+    >>> import constant
+    >>> a = atomic.Atomic(predicate.Predicate('P'), constant.Constant('a'))
+    >>> b = atomic.Atomic(predicate.Predicate('P'), constant.Constant('b'))
+    >>> worlds = numpy.random.RandomState(0).rand(1000, 2) < 0.5
+    >>> result = evaluate(disjunction.Disjunction(a, b), [a, b], worlds)
+    >>> (result == worlds.any(axis=1)).all()
+    True
+    """
+    return Program(e, atoms)(worlds)
+
+
+def test():
+    """Test the module."""
+    print('Testing')
+    import doctest
+    doctest.testmod()
+    print('Done')
+
+if __name__ == '__main__':
+    test()
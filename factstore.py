@@ -0,0 +1,654 @@
+#!/usr/bin/python
+# -*- coding: utf8 -*-
+"""
+This module contains the FactStore class for indexed ground facts.
+
+Facts are not kept as objects: every argument is given an integer code by
+a SymbolTable, and the facts of each (predicate, arity) signature are kept
+in a Table, as one array of codes per argument position, together with a
+flag telling whether each fact was asserted rather than derived. Atomic
+expressions are only built, through the store's factory, for the facts
+returned to callers.
+"""
+import array
+
+import numpy
+
+import expressions.factory
+import expressions.parser
+import expressions.variable
+import symbols
+
+
+def pack(codes):
+    """
+    Get a single integer key for a row of codes.
+
+    >>> pack([1, 2]) == (1 << 32) + 2
+    True
+    """
+    key = 0
+    for code in codes:
+        key = key << 32 | code
+
+    return key
+
+
+class Table(object):
+    """
+    The facts of one signature, as columns of argument codes.
+
+    Rows are appended as facts are added. A removed fact's row is only
+    marked as dead in live, and left in the indexes, until more than half
+    of the rows are dead and the table is compacted. Compacting builds new
+    columns rather than changing them, so rows read before stay valid.
+    The asserted flag of every row is kept in asserted, alongside live.
+    """
+
+    def __init__(self, arity, index_arguments=True):
+        """
+        Create an empty table for facts with arity arguments.
+
+        If index_arguments is True, the rows holding each code at each
+        position are indexed too.
+
+        >>> t = Table(2)
+        >>> t.add([0, 1]), t.add([0, 2]), t.add([0, 1])
+        (True, True, False)
+        >>> len(t), list(t.index[0, 0])
+        (2, [0, 1])
+        """
+        self.arity = arity
+        self.columns = [array.array(str('i')) for _ in range(arity)]
+        self.live = bytearray()
+        self.asserted = bytearray()
+        self.keys = {}
+        self.index = {} if index_arguments else None
+        self.dead = 0
+
+    def add(self, codes, asserted=False):
+        """
+        Add a row of codes. Returns whether it was not there before.
+
+        If asserted, the row is flagged as asserted, even if it was there.
+
+        >>> t = Table(1)
+        >>> t.add([0]), t.add([1], True), t.add([0], True), t.add([1])
+        (True, True, False, False)
+        >>> list(t.asserted)
+        [1, 1]
+        """
+        key = pack(codes)
+        row = self.keys.get(key)
+        if row is not None:
+            if asserted:
+                self.asserted[row] = 1
+            return False
+
+        row = self.keys[key] = len(self.live)
+        self.live.append(1)
+        self.asserted.append(1 if asserted else 0)
+        for column, code in zip(self.columns, codes):
+            column.append(code)
+
+        if self.index is not None:
+            for entry in enumerate(codes):
+                rows = self.index.get(entry)
+                if rows is None:
+                    rows = self.index[entry] = array.array(str('i'))
+                rows.append(row)
+
+        return True
+
+    def extend(self, rows, asserted=None):
+        """
+        Add an n x arity array of codes. Returns the number of new rows.
+
+        The rows are appended and indexed in bulk. asserted gives the flag
+        of each row, as an array of n bytes, if any of them is asserted.
+
+        >>> t = Table(2)
+        >>> t.add([0, 1])
+        True
+        >>> t.extend(numpy.array([[0, 1], [2, 1], [0, 3], [2, 1]]),
+        ...          numpy.array([1, 1, 0, 0], dtype=numpy.uint8))
+        2
+        >>> len(t), list(t.index[1, 1]), list(t.columns[0])
+        (3, [0, 1], [0, 2, 0])
+        >>> list(t.asserted)
+        [0, 1, 0]
+        """
+        if self.arity <= 2:
+            keys = numpy.zeros(len(rows), dtype=numpy.int64)
+            for position in range(self.arity):
+                keys = keys << 32 | rows[:, position]
+            keys = keys.tolist()
+        else:
+            keys = [pack(codes) for codes in rows.tolist()]
+
+        known = self.keys
+        batch = dict(zip(reversed(keys), reversed(range(len(keys)))))
+        new = sorted(i for key, i in batch.items() if key not in known)
+        if not new:
+            return 0
+
+        start = len(self.live)
+        rows = rows[new]
+        known.update(zip([keys[i] for i in new],
+                         range(start, start + len(new))))
+        self.live.extend(b'\x01' * len(new))
+        if asserted is None:
+            self.asserted.extend(bytearray(len(new)))
+        else:
+            self.asserted.extend(bytearray(numpy.asarray(
+                asserted, dtype=numpy.uint8)[new].tobytes()))
+        for column, codes in zip(self.columns, rows.T.tolist()):
+            column.extend(codes)
+
+        if self.index is not None:
+            for position in range(self.arity):
+                codes = rows[:, position]
+                order = numpy.argsort(codes, kind='mergesort')
+                codes = codes[order]
+                bounds = [0] + (numpy.flatnonzero(numpy.diff(codes)) +
+                                1).tolist() + [len(codes)]
+                codes = codes.tolist()
+                order = (order + start).tolist()
+                for i, j in zip(bounds, bounds[1:]):
+                    bucket = self.index.get((position, codes[i]))
+                    if bucket is None:
+                        bucket = self.index[position, codes[i]] = \
+                            array.array(str('i'))
+                    bucket.extend(order[i:j])
+
+        return len(new)
+
+    def discard(self, codes):
+        """
+        Remove a row of codes. Returns whether it was there.
+
+        >>> t = Table(1)
+        >>> for code in range(4):
+        ...     _ = t.add([code])
+        >>> t.discard([1]), t.discard([1]), t.discard([2]), t.dead
+        (True, False, True, 2)
+        >>> t.discard([3]), t.dead, list(t.columns[0])
+        (True, 0, [0])
+        """
+        row = self.keys.pop(pack(codes), None)
+        if row is None:
+            return False
+
+        self.live[row] = 0
+        self.dead += 1
+        if self.dead > len(self.keys):
+            self.compact()
+
+        return True
+
+    def compact(self):
+        """Drop the dead rows, renumbering the live ones."""
+        rows = sorted(self.keys.values())
+        self.columns = [array.array(str('i'), [column[row] for row in rows])
+                        for column in self.columns]
+        self.live = bytearray(b'\x01' * len(rows))
+        self.asserted = bytearray(self.asserted[row] for row in rows)
+        self.keys = dict((key, i) for i, key in enumerate(
+            sorted(self.keys, key=self.keys.get)))
+        self.dead = 0
+
+        if self.index is not None:
+            self.index = {}
+            for position, column in enumerate(self.columns):
+                for row, code in enumerate(column):
+                    rows = self.index.get((position, code))
+                    if rows is None:
+                        rows = self.index[position, code] = array.array(
+                            str('i'))
+                    rows.append(row)
+
+    def find(self, codes):
+        """Get the row of some codes, or None if they are not there."""
+        if codes is None:
+            return None
+
+        return self.keys.get(pack(codes))
+
+    def select(self, constants):
+        """
+        Get the rows of the smallest index entry for some constants.
+
+        constants are (position, code) pairs. Returns None for every row.
+        Some rows may be dead.
+        """
+        selected = None
+        if self.index is not None:
+            for key in constants:
+                rows = self.index.get(key, ())
+                if selected is None or len(rows) < len(selected):
+                    selected = rows
+                    if not selected:
+                        break
+
+        return selected
+
+    def codes(self, start=0):
+        """
+        Get the live rows from row start on, as an array of codes.
+
+        >>> t = Table(2)
+        >>> t.add([0, 1]), t.add([0, 2]), t.add([3, 4])
+        (True, True, True)
+        >>> t.discard([0, 2])
+        True
+        >>> t.codes(1).tolist()
+        [[3, 4]]
+        """
+        live = numpy.frombuffer(self.live, numpy.uint8)[start:].astype(bool)
+        rows = numpy.zeros((len(live), self.arity), dtype=numpy.int64)
+        for position, column in enumerate(self.columns):
+            rows[:, position] = numpy.frombuffer(column, numpy.int32)[start:]
+
+        return rows[live]
+
+    def __len__(self):
+        """Get the number of live rows."""
+        return len(self.keys)
+
+
+class View(object):
+    """
+    Some rows of a table, seen as the facts they hold.
+
+    The facts are built as the view is iterated. Its length may count dead
+    rows, so it is an upper bound on the number of facts it yields.
+    """
+
+    def __init__(self, store, predicate, table, rows=None):
+        """Create a view of the given rows of a table, or of all of them."""
+        self.store = store
+        self.predicate = predicate
+        self.columns = table.columns
+        self.live = table.live
+        self.rows = rows
+        self.size = len(table) if rows is None else len(rows)
+
+    def __len__(self):
+        """Get the number of rows in the view."""
+        return self.size
+
+    def __iter__(self):
+        """Iterate over the facts of the live rows."""
+        rows = range(len(self.live)) if self.rows is None else self.rows
+        for row in rows:
+            if self.live[row]:
+                yield self.store.build(self.predicate, [
+                    column[row] for column in self.columns])
+
+
+class FactStore(object):
+    """
+    A set of atomic facts indexed by predicate and arity.
+
+    Facts can optionally be indexed by the argument found at each position
+    too, so that pattern queries only look at the facts that could match.
+    The store behaves like a set for membership, length and iteration.
+
+    The facts of a signature can also be attached unbuilt, together with a
+    function giving their codes, which is only called once the signature
+    is first looked at.
+    """
+
+    def __init__(self, index_arguments=True, factory=None):
+        """
+        Create a new empty fact store.
+
+        Facts are built by factory when returned, or by the default one.
+
+        >>> s = FactStore()
+        >>> len(s)
+        0
+        """
+        self.index_arguments = index_arguments
+        if factory is None:
+            factory = expressions.factory.default_factory
+        self.factory = factory
+        self.symbols = symbols.SymbolTable()
+        self.signatures = {}
+        self.pending = {}
+        self.size = 0
+
+    def add(self, fact, asserted=False):
+        """
+        Add a fact to the store. Returns whether it was not there before.
+
+        If asserted, the fact is marked as asserted, even if it was there.
+
+        >>> p = expressions.parser.Parser()
+        >>> s = FactStore()
+        >>> s.add(p.parse('Say(ariel, hello)'))
+        True
+        >>> s.add(p.parse('Say(ariel, hello)'))
+        False
+        >>> len(s), len(s.symbols)
+        (1, 2)
+        >>> s.is_asserted(p.parse('Say(ariel, hello)'))
+        False
+        >>> s.add(p.parse('Say(ariel, hello)'), asserted=True)
+        False
+        >>> s.is_asserted(p.parse('Say(ariel, hello)'))
+        True
+        """
+        signature = fact.signature()
+        if self.pending:
+            self.fetch(signature)
+
+        table = self.signatures.get(signature)
+        if table is None:
+            table = self.signatures[signature] = Table(signature[1],
+                                                       self.index_arguments)
+
+        encode = self.symbols.encode
+        if not table.add([encode(x) for x in fact.arguments], asserted):
+            return False
+
+        self.size += 1
+        return True
+
+    def discard(self, fact):
+        """
+        Remove a fact from the store. Returns whether it was there.
+
+        >>> p = expressions.parser.Parser()
+        >>> s = FactStore()
+        >>> s.add(p.parse('Say(ariel, hello)'))
+        True
+        >>> s.discard(p.parse('Say(ariel, hello)'))
+        True
+        >>> s.discard(p.parse('Say(ariel, hello)'))
+        False
+        >>> len(s), len(s.signatures)
+        (0, 0)
+        """
+        signature = fact.signature()
+        if self.pending:
+            self.fetch(signature)
+
+        table = self.signatures.get(signature)
+        codes = self.encode(fact)
+        if table is None or codes is None or not table.discard(codes):
+            return False
+
+        if not table:
+            del self.signatures[signature]
+        self.size -= 1
+        return True
+
+    def attach(self, signature, count, loader):
+        """
+        Add the count facts of a signature whose codes loader() gives.
+
+        loader returns the rows of argument codes of the facts, with codes
+        from the store's symbols, as an array or a list of lists, and their
+        asserted flags, as an array of bytes or None if none is asserted.
+        It is only called when the signature is first looked at. The store
+        must not have any fact of that signature yet.
+
+        >>> p = expressions.parser.Parser()
+        >>> s = FactStore()
+        >>> hi, bye = [s.symbols.encode(p.factory.constant(name))
+        ...            for name in ('hi', 'bye')]
+        >>> s.attach(p.parse('Say(X)').signature(), 2,
+        ...          lambda: ([[hi], [bye]], [0, 1]))
+        >>> len(s), len(s.signatures)
+        (2, 0)
+        >>> p.parse('Say(hi)') in s, len(s.signatures)
+        (True, 1)
+        >>> s.is_asserted(p.parse('Say(bye)'))
+        True
+        """
+        if signature in self.pending or signature in self.signatures:
+            raise Exception('Facts of %s/%d are already in the store' %
+                            signature)
+
+        self.pending[signature] = (count, loader)
+        self.size += count
+
+    def fetch(self, signature):
+        """Add the attached facts of a signature, if there are any."""
+        count, loader = self.pending.pop(signature, (0, None))
+        if loader is None:
+            return
+
+        table = Table(signature[1], self.index_arguments)
+        rows, asserted = loader()
+        table.extend(numpy.asarray(rows, dtype=numpy.int64).reshape(
+            len(rows), signature[1]), asserted)
+
+        self.size += len(table) - count
+        if table:
+            self.signatures[signature] = table
+
+    def extend(self, signature, rows):
+        """
+        Add the facts of a signature given as rows of argument codes.
+
+        rows are an array or a list of lists, added in bulk. Returns the
+        number of new facts. No expression is built.
+
+        >>> p = expressions.parser.Parser()
+        >>> s = FactStore()
+        >>> a = s.symbols.encode(p.factory.constant('a'))
+        >>> s.extend(p.parse('P(X, Y)').signature(), [[a, a], [a, a]])
+        1
+        >>> p.parse('P(a, a)') in s
+        True
+        """
+        table = self.table(signature)
+        if table is None:
+            table = self.signatures[signature] = Table(signature[1],
+                                                       self.index_arguments)
+
+        added = table.extend(numpy.asarray(rows, dtype=numpy.int64).reshape(
+            len(rows), signature[1]))
+        self.size += added
+        return added
+
+    def table(self, signature):
+        """Get the table of a signature, or None if it has no facts."""
+        if self.pending:
+            self.fetch(signature)
+
+        return self.signatures.get(signature)
+
+    def encode(self, fact):
+        """Get the codes of a fact's arguments, or None if any has none."""
+        codes = [self.symbols.lookup(x) for x in fact.arguments]
+        if None in codes:
+            return None
+
+        return codes
+
+    def build(self, predicate, codes):
+        """Build the canonical atomic fact with the given argument codes."""
+        terms = self.symbols.terms
+        return self.factory.atomic(predicate, *[terms[code]
+                                                for code in codes])
+
+    def facts(self, signature):
+        """
+        Get all the facts with a given (predicate, arity) signature.
+
+        >>> p = expressions.parser.Parser()
+        >>> s = FactStore()
+        >>> for f in ('Say(ariel, hello)', 'Say(bob, hi)', 'Say(hi)'):
+        ...     s.add(p.parse(f))
+        True
+        True
+        True
+        >>> len(s.facts(p.parse('Say(X, Y)').signature()))
+        2
+        """
+        if self.pending:
+            self.fetch(signature)
+
+        table = self.signatures.get(signature)
+        if table is None:
+            return ()
+
+        return View(self, signature[0], table)
+
+    def constants(self, pattern):
+        """
+        Get the (position, code) pairs of a pattern's constant arguments.
+
+        Returns None if any of them has no code.
+        """
+        constants = []
+        for position, x in enumerate(pattern.arguments):
+            if not isinstance(x, expressions.variable.Variable):
+                code = self.symbols.lookup(x)
+                if code is None:
+                    return None
+                constants.append((position, code))
+
+        return constants
+
+    def candidates(self, pattern):
+        """
+        Get the smallest indexed set of facts that could match pattern.
+
+        The facts are built as the result is iterated, and its length is
+        an upper bound on their number.
+        """
+        signature = pattern.signature()
+        if self.pending:
+            self.fetch(signature)
+
+        table = self.signatures.get(signature)
+        constants = self.constants(pattern)
+        if table is None or constants is None:
+            return ()
+
+        return View(self, signature[0], table, table.select(constants))
+
+    def match(self, pattern, bindings=None):
+        """
+        Find the facts matching a pattern, which may contain variables.
+
+        Yields (fact, bindings) pairs, where bindings extend the given ones
+        with the values of the pattern variables for that fact. Rows are
+        matched on their codes, so only the matching facts are built.
+
+        >>> p = expressions.parser.Parser()
+        >>> s = FactStore()
+        >>> for f in ('Say(ariel, hello)', 'Say(bob, hello)', 'Say(bob, hi)'):
+        ...     s.add(p.parse(f))
+        True
+        True
+        True
+        >>> sorted(str(f) for f, _ in s.match(p.parse('Say(X, hello)')))
+        ['Say(ariel, hello)', 'Say(bob, hello)']
+        >>> sorted(str(f) for f, _ in s.match(p.parse('Say(bob, X)')))
+        ['Say(bob, hello)', 'Say(bob, hi)']
+        >>> x = p.factory.variable('X')
+        >>> sorted(str(b[x]) for _, b in s.match(p.parse('Say(bob, X)')))
+        ['hello', 'hi']
+        >>> list(s.match(p.parse('Say(X, X)')))
+        []
+        >>> _ = s.add(p.parse('Say(bob, bob)'))
+        >>> [str(f) for f, _ in s.match(p.parse('Say(X, X)'))]
+        ['Say(bob, bob)']
+        """
+        if bindings:
+            pattern = pattern.substitute(bindings)
+
+        if pattern.is_ground():
+            if pattern in self:
+                yield pattern, dict(bindings) if bindings else {}
+            return
+
+        signature = pattern.signature()
+        if self.pending:
+            self.fetch(signature)
+
+        table = self.signatures.get(signature)
+        constants = self.constants(pattern)
+        if table is None or constants is None:
+            return
+
+        variables = {}
+        repeated = []
+        for position, x in enumerate(pattern.arguments):
+            if isinstance(x, expressions.variable.Variable):
+                if x in variables:
+                    repeated.append((variables[x], position))
+                else:
+                    variables[x] = position
+
+        columns = table.columns
+        live = table.live
+        terms = self.symbols.terms
+        rows = table.select(constants)
+        for row in range(len(live)) if rows is None else rows:
+            if not live[row]:
+                continue
+
+            codes = [column[row] for column in columns]
+            if any(codes[position] != code for position, code in constants) \
+                    or any(codes[i] != codes[j] for i, j in repeated):
+                continue
+
+            result = dict(bindings) if bindings else {}
+            for x, position in variables.items():
+                result[x] = terms[codes[position]]
+            yield self.build(signature[0], codes), result
+
+    def __contains__(self, fact):
+        """Check whether a fact is in the store."""
+        signature = fact.signature()
+        if self.pending:
+            self.fetch(signature)
+
+        table = self.signatures.get(signature)
+        if table is None:
+            return False
+
+        return table.find(self.encode(fact)) is not None
+
+    def is_asserted(self, fact):
+        """Check whether a fact is in the store and was asserted."""
+        signature = fact.signature()
+        if self.pending:
+            self.fetch(signature)
+
+        table = self.signatures.get(signature)
+        if table is None:
+            return False
+
+        row = table.find(self.encode(fact))
+        return row is not None and bool(table.asserted[row])
+
+    def __len__(self):
+        """Get the number of facts in the store."""
+        return self.size
+
+    def __iter__(self):
+        """Iterate over all the facts in the store."""
+        for signature in list(self.pending):
+            self.fetch(signature)
+
+        for signature, table in list(self.signatures.items()):
+            for fact in View(self, signature[0], table):
+                yield fact
+
+
+def test():
+    """Test the module."""
+    print('Testing')
+    import doctest
+    doctest.testmod()
+    print('Done')
+
+if __name__ == '__main__':
+    test()
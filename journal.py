@@ -0,0 +1,240 @@
+#!/usr/bin/python
+# -*- coding: utf8 -*-
+"""
+This module contains the Journal class, a write-ahead log for a Brain.
+
+Every change made to the brain is logged to it before it is applied.
+
+A journal starts with MAGIC and its generation, as 8 little-endian bytes,
+followed by records. Every record is the CRC-32 of the rest of it, packed
+as CHECKSUM, the operation and the lengths of its names and codes, packed
+as FIELDS, and the expressions of the operation encoded by
+expressions.codec. A crash can only leave the last record partially
+written, and since its checksum won't match, it is cut off when the
+journal is opened again.
+
+Records are buffered and written together, with a single flush and fsync,
+once group of them are pending or delay seconds have passed since the
+oldest one (group commit). The delay is kept by a timer thread, so a batch
+is written even if nothing else is appended. Records still in the buffer
+are lost on a crash, so callers needing one durable right away call commit.
+
+A checkpoint saves a snapshot holding every generation of the journal
+before the next one, and then starts that generation afresh, so recovery
+only replays the records logged since the last snapshot.
+"""
+import os
+import struct
+import threading
+import zlib
+
+import expressions.codec
+
+MAGIC = b'LOGICJOURNAL\n'
+GENERATION = str('<Q')
+CHECKSUM = str('<I')
+FIELDS = str('<BII')
+GROUP = 64
+
+LEARN, RULE, MEMORY, FORGET = range(4)
+
+
+class Journal(object):
+    """Class appending the changes made to a brain to a log file."""
+
+    def __init__(self, path, group=GROUP, delay=None):
+        """
+        Open the journal at path, creating it if needed.
+
+        A partially written record at the end of the file is cut off.
+
+        >>> import tempfile
+        >>> import expressions.parser
+        >>> p = expressions.parser.Parser()
+        >>> handle, path = tempfile.mkstemp()
+        >>> os.close(handle)
+        >>> j = Journal(path, group=2)
+        >>> j.append(LEARN, p.parse('P(a) & Q(a)'))
+        >>> len(j.buffer), os.path.getsize(path)
+        (1, 21)
+        >>> j.append(RULE, p.parse('P(X)'), p.parse('R(X)'))
+        >>> len(j.buffer), os.path.getsize(path)
+        (0, 141)
+        >>> j.append(FORGET, p.parse('Q(a)'))
+        >>> j.close()
+        >>> with open(path, 'ab') as f:
+        ...     _ = f.write(b'\\x01\\x02\\x03')
+        >>> j = Journal(path)
+        >>> for operation, exprs in j.entries(p.factory):
+        ...     print('%d %s' % (operation, ' '.join(str(e) for e in exprs)))
+        0 (P(a) & Q(a))
+        1 P(X) R(X)
+        3 Q(a)
+        >>> j.close()
+        >>> import time
+        >>> j = Journal(path, delay=0.01)
+        >>> j.append(LEARN, p.parse('R(b)'))
+        >>> time.sleep(0.5)
+        >>> len(j.buffer), len(list(Journal(path).records()))
+        (0, 4)
+        >>> j.close()
+        >>> os.remove(path)
+        """
+        self.path = path
+        self.group = group
+        self.delay = delay
+        self.buffer = []
+        self.timer = None
+        self.lock = threading.RLock()
+
+        if not os.path.exists(path) or \
+                os.path.getsize(path) < len(MAGIC) + 8:
+            self.start(path, 0)
+
+        self.file = open(path, 'r+b')
+        self.generation = self.header()
+        end = self.file.tell()
+        for _, _, end in self.records():
+            pass
+        self.file.seek(end)
+        self.file.truncate()
+
+    def start(self, path, generation):
+        """Write an empty journal of a generation over path."""
+        temporary = path + '.tmp'
+        with open(temporary, 'wb') as f:
+            f.write(MAGIC + struct.pack(GENERATION, generation))
+            f.flush()
+            os.fsync(f.fileno())
+        os.rename(temporary, path)
+
+    def header(self):
+        """Read the header of the file and return its generation."""
+        self.file.seek(0)
+        data = self.file.read(len(MAGIC) + 8)
+        if data[:len(MAGIC)] != MAGIC:
+            raise Exception('%s is not a journal' % self.path)
+
+        return struct.unpack(GENERATION, data[len(MAGIC):])[0]
+
+    def records(self):
+        """
+        Get the (operation, data, end) of every whole record in the file.
+
+        data is the (names, codes) pair encoding the expressions of the
+        operation, and end the offset after the record.
+        """
+        start = struct.calcsize(CHECKSUM)
+        size = start + struct.calcsize(FIELDS)
+        self.file.seek(len(MAGIC) + 8)
+        while True:
+            header = self.file.read(size)
+            if len(header) < size:
+                return
+
+            checksum, = struct.unpack(CHECKSUM, header[:start])
+            operation, names, codes = struct.unpack(FIELDS, header[start:])
+            body = self.file.read(names + codes)
+            if len(body) < names + codes or checksum != zlib.crc32(
+                    header[start:] + body) & 0xffffffff:
+                return
+
+            yield operation, (body[:names], body[names:]), self.file.tell()
+
+    def entries(self, terms=None):
+        """
+        Get the (operation, expressions) of every record in the file.
+
+        Expressions are built by the factory terms, or the default one.
+        """
+        self.commit()
+        for operation, data, _ in list(self.records()):
+            yield operation, expressions.codec.decode(data, terms)
+
+    def append(self, operation, *exprs):
+        """Log an operation on some expressions."""
+        names, codes = expressions.codec.encode(exprs)
+        body = struct.pack(FIELDS, operation, len(names), len(codes)) + \
+            names + codes
+        with self.lock:
+            self.buffer.append(struct.pack(CHECKSUM, zlib.crc32(body) &
+                                           0xffffffff) + body)
+            if len(self.buffer) >= self.group:
+                self.commit()
+            elif self.delay is not None and self.timer is None:
+                self.timer = threading.Timer(self.delay, self.commit)
+                self.timer.daemon = True
+                self.timer.start()
+
+    def commit(self):
+        """Write every buffered record to the file and sync it to disk."""
+        with self.lock:
+            if self.timer is not None:
+                self.timer.cancel()
+                self.timer = None
+
+            if not self.buffer:
+                return
+
+            self.file.seek(0, os.SEEK_END)
+            self.file.write(b''.join(self.buffer))
+            self.file.flush()
+            os.fsync(self.file.fileno())
+            self.buffer = []
+
+    def reset(self, generation):
+        """
+        Drop every record, starting an empty journal of a new generation.
+
+        Buffered records are dropped too, so the changes they log must be
+        held somewhere else already, such as in a snapshot.
+        """
+        with self.lock:
+            self.buffer = []
+            self.commit()
+            self.file.close()
+            self.start(self.path, generation)
+            self.file = open(self.path, 'r+b')
+            self.generation = self.header()
+            self.file.seek(0, os.SEEK_END)
+
+    def replay(self, brain):
+        """
+        Apply every record of the file to a brain.
+
+        The brain must not have a journal open while replaying, or every
+        change would be logged again. Returns the number of records.
+        """
+        replayed = 0
+        for operation, exprs in self.entries(brain.factory):
+            if operation == LEARN:
+                for e in exprs:
+                    brain.learn(e)
+            elif operation == RULE:
+                brain.add_rule(*exprs)
+            elif operation == MEMORY:
+                brain.add_memory(*exprs)
+            elif operation == FORGET:
+                brain.forget(*exprs)
+            else:
+                raise Exception('Unknown journal operation %d' % operation)
+            replayed += 1
+
+        return replayed
+
+    def close(self):
+        """Commit the buffered records and close the file."""
+        with self.lock:
+            self.commit()
+            self.file.close()
+
+
+def test():
+    """Test the module."""
+    print('Testing')
+    import doctest
+    doctest.testmod()
+    print('Done')
+
+if __name__ == '__main__':
+    test()
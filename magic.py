@@ -0,0 +1,188 @@
+#!/usr/bin/python
+# -*- coding: utf8 -*-
+"""
+This module contains the magic sets rewriting of rules for bound queries.
+
+Evaluating rules bottom-up derives every fact that follows from them, even
+when a query only asks about some constants. The magic sets rewriting
+specializes the rules to a query before they are evaluated: predicates are
+adorned with which of their arguments are bound ('b') or free ('f') when
+they are called, and each adorned rule is guarded by a magic predicate that
+holds the bound values it is called with. Magic facts flow from the query
+constants sideways through the rule bodies, in the order rete.join_order
+gives from the bound variables, so that only the facts reachable from
+those constants are derived.
+"""
+import columnar
+import expressions.factory
+import expressions.parser
+import expressions.variable
+import rete
+
+
+def adornment(pattern, bound):
+    """
+    Get the adornment of a pattern given the variables already bound.
+
+    Constants are always bound.
+
+    >>> p = expressions.parser.Parser()
+    >>> print(adornment(p.parse('P(X, a, Y)'), {p.factory.variable('X')}))
+    bbf
+    """
+    return ''.join('f' if isinstance(x, expressions.variable.Variable) and
+                   x not in bound else 'b' for x in pattern.arguments)
+
+
+class Planner(object):
+    """Rewrites rules for atomic queries and evaluates them."""
+
+    def __init__(self, rules, factory=None):
+        """
+        Create a planner for rules given as (body, heads) pairs.
+
+        Both the body and the heads are sequences of atomic expressions.
+        """
+        if factory is None:
+            factory = expressions.factory.default_factory
+        self.factory = factory
+        self.rules = {}
+        for body, heads in rules:
+            for head in heads:
+                self.rules.setdefault(head.signature(), []).append(
+                    (head, tuple(body)))
+
+    def adorn(self, pattern, adornment):
+        """Get a pattern with its predicate adorned."""
+        predicate = self.factory.predicate('%s@%s' % (
+            pattern.predicate.name, adornment))
+        return self.factory.atomic(predicate, *pattern.arguments)
+
+    def magic(self, pattern, adornment):
+        """Get the magic pattern holding the bound arguments of a pattern."""
+        predicate = self.factory.predicate('magic@%s@%s' % (
+            pattern.predicate.name, adornment))
+        return self.factory.atomic(predicate, *[
+            x for x, a in zip(pattern.arguments, adornment) if a == 'b'])
+
+    def rewrite(self, query):
+        """
+        Rewrite the rules relevant to an atomic query.
+
+        Returns (rules, seed, goal): the rewritten (body, heads) pairs, the
+        magic fact holding the query constants, and the query with its
+        adorned predicate. Only the rules reachable from the query are
+        rewritten, once for every adornment they are called with.
+
+        >>> p = expressions.parser.Parser()
+        >>> planner = Planner([
+        ...     ([p.parse('Parent(X, Y)')], [p.parse('Ancestor(X, Y)')]),
+        ...     ([p.parse('Parent(X, Y)'), p.parse('Ancestor(Y, Z)')],
+        ...      [p.parse('Ancestor(X, Z)')]),
+        ...     ([p.parse('Parent(X, Y)')], [p.parse('Child(Y, X)')])])
+        >>> rules, seed, goal = planner.rewrite(p.parse('Ancestor(ana, Y)'))
+        >>> print(seed)
+        magic@Ancestor@bf(ana)
+        >>> all(body[0].predicate.name.startswith('magic@')
+        ...     for body, _ in rules)
+        True
+        >>> for body, heads in rules:
+        ...     print('%s <- %s' % (heads[0], ', '.join(map(str, body[1:]))))
+        Ancestor@bf(X0, X1) <- Ancestor(X0, X1)
+        Ancestor@bf(X, Y) <- Parent(X, Y)
+        magic@Ancestor@bf(Y) <- Parent(X, Y)
+        Ancestor@bf(X, Z) <- Parent(X, Y), Ancestor@bf(Y, Z)
+        """
+        variable = expressions.variable.Variable
+        start = adornment(query, ())
+        rules = []
+        done = set()
+        pending = [(query.signature(), start)]
+
+        while pending:
+            signature, a = pending.pop()
+            if (signature, a) in done:
+                continue
+            done.add((signature, a))
+
+            predicate, arity = signature
+            base = self.factory.atomic(predicate, *[
+                self.factory.variable('X%d' % i) for i in range(arity)])
+            rules.append(([self.magic(base, a), base], [self.adorn(base, a)]))
+
+            for head, body in self.rules.get(signature, ()):
+                bound = set(x for x, b in zip(head.arguments, a) if b == 'b')
+                literals = [self.magic(head, a)]
+                for pattern in [body[i] for i in rete.join_order(body, bound)]:
+                    if pattern.signature() in self.rules:
+                        b = adornment(pattern, bound)
+                        rules.append((list(literals),
+                                      [self.magic(pattern, b)]))
+                        pending.append((pattern.signature(), b))
+                        pattern = self.adorn(pattern, b)
+
+                    literals.append(pattern)
+                    bound.update(x for x in pattern.arguments
+                                 if isinstance(x, variable))
+
+                rules.append((literals, [self.adorn(head, a)]))
+
+        return rules, self.magic(query, start), self.adorn(query, start)
+
+    def query(self, query, knowledge):
+        """
+        Get the facts matching an atomic query that follow from the rules.
+
+        They are derived from the facts in knowledge, which is left
+        unchanged.
+
+        >>> import factstore
+        >>> p = expressions.parser.Parser()
+        >>> k = factstore.FactStore()
+        >>> for i in range(100):
+        ...     _ = k.add(p.parse('Parent(p%d, p%d)' % (i, i + 1)))
+        >>> planner = Planner([
+        ...     ([p.parse('Parent(X, Y)')], [p.parse('Ancestor(X, Y)')]),
+        ...     ([p.parse('Parent(X, Y)'), p.parse('Ancestor(Y, Z)')],
+        ...      [p.parse('Ancestor(X, Z)')])])
+        >>> sorted(str(f) for f in planner.query(
+        ...     p.parse('Ancestor(p97, Y)'), k))
+        ['Ancestor(p97, p100)', 'Ancestor(p97, p98)', 'Ancestor(p97, p99)']
+        >>> len(planner.query(p.parse('Ancestor(X, p3)'), k))
+        3
+        >>> len(k)
+        100
+        >>> import expressions.atomic as atomic
+        >>> import expressions.constant as constant
+        >>> import expressions.predicate as predicate
+        >>> len(planner.query(atomic.Atomic(
+        ...     predicate.Predicate('Ancestor'), constant.Constant('p98'),
+        ...     expressions.variable.Variable('Y')), k))
+        2
+        """
+        query = self.factory.intern(query)
+        rules, seed, goal = self.rewrite(query)
+        engine = columnar.Engine(knowledge)
+        for body, heads in rules:
+            engine.add_rule(body, heads)
+
+        answers = set()
+        for signature, rows in engine.derive([seed]):
+            if signature == goal.signature():
+                for row in rows.tolist():
+                    fact = knowledge.build(query.predicate, row)
+                    if query.match(fact) is not None:
+                        answers.add(fact)
+
+        return list(answers)
+
+
+def test():
+    """Test the module."""
+    print('Testing')
+    import doctest
+    doctest.testmod()
+    print('Done')
+
+if __name__ == '__main__':
+    test()
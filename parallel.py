@@ -0,0 +1,126 @@
+#!/usr/bin/python
+# -*- coding: utf8 -*-
+"""
+This module parses files of expressions in a pool of processes.
+
+A file is split into shards by byte ranges, and every line belongs to the
+shard holding its first byte, so shards are parsed without reading each
+other. Worker processes parse and simplify the lines of a shard and send
+them back encoded by expressions.codec, which is much smaller and faster to
+pickle than the expression objects. The parent decodes each shard through
+its own factory, so the expressions it gets are canonical there.
+"""
+import collections
+import itertools
+import multiprocessing
+import os
+
+import expressions.codec
+import expressions.parser
+import expressions.simplifier
+
+SHARD = 1 << 22
+
+
+def shards(path, size=SHARD):
+    """
+    Get the (start, end) byte ranges splitting a file in shards of size.
+
+    >>> import tempfile
+    >>> handle, path = tempfile.mkstemp()
+    >>> _ = os.write(handle, b'P(a)\\nP(b)\\n')
+    >>> os.close(handle)
+    >>> shards(path, 4)
+    [(0, 4), (4, 8), (8, 10)]
+    >>> os.remove(path)
+    """
+    total = os.path.getsize(path)
+    return [(start, min(start + size, total))
+            for start in range(0, total, size)]
+
+
+def parse_shard(path, start, end):
+    """
+    Parse the lines starting in a byte range of a file.
+
+    Empty lines and lines starting with # are skipped. Returns the
+    simplified expressions of the lines, encoded as one batch.
+    """
+    parser = expressions.parser.Parser()
+    simplifier = expressions.simplifier.Simplifier(parser.factory)
+    encoder = expressions.codec.Encoder()
+
+    with open(path, 'rb') as f:
+        if start:
+            f.seek(start - 1)
+            f.readline()
+
+        position = f.tell()
+        while position < end:
+            line = f.readline()
+            if not line:
+                break
+
+            text = line.strip()
+            if text and not text.startswith(b'#'):
+                e = parser.parse(text)
+                if e is None:
+                    raise Exception('Cannot parse the line at byte %d: %s' %
+                                    (position, text.decode('utf8')))
+                encoder.encode(simplifier.simplify(e))
+
+            position += len(line)
+
+    return encoder.dump()
+
+
+def parse(path, processes=None, factory=None, size=SHARD):
+    """
+    Parse a file in processes, yielding the expressions of each shard.
+
+    Shards are yielded in the order of the file, each as a list of
+    expressions built by factory, or the default one. At most two shards
+    per process are parsed ahead of the one being consumed, so memory does
+    not grow with the size of the file. processes defaults to the number
+    of CPUs.
+
+    >>> import tempfile
+    >>> handle, path = tempfile.mkstemp()
+    >>> lines = ['P(a%d) & Q(X) > R(X)' % i for i in range(100)]
+    >>> _ = os.write(handle, '\\n'.join(lines).encode('utf8'))
+    >>> os.close(handle)
+    >>> p = expressions.parser.Parser()
+    >>> parsed = [e for shard in parse(path, 2, p.factory, 97) for e in shard]
+    >>> parsed == [p.parse(line) for line in lines]
+    True
+    >>> os.remove(path)
+    """
+    processes = processes or multiprocessing.cpu_count()
+    tasks = iter(shards(path, size))
+    pool = multiprocessing.Pool(processes)
+    try:
+        pending = collections.deque(
+            pool.apply_async(parse_shard, (path,) + task)
+            for task in itertools.islice(tasks, 2 * processes))
+
+        while pending:
+            data = pending.popleft().get()
+            task = next(tasks, None)
+            if task is not None:
+                pending.append(pool.apply_async(parse_shard, (path,) + task))
+
+            yield expressions.codec.decode(data, factory)
+    finally:
+        pool.terminate()
+        pool.join()
+
+
+def test():
+    """Test the module."""
+    print('Testing')
+    import doctest
+    doctest.testmod()
+    print('Done')
+
+if __name__ == '__main__':
+    test()
@@ -0,0 +1,221 @@
+#!/usr/bin/python
+# -*- coding: utf8 -*-
+"""
+This module contains the Prover class for goal-directed backward chaining.
+
+Goals are proven on demand by resolving them against the rules whose
+consequent has a conjunct with the goal's signature. Like SLG resolution,
+every distinct subgoal gets a table of answers: a subgoal that is called
+again, even recursively, consumes the answers of its table instead of being
+resolved again. This makes recursive rules terminate and answers repeated
+subgoals from memory. The body of a clause is called in the order given by
+rete.join_order from the variables the goal binds, whatever order it was
+written in.
+
+Resolution is driven by a work queue instead of recursion, so the depth of
+a proof is not limited by the Python stack.
+"""
+import collections
+
+import expressions.factory
+import expressions.parser
+import expressions.variable
+import rete
+
+
+class Table(object):
+    """The answers found so far for one subgoal, and who is waiting."""
+
+    def __init__(self, goal):
+        """Create an empty table for a goal."""
+        self.goal = goal
+        self.answers = set()
+        self.consumers = []
+
+
+class Prover(object):
+    """Proves atomic goals backwards through the rules of a Rete network."""
+
+    def __init__(self, knowledge, network, factory=None):
+        """
+        Create a prover over a FactStore and a rete.Rete network.
+
+        Goals are resolved against the facts in knowledge and the
+        productions of network.
+
+        Tables are kept between calls, so they must be dropped with reset
+        whenever the facts or the rules change.
+        """
+        self.knowledge = knowledge
+        self.network = network
+        if factory is None:
+            factory = expressions.factory.default_factory
+        self.factory = factory
+        self.tables = {}
+        self.heads = None
+
+    def reset(self):
+        """Drop every table and the head index."""
+        self.tables = {}
+        self.heads = None
+
+    def rules_for(self, signature):
+        """Get the (head, body patterns) pairs for a head signature."""
+        if self.heads is None:
+            self.heads = {}
+            for production in self.network.productions:
+                heads = self.network.conjuncts(production.consequent)
+                for head in heads or ():
+                    self.heads.setdefault(head.signature(), []).append(
+                        (head, production.patterns))
+
+        return self.heads.get(signature, ())
+
+    def variant(self, goal):
+        """
+        Get a key shared by all the goals equal up to variable renaming.
+
+        >>> p = expressions.parser.Parser()
+        >>> r = Prover(None, None)
+        >>> key = r.variant(p.parse('P(X, a, X)'))
+        >>> key == r.variant(p.parse('P(Y, a, Y)'))
+        True
+        >>> key == r.variant(p.parse('P(X, a, Y)'))
+        False
+        """
+        names = {}
+        key = []
+        for x in goal.arguments:
+            if isinstance(x, expressions.variable.Variable):
+                key.append(names.setdefault(x, len(names)))
+            else:
+                key.append(x)
+
+        return (goal.predicate, tuple(key))
+
+    def answers(self, goal):
+        """
+        Get every fact matching an atomic goal that follows from the rules.
+
+        >>> import factstore
+        >>> import rete
+        >>> p = expressions.parser.Parser()
+        >>> k = factstore.FactStore()
+        >>> n = rete.Rete()
+        >>> for i in range(3):
+        ...     _ = k.add(p.parse('Edge(n%d, n%d)' % (i, i + 1)))
+        >>> _ = k.add(p.parse('Edge(n3, n0)'))
+        >>> _ = n.add_production(p.parse('Edge(X, Y)'),
+        ...                      p.parse('Path(X, Y)'), k)
+        >>> _ = n.add_production(p.parse('Path(X, Y) & Edge(Y, Z)'),
+        ...                      p.parse('Path(X, Z)'), k)
+        >>> r = Prover(k, n)
+        >>> sorted(str(a) for a in r.answers(p.parse('Path(n1, X)')))
+        ['Path(n1, n0)', 'Path(n1, n1)', 'Path(n1, n2)', 'Path(n1, n3)']
+        >>> r.answers(p.parse('Path(n4, n0)'))
+        []
+
+        Goals built outside the factory are interned first.
+
+        >>> import expressions.atomic as atomic
+        >>> import expressions.constant as constant
+        >>> import expressions.predicate as predicate
+        >>> goal = atomic.Atomic(predicate.Predicate('Path'),
+        ...                      constant.Constant('n3'),
+        ...                      expressions.variable.Variable('Y'))
+        >>> len(Prover(k, n).answers(goal))
+        4
+        """
+        goal = self.factory.intern(goal)
+        work = collections.deque()
+        table = self.call(goal, work)
+
+        while work:
+            task = work.popleft()
+            if task[0] == 'expand':
+                self.expand(task[1], work)
+            else:
+                self.resume(task[1], task[2], work)
+
+        return [answer for answer in table.answers
+                if goal.match(answer) is not None]
+
+    def call(self, goal, work):
+        """Get the table of a subgoal, scheduling its expansion if new."""
+        key = self.variant(goal)
+        table = self.tables.get(key)
+        if table is None:
+            table = self.tables[key] = Table(goal)
+            work.append(('expand', table))
+
+        return table
+
+    def expand(self, table, work):
+        """Find the answers to a new table from the facts and the rules."""
+        goal = table.goal
+        for fact, _ in self.knowledge.match(goal):
+            self.add_answer(table, fact, work)
+
+        for head, body in self.rules_for(goal.signature()):
+            bindings = {}
+            for x, y in zip(head.arguments, goal.arguments):
+                if isinstance(y, expressions.variable.Variable):
+                    continue
+                elif not isinstance(x, expressions.variable.Variable):
+                    if x != y:
+                        break
+                elif bindings.setdefault(x, y) != y:
+                    break
+            else:
+                body = tuple(body[i] for i in rete.join_order(body, bindings))
+                self.proceed((table, head, body, 0, bindings), work)
+
+    def proceed(self, state, work):
+        """Call the next body pattern of a clause, or answer its head."""
+        table, head, body, position, bindings = state
+        if position == len(body):
+            answer = head.substitute(bindings)
+            if answer.is_ground():
+                self.add_answer(table, self.factory.intern(answer), work)
+            return
+
+        subtable = self.call(body[position].substitute(bindings), work)
+        subtable.consumers.append(state)
+        for answer in list(subtable.answers):
+            work.append(('resume', state, answer))
+
+    def resume(self, state, answer, work):
+        """Continue a clause with one answer to its current subgoal."""
+        table, head, body, position, bindings = state
+        bindings = body[position].match(answer, bindings)
+        if bindings is not None:
+            self.proceed((table, head, body, position + 1, bindings), work)
+
+    def add_answer(self, table, answer, work):
+        """Record an answer in a table and pass it on to its consumers."""
+        if answer in table.answers:
+            return
+
+        table.answers.add(answer)
+        for state in table.consumers:
+            work.append(('resume', state, answer))
+
+    def __contains__(self, goal):
+        """
+        Check whether an atomic goal can be proven.
+
+        This lets a prover stand for the knowledge when evaluating an
+        expression, so that its atoms are proven on demand.
+        """
+        return bool(self.answers(goal))
+
+
+def test():
+    """Test the module."""
+    print('Testing')
+    import doctest
+    doctest.testmod()
+    print('Done')
+
+if __name__ == '__main__':
+    test()
@@ -0,0 +1,260 @@
+#!/usr/bin/python
+# -*- coding: utf8 -*-
+"""
+This module contains the Rete network used to match rules against facts.
+
+Rules whose antecedent is an atomic expression or a conjunction of them
+are compiled into a discrimination network. Alpha nodes test a new fact
+against one atomic pattern, and beta joins extend the match with the
+other conjuncts of the rule.
+
+Alpha nodes keep no memory of their own: the facts matching a pattern are
+read from the brain's FactStore, and beta joins are computed through the
+store's indexes. This keeps
+the network in sync when facts are added in bulk or retracted.
+"""
+import expressions.parser
+import expressions.variable
+
+
+
+def join_order(patterns, bound=()):
+    """
+    Get the order to join atomic patterns in, given some bound variables.
+
+    Each pattern comes after the ones sharing more variables with the
+    variables bound so far, and after the ones written before it when
+    they share as many. This is the order in which bindings are passed
+    sideways through a rule body.
+
+    >>> p = expressions.parser.Parser()
+    >>> body = [p.parse('Edge(Y, Z)'), p.parse('Path(X, Y)')]
+    >>> join_order(body, [p.factory.variable('X')])
+    (1, 0)
+    >>> join_order(body)
+    (0, 1)
+    """
+    variables = [set(x for x in pattern.arguments
+                     if isinstance(x, expressions.variable.Variable))
+                 for pattern in patterns]
+    bound = set(bound)
+    remaining = list(range(len(patterns)))
+
+    order = []
+    while remaining:
+        best = max(remaining, key=lambda i: (len(bound & variables[i]), -i))
+        remaining.remove(best)
+        order.append(best)
+        bound |= variables[best]
+
+    return tuple(order)
+
+class Production(object):
+    """A rule compiled into the network: conjunct patterns and consequent."""
+
+    def __init__(self, patterns, consequent):
+        """
+        Create a new production for patterns -> consequent.
+
+        For every pattern, the other ones are sorted in the order they are
+        joined when a fact matches that pattern, preferring the patterns
+        which share variables with those already joined.
+
+        >>> p = expressions.parser.Parser()
+        >>> patterns = [p.parse(s) for s in ('A(X)', 'C(Z)', 'B(X, Z)')]
+        >>> production = Production(patterns, p.parse('D(X)'))
+        >>> production.orders[0]
+        (2, 1)
+        """
+        self.patterns = tuple(patterns)
+        self.consequent = consequent
+        self.orders = tuple(self.join_order(position)
+                            for position in range(len(self.patterns)))
+
+    def join_order(self, position):
+        """Get the order to join the other patterns after the given one."""
+        pattern = self.patterns[position]
+        return tuple(i for i in join_order(self.patterns, pattern.arguments)
+                     if i != position)
+
+    def join(self, knowledge, position, fact, bindings):
+        """
+        Join a fact matching one pattern with facts matching the others.
+
+        Yields (bindings, premises) for every complete match, where
+        premises holds the fact matched by each pattern.
+        """
+        premises = [None] * len(self.patterns)
+        premises[position] = fact
+        partial = [(bindings, premises)]
+
+        for i in self.orders[position]:
+            extended = []
+            for bindings, premises in partial:
+                for match, result in knowledge.match(self.patterns[i],
+                                                     bindings):
+                    premises = list(premises)
+                    premises[i] = match
+                    extended.append((result, premises))
+
+            partial = extended
+            if not partial:
+                return
+
+        for bindings, premises in partial:
+            yield bindings, tuple(premises)
+
+
+class AlphaNode(object):
+    """Tests facts against one atomic pattern."""
+
+    def __init__(self, pattern):
+        """Create a new alpha node for a pattern, without successors."""
+        self.pattern = pattern
+        self.successors = []
+
+
+class Rete(object):
+    """A discrimination network of productions indexed by signature."""
+
+    def __init__(self):
+        """
+        Create an empty network.
+
+        >>> r = Rete()
+        >>> len(r.productions)
+        0
+        """
+        self.alpha = {}
+        self.productions = []
+
+    def conjuncts(self, antecedent):
+        """
+        Get the atomic conjuncts of an antecedent.
+
+        Returns None if the antecedent is not an atomic expression or a
+        conjunction of them, since those can't be compiled.
+
+        >>> p = expressions.parser.Parser()
+        >>> r = Rete()
+        >>> [str(c) for c in r.conjuncts(p.parse('A(x) & (B(x) & C(x))'))]
+        ['A(x)', 'B(x)', 'C(x)']
+        >>> r.conjuncts(p.parse('A(x) | B(x)'))
+        """
+        conjuncts = []
+        stack = [antecedent]
+        while stack:
+            e = stack.pop()
+            if e.type() == 'Conjunction':
+                stack.extend(reversed(e.exprs))
+            elif e.type() == 'Atomic':
+                conjuncts.append(e)
+            else:
+                return None
+
+        return conjuncts
+
+    def add_production(self, antecedent, consequent, knowledge):
+        """
+        Compile a rule into the network.
+
+        Returns the production, or None if the antecedent can't be
+        compiled, together with the matches already present in knowledge.
+
+        >>> import factstore
+        >>> p = expressions.parser.Parser()
+        >>> k = factstore.FactStore()
+        >>> k.add(p.parse('Say(ariel, hello)'))
+        True
+        >>> r = Rete()
+        >>> production, matches = r.add_production(
+        ...     p.parse('Say(X, hello)'), p.parse('Say(self, hello)'), k)
+        >>> [[str(f) for f in premises] for _, premises in matches]
+        [['Say(ariel, hello)']]
+        """
+        patterns = self.conjuncts(antecedent)
+        if patterns is None:
+            return None, []
+
+        production = Production(patterns, consequent)
+        self.productions.append(production)
+
+        for position, pattern in enumerate(patterns):
+            nodes = self.alpha_nodes(pattern)
+            if pattern not in nodes:
+                nodes[pattern] = AlphaNode(pattern)
+
+            nodes[pattern].successors.append((production, position))
+
+        matches = []
+        for fact, bindings in knowledge.match(patterns[0]):
+            matches.extend(production.join(knowledge, 0, fact, bindings))
+
+        return production, matches
+
+    def alpha_nodes(self, pattern):
+        """
+        Get the alpha nodes sharing the signature and constants of pattern.
+
+        Alpha nodes are discriminated first by signature, then by the
+        positions of their constant arguments (their shape), and last by
+        the constants themselves. A fact is then only tested against the
+        patterns whose constants it has.
+        """
+        shape = tuple(i for i, x in enumerate(pattern.arguments)
+                      if not isinstance(x, expressions.variable.Variable))
+        constants = tuple(pattern.arguments[i] for i in shape)
+
+        shapes = self.alpha.setdefault(pattern.signature(), {})
+        return shapes.setdefault(shape, {}).setdefault(constants, {})
+
+    def patterns(self, signature):
+        """Get the patterns of the alpha nodes for a signature."""
+        return [pattern
+                for groups in self.alpha.get(signature, {}).values()
+                for nodes in groups.values()
+                for pattern in nodes]
+
+    def activate(self, fact, knowledge):
+        """
+        Propagate a new fact, already in knowledge, through the network.
+
+        Yields (production, bindings, premises) for every rule match that
+        the fact completes.
+
+        >>> import factstore
+        >>> p = expressions.parser.Parser()
+        >>> k = factstore.FactStore()
+        >>> r = Rete()
+        >>> _ = r.add_production(p.parse('Parent(X, Y) & Parent(Y, Z)'),
+        ...                      p.parse('Grandparent(X, Z)'), k)
+        >>> for f in ('Parent(ana, bob)', 'Parent(bob, cid)'):
+        ...     _ = k.add(p.parse(f))
+        >>> for production, bindings, _ in r.activate(
+        ...         p.parse('Parent(bob, cid)'), k):
+        ...     print(production.consequent.substitute(bindings))
+        Grandparent(ana, cid)
+        """
+        arguments = fact.arguments
+        for shape, groups in self.alpha.get(fact.signature(), {}).items():
+            nodes = groups.get(tuple(arguments[i] for i in shape), {})
+            for node in nodes.values():
+                bindings = node.pattern.match(fact)
+                if bindings is None:
+                    continue
+
+                for production, position in node.successors:
+                    for result, premises in production.join(
+                            knowledge, position, fact, bindings):
+                        yield production, result, premises
+
+
+def test():
+    """Test the module."""
+    print('Testing')
+    import doctest
+    doctest.testmod()
+    print('Done')
+
+if __name__ == '__main__':
+    test()
@@ -0,0 +1,433 @@
+#!/usr/bin/python
+# -*- coding: utf8 -*-
+"""
+This module contains a CDCL SAT solver and a reader for DIMACS files.
+
+The Solver decides whether a set of clauses, given as lists of non-zero
+integers like in the DIMACS format, can be satisfied. It is a conflict
+driven clause learning solver: unit propagation watches two literals per
+clause, conflicts are analysed up to the first unique implication point to
+learn a clause and backjump, branching follows variable activities with
+saved phases, and the search restarts following the Luby sequence.
+
+Inside the solver, the literal v is 2 * v and its negation is 2 * v + 1,
+so that literals index lists and are negated with ^ 1.
+"""
+import heapq
+
+
+def luby(i):
+    """
+    Get the i-th element, counting from 0, of the Luby sequence.
+
+    >>> [luby(i) for i in range(15)]
+    [1, 1, 2, 1, 1, 2, 4, 1, 1, 2, 1, 1, 2, 4, 8]
+    """
+    size, exponent = 1, 0
+    while size < i + 1:
+        exponent += 1
+        size = 2 * size + 1
+
+    while size - 1 != i:
+        size = (size - 1) >> 1
+        exponent -= 1
+        i %= size
+
+    return 2 ** exponent
+
+
+def read_dimacs(path):
+    """
+    Read a CNF formula in DIMACS format from a file.
+
+    Returns (variables, clauses).
+
+    >>> import os
+    >>> import tempfile
+    >>> handle, path = tempfile.mkstemp(suffix='.cnf')
+    >>> _ = os.write(handle, b'c example\\np cnf 3 2\\n1 -3 0\\n2 3\\n-1 0\\n')
+    >>> os.close(handle)
+    >>> read_dimacs(path)
+    (3, [[1, -3], [2, 3, -1]])
+    >>> os.remove(path)
+    """
+    variables = 0
+    clauses = []
+    clause = []
+    with open(path) as f:
+        for line in f:
+            line = line.strip()
+            if not line or line[0] == 'c':
+                continue
+            elif line[0] == '%':
+                break
+            elif line[0] == 'p':
+                variables = int(line.split()[2])
+                continue
+
+            for x in map(int, line.split()):
+                if x == 0:
+                    clauses.append(clause)
+                    clause = []
+                else:
+                    clause.append(x)
+
+    if clause:
+        clauses.append(clause)
+
+    return variables, clauses
+
+
+class Solver(object):
+    """A conflict driven clause learning SAT solver."""
+
+    def __init__(self, clauses=(), variables=0):
+        """
+        Create a solver for the given clauses.
+
+        >>> Solver([[1, 2], [-1], [-2]]).solve()
+        >>> Solver([[1, 2], [-1]]).solve()
+        [-1, 2]
+        """
+        self.variables = 0
+        self.value = [None, None]
+        self.level = [0]
+        self.reason = [None]
+        self.activity = [0.0]
+        self.phase = [False]
+        self.seen = [False]
+        self.watches = [[], []]
+        self.heap = []
+        self.increment = 1.0
+
+        self.clauses = []
+        self.learnts = []
+        self.limit = 0
+        self.trail = []
+        self.levels = []
+        self.head = 0
+        self.conflicts = 0
+        self.restarts = 0
+        self.unsatisfiable = False
+
+        self.grow(variables)
+        for clause in clauses:
+            self.add_clause(clause)
+
+    def grow(self, variables):
+        """Make room for the variables up to the given one."""
+        while self.variables < variables:
+            self.variables += 1
+            self.value.extend((None, None))
+            self.watches.extend(([], []))
+            self.level.append(0)
+            self.reason.append(None)
+            self.activity.append(0.0)
+            self.phase.append(False)
+            self.seen.append(False)
+            heapq.heappush(self.heap, (0.0, self.variables))
+
+    def add_clause(self, clause):
+        """
+        Add a clause. Returns False if the clauses are now unsatisfiable.
+
+        Clauses can only be added between calls to solve.
+
+        >>> s = Solver()
+        >>> s.add_clause([1, -1]), s.add_clause([2]), s.add_clause([-2])
+        (True, True, False)
+        """
+        if self.unsatisfiable:
+            return False
+
+        self.grow(max([abs(x) for x in clause] or [0]))
+        literals = set()
+        for x in clause:
+            literal = 2 * x if x > 0 else -2 * x + 1
+            if literal ^ 1 in literals or self.value[literal] is True:
+                return True
+            elif self.value[literal] is None:
+                literals.add(literal)
+
+        literals = list(literals)
+        if not literals:
+            self.unsatisfiable = True
+        elif len(literals) == 1:
+            self.assign(literals[0], None)
+            self.unsatisfiable = self.propagate() is not None
+        else:
+            self.attach(literals)
+            self.clauses.append(literals)
+
+        return not self.unsatisfiable
+
+    def attach(self, clause):
+        """Watch the first two literals of a clause."""
+        self.watches[clause[0]].append(clause)
+        self.watches[clause[1]].append(clause)
+
+    def assign(self, literal, reason):
+        """Make a literal true at the current level."""
+        value = self.value
+        value[literal] = True
+        value[literal ^ 1] = False
+        v = literal >> 1
+        self.level[v] = len(self.levels)
+        self.reason[v] = reason
+        self.trail.append(literal)
+
+    def propagate(self):
+        """
+        Propagate the literals on the trail not propagated yet.
+
+        Returns a conflicting clause, or None.
+        """
+        value = self.value
+        watches = self.watches
+        trail = self.trail
+        level = self.level
+        reason = self.reason
+        current = len(self.levels)
+        head = self.head
+
+        while head < len(trail):
+            false = trail[head] ^ 1
+            head += 1
+            watching = watches[false]
+            kept = watches[false] = []
+            keep = kept.append
+
+            for i, clause in enumerate(watching):
+                first = clause[0]
+                if first == false:
+                    first = clause[0] = clause[1]
+                    clause[1] = false
+                if value[first] is True:
+                    keep(clause)
+                    continue
+
+                for k in range(2, len(clause)):
+                    literal = clause[k]
+                    if value[literal] is not False:
+                        clause[1], clause[k] = literal, false
+                        watches[literal].append(clause)
+                        break
+                else:
+                    keep(clause)
+                    if value[first] is False:
+                        kept.extend(watching[i + 1:])
+                        self.head = len(trail)
+                        return clause
+
+                    value[first] = True
+                    value[first ^ 1] = False
+                    level[first >> 1] = current
+                    reason[first >> 1] = clause
+                    trail.append(first)
+
+        self.head = head
+        return None
+
+    def analyze(self, conflict):
+        """
+        Learn a clause from a conflict, up to the first UIP.
+
+        The first unique implication point is the first literal of the
+        trail through which every path from the last decision to the
+        conflict goes. Returns the clause, with its asserting literal
+        first, and the level to backjump to.
+
+        Literals implied by the others in the clause are left out of it.
+        """
+        seen = self.seen
+        level = self.level
+        current = len(self.levels)
+        learnt = [None]
+        pending = 0
+        literal = None
+        index = len(self.trail) - 1
+        clause = conflict
+
+        while True:
+            for x in (clause if literal is None else clause[1:]):
+                v = x >> 1
+                if not seen[v] and level[v] > 0:
+                    seen[v] = True
+                    self.bump(v)
+                    if level[v] >= current:
+                        pending += 1
+                    else:
+                        learnt.append(x)
+
+            while not seen[self.trail[index] >> 1]:
+                index -= 1
+            literal = self.trail[index]
+            index -= 1
+            v = literal >> 1
+            seen[v] = False
+            clause = self.reason[v]
+            pending -= 1
+            if not pending:
+                break
+
+        learnt[0] = literal ^ 1
+        minimal = [learnt[0]]
+        for x in learnt[1:]:
+            if self.reason[x >> 1] is None or not all(
+                    seen[y >> 1] or not level[y >> 1]
+                    for y in self.reason[x >> 1][1:]):
+                minimal.append(x)
+
+        back = 0
+        for x in learnt[1:]:
+            seen[x >> 1] = False
+        for i in range(1, len(minimal)):
+            if level[minimal[i] >> 1] > back:
+                back = level[minimal[i] >> 1]
+                minimal[1], minimal[i] = minimal[i], minimal[1]
+
+        return minimal, back
+
+    def bump(self, v):
+        """Increase the activity of a variable."""
+        activity = self.activity
+        activity[v] += self.increment
+        if activity[v] > 1e100:
+            for i in range(1, self.variables + 1):
+                activity[i] *= 1e-100
+            self.increment *= 1e-100
+            self.heap = [(-activity[i], i)
+                         for i in range(1, self.variables + 1)
+                         if self.value[2 * i] is None]
+            heapq.heapify(self.heap)
+        elif self.value[2 * v] is None:
+            heapq.heappush(self.heap, (-activity[v], v))
+
+    def backjump(self, level):
+        """Undo the assignments above a decision level."""
+        if len(self.levels) <= level:
+            return
+
+        value = self.value
+        start = self.levels[level]
+        for literal in self.trail[start:]:
+            v = literal >> 1
+            value[literal] = value[literal ^ 1] = None
+            self.reason[v] = None
+            self.phase[v] = not literal & 1
+            heapq.heappush(self.heap, (-self.activity[v], v))
+
+        del self.trail[start:]
+        del self.levels[level:]
+        self.head = len(self.trail)
+
+    def decide(self):
+        """Get the unassigned literal to branch on, or None."""
+        heap = self.heap
+        while heap:
+            _, v = heapq.heappop(heap)
+            if self.value[2 * v] is None:
+                return 2 * v if self.phase[v] else 2 * v + 1
+
+        return None
+
+    def restart(self):
+        """Go back to the top level and forget the longest learnt clauses."""
+        self.backjump(0)
+        self.restarts += 1
+
+        if len(self.learnts) > self.limit:
+            self.learnts.sort(key=len)
+            del self.learnts[len(self.learnts) // 2:]
+            self.limit = int(self.limit * 1.1)
+            self.watches = [[] for _ in self.watches]
+            for clause in self.clauses:
+                self.attach(clause)
+            for clause in self.learnts:
+                self.attach(clause)
+
+        if len(self.heap) > 4 * self.variables:
+            self.heap = [(-self.activity[v], v)
+                         for v in range(1, self.variables + 1)
+                         if self.value[2 * v] is None]
+            heapq.heapify(self.heap)
+
+    def solve(self, assumptions=()):
+        """
+        Find an assignment satisfying the clauses and assumptions.
+
+        Returns the assignment as a list of literals, one per variable, or
+        None if there is none. Assumptions are literals taken as true for
+        this call only, while learnt clauses are kept for the next ones.
+
+        >>> s = Solver([[1, 2], [-1, 3]])
+        >>> s.solve([-3])
+        [-1, 2, -3]
+        >>> s.solve([1, -3])
+        >>> s.solve([1])
+        [1, 2, 3]
+        """
+        if self.unsatisfiable:
+            return None
+
+        assumptions = [2 * x if x > 0 else -2 * x + 1 for x in assumptions]
+        self.grow(max([x >> 1 for x in assumptions] or [0]))
+        self.limit = max(self.limit, len(self.clauses) // 3 + 1000)
+        budget = 100 * luby(self.restarts)
+
+        while True:
+            conflict = self.propagate()
+            if conflict is not None:
+                self.conflicts += 1
+                budget -= 1
+                if not self.levels:
+                    self.unsatisfiable = True
+                    return None
+
+                learnt, back = self.analyze(conflict)
+                self.backjump(back)
+                if len(learnt) == 1:
+                    self.assign(learnt[0], None)
+                else:
+                    self.attach(learnt)
+                    self.learnts.append(learnt)
+                    self.assign(learnt[0], learnt)
+                self.increment /= 0.95
+                continue
+
+            if budget <= 0:
+                self.restart()
+                budget = 100 * luby(self.restarts)
+                continue
+
+            if len(self.levels) < len(assumptions):
+                literal = assumptions[len(self.levels)]
+                if self.value[literal] is False:
+                    self.backjump(0)
+                    return None
+
+                self.levels.append(len(self.trail))
+                if self.value[literal] is None:
+                    self.assign(literal, None)
+                continue
+
+            literal = self.decide()
+            if literal is None:
+                model = [v if self.value[2 * v] else -v
+                         for v in range(1, self.variables + 1)]
+                self.backjump(0)
+                return model
+
+            self.levels.append(len(self.trail))
+            self.assign(literal, None)
+
+
+def test():
+    """Test the module."""
+    print('Testing')
+    import doctest
+    doctest.testmod()
+    print('Done')
+
+if __name__ == '__main__':
+    test()
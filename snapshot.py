@@ -0,0 +1,216 @@
+#!/usr/bin/python
+# -*- coding: utf8 -*-
+"""
+This module saves the state of a Brain to a binary snapshot and loads it.
+
+A snapshot starts with MAGIC, the length of its header as 8 little-endian
+bytes, and the header, a JSON object giving the offset of every section
+from the first 8 byte boundary after it. Sections are aligned to 8 bytes:
+
+- names: the names of every predicate, constant and variable of the facts,
+  joined by newlines. Atoms refer to them by their index.
+- for every (predicate, arity) signature of the knowledge: a count x arity
+  matrix of 32 bit little-endian codes, one row per fact, and a column of
+  count bytes, 1 where the fact was asserted and 0 where it was derived.
+  The argument with name index i has code 2 * i, or 2 * i + 1 if it is a
+  variable.
+- the rules, as (antecedent, consequent) pairs, and the memories, as
+  (reminder, memory) pairs, each encoded by expressions.codec.
+
+The header also holds the generation of the journal the snapshot follows,
+see the journal module. Snapshots are written to a temporary file renamed
+over the path, so a crash never leaves a partial snapshot behind.
+
+Loading maps the file in memory: the rules and memories are built right
+away, while the facts of each signature are attached to the knowledge and
+only read from the mapped arrays once the signature is first looked at,
+so the pages holding them are only read then. Their names are translated
+to the codes of the knowledge's symbols in bulk, and their asserted flags
+are kept as they are, so no fact is built as an expression.
+"""
+import functools
+import json
+import mmap
+import os
+import struct
+
+import numpy
+
+import expressions.codec
+import expressions.variable
+
+MAGIC = b'LOGICSNAPSHOT\n'
+VERSION = 1
+
+
+def align(offset):
+    """
+    Round an offset up to a multiple of 8.
+
+    >>> align(0), align(1), align(8)
+    (0, 8, 8)
+    """
+    return (offset + 7) // 8 * 8
+
+
+def save(brain, path, generation=0):
+    """
+    Write the knowledge, rules and memories of a brain to a file.
+
+    generation is the first journal generation not held by the snapshot.
+    """
+    names = []
+    symbols = {}
+
+    def symbol(name):
+        """Get the index of a name, adding it if new."""
+        if name not in symbols:
+            symbols[name] = len(names)
+            names.append(name)
+        return symbols[name]
+
+    knowledge = brain.knowledge
+    for signature in list(knowledge.pending):
+        knowledge.fetch(signature)
+
+    codes = numpy.array([2 * symbol(x.name) + isinstance(
+        x, expressions.variable.Variable) for x in knowledge.symbols.terms],
+        dtype='<i4')
+    signatures = []
+    for signature, table in knowledge.signatures.items():
+        live = numpy.frombuffer(table.live, numpy.uint8).astype(bool)
+        rows = numpy.zeros((len(table), signature[1]), dtype='<i4')
+        for position, column in enumerate(table.columns):
+            rows[:, position] = codes[numpy.frombuffer(column,
+                                                       numpy.int32)[live]]
+
+        flags = numpy.frombuffer(table.asserted, numpy.uint8)[live]
+        signatures.append((symbol(signature[0].name), rows, flags))
+
+    rules = [x for antecedent in brain.rules
+             for consequent in brain.rules[antecedent]
+             for x in (antecedent, consequent)]
+    memories = [x for reminder, memory in brain.memory.items()
+                for x in (reminder, memory)]
+
+    sections = [('names', '\n'.join(names).encode('utf8'))]
+    sections.extend(zip(('rule names', 'rule codes'),
+                        expressions.codec.encode(rules)))
+    sections.extend(zip(('memory names', 'memory codes'),
+                        expressions.codec.encode(memories)))
+
+    header = {'version': VERSION, 'facts': [], 'journal': generation}
+    offset = 0
+    for name, data in sections:
+        header[name] = [offset, len(data)]
+        offset = align(offset + len(data))
+    for predicate, rows, flags in signatures:
+        header['facts'].append([predicate, rows.shape[1], rows.shape[0],
+                                offset, align(offset + rows.nbytes)])
+        offset = align(offset + rows.nbytes) + align(flags.nbytes)
+
+    text = json.dumps(header, sort_keys=True).encode('utf8')
+    base = align(len(MAGIC) + 8 + len(text))
+    temporary = path + '.tmp'
+    with open(temporary, 'wb') as f:
+        f.write(MAGIC + struct.pack(str('<Q'), len(text)) + text)
+        for name, data in sections:
+            f.seek(base + header[name][0])
+            f.write(data)
+        for (_, rows, flags), entry in zip(signatures, header['facts']):
+            f.seek(base + entry[3])
+            f.write(rows.tobytes())
+            f.seek(base + entry[4])
+            f.write(flags.tobytes())
+        f.flush()
+        os.fsync(f.fileno())
+    os.rename(temporary, path)
+
+
+def load(brain, path):
+    """
+    Load a snapshot into an empty brain.
+
+    The rules and memories are added right away, without chaining, since
+    the knowledge saved already holds what follows from them. The facts of
+    each signature are only built when first needed. Returns the journal
+    generation saved with the snapshot.
+    """
+    if len(brain.knowledge) or brain.rules or brain.memory:
+        raise Exception('Snapshots can only be loaded into an empty brain')
+
+    with open(path, 'rb') as f:
+        data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    if data[:len(MAGIC)] != MAGIC:
+        raise Exception('%s is not a snapshot' % path)
+
+    length, = struct.unpack(str('<Q'), data[len(MAGIC):len(MAGIC) + 8])
+    header = json.loads(data[len(MAGIC) + 8:len(MAGIC) + 8 + length].decode(
+        'utf8'))
+    if header['version'] != VERSION:
+        raise Exception('Unknown snapshot version %d' % header['version'])
+
+    base = align(len(MAGIC) + 8 + length)
+
+    def section(name):
+        """Get the bytes of a section."""
+        offset, size = header[name]
+        return data[base + offset:base + offset + size]
+
+    f = brain.factory
+    names = section('names').decode('utf8').split('\n')
+    rules = expressions.codec.decode((section('rule names'),
+                                      section('rule codes')), f)
+    memories = expressions.codec.decode((section('memory names'),
+                                         section('memory codes')), f)
+
+    chaining, brain.chaining = brain.chaining, False
+    try:
+        for antecedent, consequent in zip(rules[::2], rules[1::2]):
+            brain.add_rule(antecedent, consequent)
+    finally:
+        brain.chaining = chaining
+    for reminder, memory in zip(memories[::2], memories[1::2]):
+        brain.add_memory(memory, reminder)
+
+    for predicate, arity, count, rows, flags in header['facts']:
+        predicate = f.predicate(names[predicate])
+        brain.knowledge.attach((predicate, arity), count, functools.partial(
+            build, brain, data, names, arity, count,
+            base + rows, base + flags))
+
+    return header.get('journal', 0)
+
+
+def build(brain, data, names, arity, count, rows, flags):
+    """
+    Get the codes and asserted flags of the facts of a signature.
+
+    They are read from the arrays of a snapshot, and the codes are
+    translated to the symbols of the brain's knowledge.
+    """
+    f = brain.factory
+    knowledge = brain.knowledge
+    rows = numpy.frombuffer(data, '<i4', count * arity, rows).reshape(
+        count, arity)
+    flags = numpy.frombuffer(data, numpy.uint8, count, flags)
+
+    used = numpy.unique(rows)
+    mapping = numpy.zeros(used[-1] + 1 if len(used) else 0, dtype=numpy.int32)
+    for x in used.tolist():
+        mapping[x] = knowledge.symbols.encode(
+            f.variable(names[x >> 1]) if x & 1 else f.constant(names[x >> 1]))
+
+    return mapping[rows], flags
+
+
+def test():
+    """Test the module."""
+    print('Testing')
+    import doctest
+    doctest.testmod()
+    print('Done')
+
+if __name__ == '__main__':
+    test()
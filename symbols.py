@@ -0,0 +1,67 @@
+#!/usr/bin/python
+# -*- coding: utf8 -*-
+"""This module contains the SymbolTable class, mapping terms to integers."""
+import expressions.parser
+
+
+class SymbolTable(object):
+    """
+    A table giving every term a dense integer code, in order of arrival.
+
+    Codes are never reused, so they stay valid for as long as the table,
+    and the table keeps its terms alive.
+    """
+
+    def __init__(self):
+        """
+        Create a new empty symbol table.
+
+        >>> len(SymbolTable())
+        0
+        """
+        self.codes = {}
+        self.terms = []
+
+    def encode(self, term):
+        """
+        Get the code of a term, assigning the next one if it is new.
+
+        >>> p = expressions.parser.Parser()
+        >>> s = SymbolTable()
+        >>> a, b = p.factory.constant('a'), p.factory.variable('B')
+        >>> s.encode(a), s.encode(b), s.encode(a)
+        (0, 1, 0)
+        >>> s.terms[1] is b
+        True
+        """
+        code = self.codes.get(term)
+        if code is None:
+            code = self.codes[term] = len(self.terms)
+            self.terms.append(term)
+
+        return code
+
+    def lookup(self, term):
+        """
+        Get the code of a term, or None if it has none.
+
+        >>> p = expressions.parser.Parser()
+        >>> s = SymbolTable()
+        >>> s.lookup(p.factory.constant('a'))
+        """
+        return self.codes.get(term)
+
+    def __len__(self):
+        """Get the number of terms in the table."""
+        return len(self.terms)
+
+
+def test():
+    """Test the module."""
+    print('Testing')
+    import doctest
+    doctest.testmod()
+    print('Done')
+
+if __name__ == '__main__':
+    test()